@@ -0,0 +1,505 @@
+"""
+Analysis API routes - supply chain computations run server-side in DuckDB
+
+BOM explosion (multi-level, QPE rolled up) replaces the client-side part walk.
+Results are cached in the service per data version, so repeated requests for
+the same program/config are served from memory. Where-used answers the reverse
+question from an index built at load. Gap analysis compares time-phased demand
+with supplier capacity uploaded as CSV; scenarios evaluate what-if overlays
+(date shifts, QPE overrides) side by side with the baseline; time phasing
+offsets demand by part lead times into order-by periods.
+"""
+
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+import time
+
+import duckdb
+
+from serialization import FastJSONResponse
+
+router = APIRouter(prefix="/api", tags=["analysis"])
+
+# Will be injected from main.py
+duckdb_service = None
+
+BOM_VIEWS = ("indented", "leaves")
+
+
+@router.get("/bom/explode")
+async def explode_bom(
+    program: Optional[str] = Query(None),
+    config: Optional[str] = Query(None),
+    part: Optional[str] = Query(None),
+    view: str = Query("indented")
+):
+    """
+    Expand the bill of materials of a configuration (or a single part) through
+    every level, multiplying QPE down the tree
+    
+    - config=LM2500-C0 (optionally program=...): roots are the config's Level 1 parts
+    - part=P0000: explode one part (quantity 1), optionally scoped by program/config
+    - view=indented: flattened indented BOM, one line per path, depth-first
+      (level, part, parent, qpe, qty = extended quantity per engine, isLeaf)
+    - view=leaves: total quantity per leaf part and per raw material
+      (per engine and for all engines in scope)
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        if view not in BOM_VIEWS:
+            raise HTTPException(status_code=400, detail=f"Unknown view '{view}' - expected one of: {', '.join(BOM_VIEWS)}")
+        if not config and not part:
+            raise HTTPException(status_code=400, detail="config or part is required")
+        
+        start_time = time.time()
+        
+        bom = await duckdb_service.run_shared(
+            ("bom", program, config, part), duckdb_service.explode_bom, program, config, part
+        )
+        
+        elapsed = time.time() - start_time
+        
+        response = {
+            "status": "success",
+            "view": view,
+            "scope": bom["scope"],
+            "engines": bom["engines"],
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+        }
+        if view == "indented":
+            response["line_count"] = bom["line_count"]
+            response["data"] = bom["indented"]
+        else:
+            response["leaves"] = bom["leaves"]
+            response["rawMaterials"] = bom["rawMaterials"]
+        return FastJSONResponse(response)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] BOM explosion endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/where-used/{pn}")
+async def where_used(pn: str, period: str = Query("month")):
+    """
+    Reverse BOM: what depends on a part (Level 1 or Level 2 / raw-material part)
+    
+    Returns the Level 1 parts it is used in, impacted programs and configs with
+    ESN counts, and ESN counts per ship-date period (period=month|quarter|year),
+    from one lookup in the where-used index built at load.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        
+        try:
+            result = await duckdb_service.run(duckdb_service.get_where_used, pn, period)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Part not used in any BOM: {pn}")
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            **result
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Where-used endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _gap_filters(part, prefix, supplier, level, shortage_only, with_capacity):
+    return {
+        "pn": part, "prefix": prefix, "supplier": supplier, "level": level,
+        "shortage_only": shortage_only, "with_capacity": with_capacity,
+    }
+
+
+@router.post("/gap/capacity")
+async def upload_gap_capacity(file: UploadFile = File(...), mode: str = Query("merge")):
+    """
+    Upload supplier capacity / commits as CSV (part,supplier,period,capacity)
+    
+    - mode=merge: upsert the uploaded (part, supplier, period) rows; only the
+      touched (part, supplier) gaps are recomputed
+    - mode=replace: replace all capacity and recompute every gap
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        content = await file.read()
+        
+        try:
+            result = await duckdb_service.run(duckdb_service.gap.load_capacity_csv, content, mode)
+        except PermissionError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except (ValueError, duckdb.Error) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "filename": file.filename,
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            **result
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Capacity upload endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/gap/summary")
+async def gap_summary(
+    part: Optional[List[str]] = Query(None),
+    prefix: Optional[str] = Query(None),
+    supplier: Optional[List[str]] = Query(None),
+    level: Optional[int] = Query(None, ge=1, le=2),
+    shortage_only: bool = Query(False),
+    with_capacity: bool = Query(False),
+    sort: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    One row per (part, supplier): total demand and capacity, worst cumulative
+    shortfall, first shortage period and closing cumulative gap
+    
+    Sorted by first shortage date by default; sort=-max_shortfall,pn etc.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        filters = _gap_filters(part, prefix, supplier, level, shortage_only, with_capacity)
+        
+        try:
+            result = await duckdb_service.run(duckdb_service.gap.summary, filters, skip, limit, sort)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "skip": skip,
+            "limit": limit,
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            **result
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Gap summary endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/gap/periods")
+async def gap_periods(
+    part: Optional[List[str]] = Query(None),
+    prefix: Optional[str] = Query(None),
+    supplier: Optional[List[str]] = Query(None),
+    level: Optional[int] = Query(None, ge=1, le=2),
+    shortage_only: bool = Query(False),
+    with_capacity: bool = Query(False),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Time-phased gap rows: demand, capacity, gap and running totals per
+    (part, supplier, month), with the same filters as /gap/summary
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        filters = _gap_filters(part, prefix, supplier, level, shortage_only, with_capacity)
+        
+        result = await duckdb_service.run(duckdb_service.gap.periods, filters, skip, limit)
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "skip": skip,
+            "limit": limit,
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            **result
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Gap periods endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class ScenarioRequest(BaseModel):
+    name: str
+    description: str = ""
+    overlays: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+@router.get("/scenarios")
+async def list_scenarios():
+    """Saved what-if scenarios (id, name, overlay count)"""
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        scenarios = await duckdb_service.run(duckdb_service.scenarios.list)
+        return FastJSONResponse({"status": "success", "total": len(scenarios), "data": scenarios})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Scenario list endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/scenarios")
+async def create_scenario(body: ScenarioRequest):
+    """
+    Save a scenario: a list of overlays on the base data
+    
+    - {"type": "shift", "program": ..., "config": ..., "esn": ..., "months": 3, "days": 0}
+    - {"type": "qpe", "part": ..., "level2Part": ..., "program": ..., "config": ..., "qpe": 2}
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        try:
+            scenario = await duckdb_service.run(
+                duckdb_service.scenarios.save, body.name, body.overlays, body.description
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return FastJSONResponse({"status": "success", **scenario})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Scenario create endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/scenarios/{scenario_id}")
+async def get_scenario(scenario_id: str):
+    """One scenario with its overlays"""
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        scenario = await duckdb_service.run(duckdb_service.scenarios.get, scenario_id)
+        if scenario is None:
+            raise HTTPException(status_code=404, detail=f"Scenario not found: {scenario_id}")
+        
+        return FastJSONResponse({"status": "success", **scenario})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Scenario endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/scenarios/{scenario_id}")
+async def update_scenario(scenario_id: str, body: ScenarioRequest):
+    """Replace a scenario's name, description and overlays"""
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        try:
+            scenario = await duckdb_service.run(
+                duckdb_service.scenarios.save, body.name, body.overlays, body.description, scenario_id
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if scenario is None:
+            raise HTTPException(status_code=404, detail=f"Scenario not found: {scenario_id}")
+        
+        return FastJSONResponse({"status": "success", **scenario})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Scenario update endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/scenarios/{scenario_id}")
+async def delete_scenario(scenario_id: str):
+    """Delete a scenario"""
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        if not await duckdb_service.run(duckdb_service.scenarios.delete, scenario_id):
+            raise HTTPException(status_code=404, detail=f"Scenario not found: {scenario_id}")
+        
+        return FastJSONResponse({"status": "success", "id": scenario_id})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Scenario delete endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/scenarios/{scenario_id}/compare")
+async def compare_scenario(
+    scenario_id: str,
+    period: str = Query("quarter"),
+    aggregate: Optional[List[str]] = Query(None),
+    changed_only: bool = Query(True)
+):
+    """
+    Baseline vs scenario, side by side: supplier demand, RM supplier demand
+    (per period=month|quarter|year) and cdata (distinct ESNs per program and month)
+    
+    Each row carries baseline, scenario and delta. changed_only=false returns
+    every group, not only the ones the overlays move.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        
+        try:
+            result = await duckdb_service.run_shared(
+                ("scenario_compare", scenario_id, period, tuple(aggregate or ()), changed_only),
+                duckdb_service.scenarios.compare, scenario_id, period, aggregate, changed_only
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Scenario not found: {scenario_id}")
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            **result
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Scenario compare endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/lead-times")
+async def upload_lead_times(file: UploadFile = File(...), mode: str = Query("merge")):
+    """
+    Upload manufacturing lead times as CSV (part,lead_time_days)
+    
+    mode=merge updates the listed parts, mode=replace replaces the whole table.
+    Parts without a lead time use the default (AEO_DEFAULT_LEAD_TIME_DAYS).
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        content = await file.read()
+        
+        try:
+            result = await duckdb_service.run(duckdb_service.phasing.load_lead_times_csv, content, mode)
+        except PermissionError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except (ValueError, duckdb.Error) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "filename": file.filename,
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            **result
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Lead-time upload endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/time-phasing")
+async def time_phasing(
+    by: str = Query("supplier"),
+    period: str = Query("month"),
+    group: Optional[List[str]] = Query(None),
+    level: Optional[int] = Query(None, ge=1, le=2)
+):
+    """
+    Demand shifted back from Target_Ship_Date by part lead times, per order-by period
+    
+    - by=supplier: Level 1 parts per Parent_Part_Supplier
+    - by=rm_supplier: Level 2 parts per raw-material supplier (offset by the
+      parent's lead time as well)
+    - by=raw_type: both levels per raw type
+    - period=month|quarter|year; group=... restricts to some suppliers / raw types
+    
+    Each row: group, level, period, order_qty, cumulative_qty, parts, esns,
+    first_order_date.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        
+        try:
+            rows = await duckdb_service.run_shared(
+                ("time_phasing", by, period, tuple(group or ()), level),
+                duckdb_service.phasing.phase, by, period, group, level
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "by": by,
+            "period": period,
+            "default_lead_time_days": duckdb_service.phasing.default_days,
+            "total": len(rows),
+            "data": rows,
+            "execution_time_ms": f"{elapsed*1000:.2f}"
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Time-phasing endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
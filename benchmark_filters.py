@@ -0,0 +1,120 @@
+"""
+Benchmark datatable filtering: bitmap index vs the SQL path
+
+Runs the same random filter combinations (the shape /api/datatable/filter
+receives from the dashboard) through DuckDBService.filter_datatable_arrow twice -
+once with the in-memory filter bitmaps, once with them disabled so every count
+and page is answered by DuckDB - checks both return identical pages, and prints
+latency percentiles per operation:
+    
+    python benchmark_filters.py
+    python benchmark_filters.py --db data/data-aeo.duckdb --runs 500 --limit 100
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from duckdb_service import DuckDBService
+
+DEFAULT_DUCKDB_PATH = "data/data-aeo.duckdb"
+
+
+def random_filters(options: Dict[str, List[str]], list_filters, rng: random.Random) -> Dict[str, Any]:
+    """1-3 values on a random subset of the filter columns, sometimes a year"""
+    filters: Dict[str, Any] = {}
+    for name in list_filters:
+        values = options.get(name) or []
+        if values and rng.random() < 0.4:
+            filters[name] = rng.sample(values, min(len(values), rng.randint(1, 3)))
+    if options.get("years") and rng.random() < 0.5:
+        filters["year"] = rng.choice(options["years"])
+    return filters
+
+
+def _time_ms(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def _summary(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"median {statistics.median(ordered):8.3f} ms   p95 {p95:8.3f} ms"
+
+
+def run_benchmark(duckdb_path: str = DEFAULT_DUCKDB_PATH, runs: int = 200, limit: int = 100, seed: int = 42) -> bool:
+    if not Path(duckdb_path).exists():
+        print(f"[WARN] {duckdb_path} not found - nothing to benchmark")
+        return False
+    
+    service = DuckDBService(duckdb_path=duckdb_path, read_only=True)
+    try:
+        bitmaps = service.filter_bitmaps
+        if bitmaps is None:
+            print("[ERROR] Filter bitmaps could not be built - see the warnings above")
+            return False
+        
+        rng = random.Random(seed)
+        options = service.get_datatable_filter_options()
+        cases = []
+        for _ in range(runs):
+            filters = random_filters(options, service.DATATABLE_LIST_FILTERS, rng)
+            skip = rng.choice([0, 0, limit, limit * 5])
+            cases.append((filters, skip))
+        
+        timings = {("count", "sql"): [], ("count", "bitmap"): [], ("page", "sql"): [], ("page", "bitmap"): []}
+        mismatches = 0
+        for filters, skip in cases:
+            # SQL path: no bitmaps and a cold total cache, as for a new filter set
+            service.filter_bitmaps = None
+            service._datatable_totals.clear()
+            timings[("count", "sql")].append(_time_ms(lambda: service.count_datatable(filters)))
+            service._datatable_totals.clear()
+            sql_page = []
+            timings[("page", "sql")].append(
+                _time_ms(lambda: sql_page.append(service.filter_datatable_arrow(filters, skip, limit)))
+            )
+            
+            service.filter_bitmaps = bitmaps
+            timings[("count", "bitmap")].append(_time_ms(lambda: service.count_datatable(filters)))
+            bitmap_page = []
+            timings[("page", "bitmap")].append(
+                _time_ms(lambda: bitmap_page.append(service.filter_datatable_arrow(filters, skip, limit)))
+            )
+            
+            (sql_total, sql_table, _), (bitmap_total, bitmap_table, _) = sql_page[0], bitmap_page[0]
+            if sql_total != bitmap_total or not sql_table.equals(bitmap_table):
+                mismatches += 1
+        
+        stats = bitmaps.stats()
+        print(f"\n[BENCH] {stats['rows']:,} rows, {sum(stats['columns'].values())} bitmaps "
+              f"({stats['bytes'] / 1024:.0f} KB), {runs} filter sets, page size {limit}")
+        for op in ("count", "page"):
+            sql_median = statistics.median(timings[(op, "sql")])
+            bitmap_median = statistics.median(timings[(op, "bitmap")])
+            print(f"  {op:<5} sql     {_summary(timings[(op, 'sql')])}")
+            print(f"  {op:<5} bitmap  {_summary(timings[(op, 'bitmap')])}   ({sql_median / bitmap_median:.1f}x)")
+        
+        if mismatches:
+            print(f"[ERROR] {mismatches} filter sets returned different results")
+            return False
+        print("[OK] Bitmap and SQL paths returned identical pages")
+        return True
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark datatable filtering: bitmap index vs SQL")
+    parser.add_argument("--db", default=DEFAULT_DUCKDB_PATH, help="Path to the DuckDB database file")
+    parser.add_argument("--runs", type=int, default=200, help="Number of random filter sets")
+    parser.add_argument("--limit", type=int, default=100, help="Page size")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the filter sets")
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.db, args.runs, args.limit, args.seed) else 1)
@@ -0,0 +1,150 @@
+"""
+In-process bitmap index for datatable filter intersection
+
+Dashboard filters are conjunctions of IN lists over a handful of low-cardinality
+columns. At load, every distinct value of each filter column gets a row bitmap
+(bit i set = the row with rowid i has that value). A filter set then resolves to
+a row set with integer bit operations only:
+    
+    OR of the selected values' bitmaps within a column, AND across columns
+
+Bitmaps are Python ints, whose |, & and bit_count() run in C over machine words.
+The resulting row set feeds:
+- counts: bit_count()
+- pagination: the rows are ranked in the datatable's default order once at
+  build time, so page k is a slice of the matching positions in that ranking
+- aggregation: facet counts are popcounts of (row set & value bitmap)
+
+Bitmaps are uncompressed, so one costs rows/8 bytes whatever its density. The
+index is held to a total byte budget (AEO_BITMAP_MAX_MB, 64 MB by default):
+the cheapest columns are indexed first, and columns that would exceed the
+budget are skipped and answered by SQL instead (listed in stats()).
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Total size of all bitmaps in one index (per worker)
+DEFAULT_MAX_BYTES = int(float(os.environ.get("AEO_BITMAP_MAX_MB", "64")) * 1024 * 1024)
+
+
+def _to_bitmap(row_ids: np.ndarray, size: int) -> int:
+    """Row ids -> int bitmap (bit i set for each row id i)"""
+    mask = np.zeros(size, dtype=bool)
+    mask[row_ids] = True
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def _to_mask(bitmap: int, size: int) -> np.ndarray:
+    """int bitmap -> boolean numpy mask of length size"""
+    raw = np.frombuffer(bitmap.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little", count=size).astype(bool)
+
+
+class BitmapIndex:
+    """Row bitmaps per (column, value), plus the default row order for pagination"""
+    
+    def __init__(self, size: int, bitmaps: Dict[str, Dict[Any, int]], order: Optional[np.ndarray] = None,
+                 skipped: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            size: One past the largest rowid
+            bitmaps: {column: {value: bitmap}}
+            order: rowids in the datatable's default order (enables page_row_ids)
+            skipped: {column: estimated bytes} of columns left out to stay within budget
+        """
+        self.size = size
+        self.bitmaps = bitmaps
+        self.order = order
+        self.skipped = skipped or {}
+        self.all_rows = (1 << size) - 1 if order is None else _to_bitmap(order, size)
+    
+    @classmethod
+    def from_arrow(cls, table: pa.Table, row_id_column: str, columns: Iterable[str],
+                   order: Optional[np.ndarray] = None, max_bytes: Optional[int] = None) -> "BitmapIndex":
+        """
+        Build from an Arrow table holding a rowid column plus one column per index key
+        
+        Values are keyed by their string form (filters arrive as strings);
+        NULL values are not indexed, matching SQL IN semantics. A column costs
+        (distinct values) x rows/8 bytes; columns are taken cheapest first while the
+        total stays within max_bytes (default DEFAULT_MAX_BYTES), the rest are skipped.
+        """
+        row_ids = table.column(row_id_column).to_numpy()
+        size = int(row_ids.max()) + 1 if len(row_ids) else 0
+        bitmap_bytes = (size + 7) // 8
+        
+        encoded = {column: pc.dictionary_encode(table.column(column)).combine_chunks() for column in columns}
+        costs = {column: len(values.dictionary) * bitmap_bytes for column, values in encoded.items()}
+        
+        bitmaps: Dict[str, Dict[Any, int]] = {}
+        skipped: Dict[str, int] = {}
+        budget = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        for column in sorted(encoded, key=lambda c: (costs[c], c)):
+            if costs[column] > budget:
+                skipped[column] = costs[column]
+                continue
+            budget -= costs[column]
+            codes = encoded[column].indices.to_numpy(zero_copy_only=False)
+            valid = encoded[column].indices.is_valid().to_numpy(zero_copy_only=False)
+            by_value: Dict[Any, int] = {}
+            for code, value in enumerate(encoded[column].dictionary.to_pylist()):
+                if value is None:
+                    continue
+                by_value[str(value)] = _to_bitmap(row_ids[valid & (codes == code)], size)
+            bitmaps[column] = by_value
+        return cls(size, bitmaps, order, skipped)
+    
+    def resolve(self, selections: Dict[str, List[Any]]) -> int:
+        """
+        Row bitmap for {column: [values]} - OR within a column, AND across columns
+        
+        Columns with an empty selection are ignored; unknown values match nothing.
+        """
+        result = self.all_rows
+        for column, values in selections.items():
+            if not values:
+                continue
+            by_value = self.bitmaps[column]
+            column_rows = 0
+            for value in values:
+                column_rows |= by_value.get(str(value), 0)
+            result &= column_rows
+            if not result:
+                break
+        return result
+    
+    @staticmethod
+    def count(bitmap: int) -> int:
+        return bitmap.bit_count()
+    
+    def page_row_ids(self, bitmap: int, skip: int, limit: int) -> List[int]:
+        """Rowids of rows skip..skip+limit-1 of the row set, in the default order"""
+        if self.order is None:
+            raise RuntimeError("BitmapIndex was built without a row order")
+        if not bitmap:
+            return []
+        ranked = self.order[_to_mask(bitmap, self.size)[self.order]]
+        return ranked[skip:skip + limit].tolist()
+    
+    def facet_counts(self, bitmap: int, column: str) -> Dict[Any, int]:
+        """Rows per value of column within the row set (values with zero rows omitted)"""
+        counts = {}
+        for value, rows in self.bitmaps[column].items():
+            matched = (bitmap & rows).bit_count()
+            if matched:
+                counts[value] = matched
+        return counts
+    
+    def stats(self) -> Dict[str, Any]:
+        """Distinct values per column and total bitmap memory"""
+        return {
+            "rows": self.all_rows.bit_count(),
+            "columns": {column: len(values) for column, values in self.bitmaps.items()},
+            "bytes": sum((bitmap.bit_length() + 7) // 8 for values in self.bitmaps.values() for bitmap in values.values()),
+            "skipped": dict(self.skipped),
+        }
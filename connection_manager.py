@@ -0,0 +1,196 @@
+"""
+DuckDB connection manager - per-request cursors and off-event-loop execution
+
+A DuckDB connection must not be shared by concurrent requests: `execute` and
+`description` are per-connection state, so interleaved requests can read each
+other's results. Each unit of work gets its own cursor (`conn.cursor()`, a
+separate connection to the same database) and runs in a bounded thread pool so
+the asyncio event loop is never blocked by a query.
+
+run_guarded() adds a deadline and client-disconnect checks: the job's cursor is
+interrupted (DuckDB `interrupt()`) so the query stops consuming CPU immediately.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Callable, Awaitable, Dict, Any
+
+import duckdb
+
+
+def _default_workers() -> int:
+    """Pool size from AEO_DB_WORKERS, otherwise one worker per core (min 4)"""
+    configured = os.environ.get("AEO_DB_WORKERS")
+    if configured:
+        try:
+            return max(1, int(configured))
+        except ValueError:
+            print(f"[WARN] Ignoring invalid AEO_DB_WORKERS={configured!r}")
+    return max(4, os.cpu_count() or 1)
+
+
+# How often run_guarded() checks the deadline and the client connection
+POLL_INTERVAL_S = 0.25
+
+
+class QueryTimeout(Exception):
+    """Raised when a guarded query exceeds its deadline and is interrupted"""
+
+
+class QueryCancelled(Exception):
+    """Raised when a guarded query is interrupted because the client went away"""
+
+
+class _Job:
+    """Tracks the cursor of one guarded unit of work so it can be interrupted"""
+    
+    def __init__(self):
+        self.cursor: Optional[duckdb.DuckDBPyConnection] = None
+        self.interrupted = False
+        self._lock = threading.Lock()
+    
+    def attach(self, cursor: duckdb.DuckDBPyConnection):
+        with self._lock:
+            self.cursor = cursor
+            if self.interrupted:
+                cursor.interrupt()
+    
+    def interrupt(self):
+        with self._lock:
+            self.interrupted = True
+            if self.cursor is not None:
+                self.cursor.interrupt()
+
+
+class ConnectionManager:
+    """Hands out per-request DuckDB cursors and runs blocking work in a bounded thread pool"""
+    
+    def __init__(self, conn: duckdb.DuckDBPyConnection, max_workers: Optional[int] = None):
+        self.conn = conn
+        self.max_workers = max_workers or _default_workers()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="duckdb")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._total_ms = 0.0
+    
+    @contextmanager
+    def cursor(self):
+        """
+        Cursor for the current unit of work
+        
+        Nested calls within the same job (e.g. get_demand_data -> query) reuse the
+        job's cursor; a fresh cursor is opened and closed otherwise.
+        """
+        current = getattr(self._local, "cursor", None)
+        if current is not None:
+            yield current
+            return
+        
+        cur = self.conn.cursor()
+        self._local.cursor = cur
+        try:
+            yield cur
+        finally:
+            self._local.cursor = None
+            cur.close()
+    
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn synchronously with a dedicated cursor bound to the calling thread"""
+        with self.cursor():
+            return fn(*args, **kwargs)
+    
+    def _guarded_call(self, job: _Job, fn: Callable, *args, **kwargs):
+        if job.interrupted:
+            raise QueryCancelled("Query cancelled before it started")
+        with self.cursor() as cur:
+            job.attach(cur)
+            return fn(*args, **kwargs)
+    
+    def _tracked_call(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self._active += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._total_ms += elapsed_ms
+    
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run fn in the query thread pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self._tracked_call, self.call, fn, *args, **kwargs)
+        )
+    
+    async def run_guarded(
+        self,
+        fn: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ):
+        """
+        Run fn in the pool, interrupting its query on timeout or client disconnect
+        
+        Args:
+            timeout: Seconds before the query is interrupted (QueryTimeout)
+            is_disconnected: Async predicate, e.g. starlette's request.is_disconnected;
+                when it returns True the query is interrupted (QueryCancelled)
+        """
+        loop = asyncio.get_running_loop()
+        job = _Job()
+        future = loop.run_in_executor(
+            self._executor, functools.partial(self._tracked_call, self._guarded_call, job, fn, *args)
+        )
+        deadline = loop.time() + timeout if timeout else None
+        
+        try:
+            while True:
+                wait = POLL_INTERVAL_S
+                if deadline is not None:
+                    wait = max(0.0, min(wait, deadline - loop.time()))
+                done, _ = await asyncio.wait({future}, timeout=wait)
+                if done:
+                    return future.result()
+                if deadline is not None and loop.time() >= deadline:
+                    error = QueryTimeout(f"Query exceeded {timeout:g}s and was interrupted")
+                    break
+                if is_disconnected is not None and await is_disconnected():
+                    error = QueryCancelled("Client disconnected - query interrupted")
+                    break
+        except asyncio.CancelledError:
+            job.interrupt()
+            raise
+        
+        job.interrupt()
+        # Wait for the worker to unwind so the pool slot is really free again
+        try:
+            await future
+        except Exception:
+            pass
+        raise error
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilisation counters"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "completed": self._completed,
+                "avg_ms": round(self._total_ms / self._completed, 2) if self._completed else 0.0,
+            }
+    
+    def shutdown(self):
+        """Stop accepting work and release pool threads"""
+        self._executor.shutdown(wait=False)
@@ -10,9 +10,22 @@ class DataService:
         self.duckdb_path = Path(duckdb_path)
         self.excel_path = Path(excel_path)
         self.sheet_name = sheet_name
-        self.df: Optional[pl.DataFrame] = None
+        self._df: Optional[pl.DataFrame] = None
         self.duckdb_service = duckdb_service
-        self.load_data()
+        # When backed by DuckDB the DataFrame is only materialized on first use
+        if duckdb_service is None:
+            self.load_data()
+    
+    @property
+    def df(self) -> Optional[pl.DataFrame]:
+        """Loaded data - loads on first access when deferred"""
+        if self._df is None:
+            self.load_data()
+        return self._df
+    
+    @df.setter
+    def df(self, value: Optional[pl.DataFrame]):
+        self._df = value
     
     def load_data(self):
         """Load data from DuckDB service if available, otherwise from Excel"""
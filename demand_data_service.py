@@ -7,16 +7,21 @@ from datetime import datetime
 class DemandDataService:
     """Service for transforming Excel data into demand dashboard format"""
     
-    def __init__(self, excel_path: str = "data/AEO-transformed-data.xlsx", sheet_name: str = "Sheet1"):
+    def __init__(self, excel_path: str = "data/AEO-transformed-data.xlsx", sheet_name: str = "Sheet1", data_service=None):
         self.excel_path = Path(excel_path)
         self.sheet_name = sheet_name
         self.df: pl.DataFrame = None
-        # Don't load data here - it will be set from main.py to avoid double loading
+        # Don't load data here - it is shared from data_service on first use to avoid double loading
+        self.data_service = data_service
     
     def load_data(self):
         """Load Excel data (only if not already loaded)"""
         if self.df is not None:
             return
+        
+        if self.data_service is not None:
+            self.df = self.data_service.df
+            return
             
         try:
             self.df = pl.read_excel(self.excel_path, sheet_name=self.sheet_name)
@@ -36,6 +41,7 @@ class DemandDataService:
         if use_duckdb and duckdb_service:
             return duckdb_service.get_demand_data()
         
+        self.load_data()
         if self.df is None or self.df.is_empty():
             raise Exception("No data loaded from Excel file")
         
@@ -199,6 +205,7 @@ class DemandDataService:
     
     def get_summary_stats(self) -> Dict[str, Any]:
         """Get summary statistics from Excel data"""
+        self.load_data()
         if self.df is None or self.df.is_empty():
             raise Exception("No data loaded")
         
@@ -221,6 +228,7 @@ class DemandDataService:
         if use_duckdb and duckdb_service:
             return duckdb_service.get_cdata()
         
+        self.load_data()
         if self.df is None or self.df.is_empty():
             raise Exception("No data loaded from Excel file")
         
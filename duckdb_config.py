@@ -0,0 +1,83 @@
+"""
+DuckDB resource profile (threads, memory_limit, spill directory, ...)
+
+Values come from a JSON config file (AEO_DUCKDB_CONFIG) and/or environment
+variables; environment variables win. The profile is passed as `config=` to every
+duckdb.connect() the service makes, so all cursors inherit it.
+
+Example config file:
+    {"threads": 4, "memory_limit": "8GB", "temp_directory": "/var/tmp/aeo-spill",
+     "preserve_insertion_order": false}
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Tuple
+
+# setting name -> (environment variable, type)
+RESOURCE_SETTINGS = {
+    "threads": ("AEO_DUCKDB_THREADS", int),
+    "memory_limit": ("AEO_DUCKDB_MEMORY_LIMIT", str),
+    "temp_directory": ("AEO_DUCKDB_TEMP_DIRECTORY", str),
+    "max_temp_directory_size": ("AEO_DUCKDB_MAX_TEMP_DIRECTORY_SIZE", str),
+    "preserve_insertion_order": ("AEO_DUCKDB_PRESERVE_INSERTION_ORDER", bool),
+}
+
+CONFIG_FILE_ENV = "AEO_DUCKDB_CONFIG"
+
+
+def _cast(value: Any, kind: type) -> Any:
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+    if kind is int:
+        return int(value)
+    return str(value)
+
+
+def load_resource_profile() -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Resolve the DuckDB resource profile for this deployment
+    
+    Returns:
+        (config, sources) - config is ready for duckdb.connect(config=...);
+        sources maps each setting to "file" or "env"
+    """
+    config: Dict[str, Any] = {}
+    sources: Dict[str, str] = {}
+    
+    config_path = os.environ.get(CONFIG_FILE_ENV)
+    if config_path:
+        try:
+            with open(config_path) as f:
+                file_values = json.load(f)
+            for name, value in file_values.items():
+                if name not in RESOURCE_SETTINGS:
+                    print(f"[WARN] Unknown DuckDB setting '{name}' in {config_path} - ignored")
+                    continue
+                config[name] = _cast(value, RESOURCE_SETTINGS[name][1])
+                sources[name] = "file"
+        except Exception as e:
+            print(f"[WARN] Could not read DuckDB config file {config_path}: {e}")
+    
+    for name, (env_var, kind) in RESOURCE_SETTINGS.items():
+        value = os.environ.get(env_var)
+        if value is None or value == "":
+            continue
+        try:
+            config[name] = _cast(value, kind)
+            sources[name] = "env"
+        except ValueError:
+            print(f"[WARN] Ignoring invalid {env_var}={value!r}")
+    
+    # Spill directory must exist before DuckDB needs it
+    temp_directory = config.get("temp_directory")
+    if temp_directory:
+        try:
+            Path(temp_directory).mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            print(f"[WARN] Could not create temp_directory {temp_directory}: {e}")
+    
+    return config, sources
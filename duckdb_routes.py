@@ -2,18 +2,152 @@
 FastAPI DuckDB Endpoints for ultra-fast filtering and queries
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, List
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+from typing import Optional, List, Dict, Any
+import asyncio
+import duckdb
+import itertools
+import os
+import tempfile
 import time
 
+from connection_manager import QueryTimeout, QueryCancelled
+from gap_analysis import csv_upload_file
+from query_guard import validate_select, effective_max_rows, QUERY_TIMEOUT_S, STREAM_BATCH_ROWS, SQL_USER_ERRORS
+from serialization import (
+    FastJSONResponse, dumps, validate_layout, arrow_records, negotiate_format, pagination_headers, binary_response,
+    stream_batches_response, write_xlsx, attachment_headers, media_type, EXPORT_FORMATS, XLSX_MAX_ROWS
+)
+
 router = APIRouter(prefix="/api", tags=["duckdb"])
 
 # Will be injected from main.py
 duckdb_service = None
 
 
-@router.post("/filter")
+def _stream_query_response(batches, source: Optional[str] = None) -> StreamingResponse:
+    """
+    Stream query batches (see iter_query_batches) as NDJSON: a header line with
+    the columns, one line per row, and a trailer line with the row count and
+    truncation flag
+    """
+    def generate():
+        row_count = 0
+        try:
+            for kind, payload in batches:
+                if kind == "columns":
+                    columns = payload
+                    header = {"columns": columns}
+                    if source:
+                        header["source"] = source
+                    yield dumps(header) + b"\n"
+                elif kind == "rows":
+                    row_count += len(payload)
+                    yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in payload)
+                else:
+                    yield dumps({"status": "success", "row_count": row_count, "truncated": payload}) + b"\n"
+        except Exception as e:
+            print(f"[ERROR] Streaming query error: {e}")
+            yield dumps({"status": "error", "row_count": row_count, "detail": str(e)}) + b"\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def _check_layout(layout: str) -> str:
+    """Validate the `layout` query param (400 on unknown values)"""
+    try:
+        return validate_layout(layout)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Columns accepted by /filter-options (validated to prevent SQL injection)
+FILTER_OPTION_COLUMNS = (
+    # Space versions (legacy)
+    "ENGINE PROGRAM", "Configuration", "Parent Part Supplier",
+    "Level 2 Raw Material Supplier", "HW OWNER", "Part Number",
+    "Module", "Level 1 Raw Type", "Level 2 Raw Type", "ESN",
+    "Engine Demand Family", "Target Ship Date",
+    # Underscore versions (actual DuckDB columns)
+    "ENGINE_PROGRAM", "CONFIGURATION", "Parent_Part_Supplier",
+    "Level_2_Raw_Material_Supplier", "HW_OWNER", "Part_Number",
+    "MODULE", "Level_1_Raw_Type", "Level_2_Raw_Type",
+    "Target_Ship_Date", "Level_2_PN"
+)
+
+
+async def _load_filter_options(column: str, extract: Optional[str] = None) -> List[str]:
+    """Unique values (or ship years with extract=year) for a validated filter column"""
+    if column not in FILTER_OPTION_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Invalid column: {column}")
+    
+    # Special handling for date extraction
+    if (column == "Target Ship Date" or column == "Target_Ship_Date") and extract == "year":
+        return await duckdb_service.run(duckdb_service.get_years_from_date, column)
+    return await duckdb_service.run(duckdb_service.get_unique_values, column)
+
+
+def _response_format(request: Request, format: Optional[str]) -> str:
+    """Negotiate json/arrow/parquet from `format=` or the Accept header (400 on unknown values)"""
+    try:
+        return negotiate_format(request.headers.get("accept"), format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _run_adhoc_query(request: Request, sql: str, max_rows: Optional[int], stream: bool,
+                           source: Optional[str] = None, layout: str = "rows"):
+    """Validate, cap and execute an ad-hoc SELECT with timeout and disconnect cancellation"""
+    layout = _check_layout(layout)
+    try:
+        statement = validate_select(sql)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    row_cap = effective_max_rows(max_rows)
+    if stream:
+        # Start the query before the response so SQL errors still get a 400 status
+        batches = duckdb_service.iter_query_batches(statement, row_cap, STREAM_BATCH_ROWS, QUERY_TIMEOUT_S)
+        try:
+            columns = await duckdb_service.run(next, batches)
+        except SQL_USER_ERRORS as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _stream_query_response(itertools.chain([columns], batches), source)
+    
+    start_time = time.time()
+    try:
+        result = await duckdb_service.run_guarded(
+            duckdb_service.query_limited, statement, row_cap, layout,
+            timeout=QUERY_TIMEOUT_S, is_disconnected=request.is_disconnected
+        )
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except QueryCancelled as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except SQL_USER_ERRORS as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    elapsed = time.time() - start_time
+    
+    response = {
+        "status": "success",
+        "row_count": result["row_count"],
+        "truncated": result["truncated"],
+        "max_rows": row_cap,
+        "layout": layout,
+        "execution_time_ms": f"{elapsed*1000:.2f}",
+        "data": result["data"]
+    }
+    if source:
+        response["source"] = source
+    return FastJSONResponse(content=response)
+
+
+@router.api_route("/filter", methods=["GET", "POST"])
 async def filter_data(
+    request: Request,
     product_lines: Optional[List[str]] = Query(None),
     years: Optional[List[str]] = Query(None),
     configs: Optional[List[str]] = Query(None),
@@ -21,18 +155,31 @@ async def filter_data(
     rm_suppliers: Optional[List[str]] = Query(None),
     hw_owners: Optional[List[str]] = Query(None),
     part_numbers: Optional[List[str]] = Query(None),
-    modules: Optional[List[str]] = Query(None)
+    modules: Optional[List[str]] = Query(None),
+    fields: Optional[List[str]] = Query(None),
+    sort: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1),
+    format: Optional[str] = Query(None)
 ):
     """
     Ultra-fast multi-column filtering using DuckDB SQL
     
     Query params can be repeated:
     ?product_lines=LM2500&product_lines=LM6000&suppliers=Supplier1
+    
+    - fields=ESN,Part_Number (or repeated) returns only those columns
+    - sort=Part_Number,-ESN orders the result ("-" = descending)
+    - skip/limit paginate (limit capped by AEO_QUERY_MAX_ROWS); total/hasMore report the rest
+    
+    format=arrow|parquet (or an Accept header) returns an Arrow IPC stream / Parquet file
     """
     try:
         if not duckdb_service:
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
+        response_format = _response_format(request, format)
+        limit = effective_max_rows(limit)
         start_time = time.time()
         
         # Build filter dictionary
@@ -52,19 +199,36 @@ async def filter_data(
         if modules:
             filters["Module"] = modules
         
-        # Execute filter using DuckDB
-        filtered_df = duckdb_service.filter_data(filters)
-        result = filtered_df.to_dicts()
+        field_list = [f.strip() for item in (fields or []) for f in item.split(",") if f.strip()]
+        
+        # Filter, projection, sort and pagination run as one DuckDB query (own cursor)
+        try:
+            total, table = await duckdb_service.run(
+                duckdb_service.filter_rows, filters, field_list or None, sort, skip, limit, years
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         elapsed = time.time() - start_time
         
-        return {
+        if response_format != "json":
+            headers = pagination_headers(total, skip, limit, table.num_rows, elapsed)
+            return binary_response(table, response_format, headers)
+        
+        return FastJSONResponse(content={
             "status": "success",
-            "row_count": len(result),
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "hasMore": (skip + limit) < total,
+            "row_count": table.num_rows,
+            "fields": table.column_names,
             "execution_time_ms": f"{elapsed*1000:.2f}",
-            "data": result
-        }
+            "data": arrow_records(table)
+        })
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Filter endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -96,28 +260,7 @@ async def get_filter_options(column: str, extract: Optional[str] = None):
         
         start_time = time.time()
         
-        # Validate column name to prevent SQL injection
-        valid_columns = [
-            # Space versions (legacy)
-            "ENGINE PROGRAM", "Configuration", "Parent Part Supplier",
-            "Level 2 Raw Material Supplier", "HW OWNER", "Part Number",
-            "Module", "Level 1 Raw Type", "Level 2 Raw Type", "ESN",
-            "Engine Demand Family", "Target Ship Date",
-            # Underscore versions (actual DuckDB columns)
-            "ENGINE_PROGRAM", "CONFIGURATION", "Parent_Part_Supplier",
-            "Level_2_Raw_Material_Supplier", "HW_OWNER", "Part_Number",
-            "MODULE", "Level_1_Raw_Type", "Level_2_Raw_Type",
-            "Target_Ship_Date", "Level_2_PN"
-        ]
-        
-        if column not in valid_columns:
-            raise HTTPException(status_code=400, detail=f"Invalid column: {column}")
-        
-        # Special handling for date extraction
-        if (column == "Target Ship Date" or column == "Target_Ship_Date") and extract == "year":
-            values = duckdb_service.get_years_from_date(column)
-        else:
-            values = duckdb_service.get_unique_values(column)
+        values = await _load_filter_options(column, extract)
         
         elapsed = time.time() - start_time
         
@@ -136,6 +279,54 @@ async def get_filter_options(column: str, extract: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Upper bound on typeahead matches per request
+SEARCH_PARTS_MAX_LIMIT = 200
+
+
+@router.get("/search/parts")
+async def search_parts(
+    prefix: str = Query("", max_length=100, description="Leading characters of a part number or ESN"),
+    limit: int = Query(10, ge=1, le=SEARCH_PARTS_MAX_LIMIT),
+    fields: Optional[str] = Query(None, description="Comma-separated columns: Part_Number, Level_2_PN, ESN (default all)")
+):
+    """
+    Typeahead search over part numbers (Level 1 and Level 2) and ESNs
+    
+    Served from an in-memory sorted prefix index built at load, so the dropdown
+    asks for the top matches as the user types instead of downloading every
+    distinct value. Matching is case-insensitive; results are in value order.
+    
+    Returns: {"matches": [{"value", "field", "rows"}, ...]}
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        try:
+            matches = duckdb_service.search_parts(prefix, limit=limit, fields=field_list)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "prefix": prefix,
+            "match_count": len(matches),
+            "execution_time_ms": f"{elapsed*1000:.3f}",
+            "matches": matches
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Part search endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/stats")
 async def get_stats():
     """Get data statistics from DuckDB"""
@@ -143,7 +334,7 @@ async def get_stats():
         if not duckdb_service:
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
-        stats = duckdb_service.get_summary_stats()
+        stats = await duckdb_service.run(duckdb_service.get_summary_stats)
         
         return {
             "status": "success",
@@ -154,30 +345,48 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/query")
-async def execute_query(sql: str):
+@router.get("/diagnostics/duckdb")
+async def get_duckdb_diagnostics():
     """
-    Execute a custom SQL query on DuckDB
-    WARNING: Only use for internal/trusted queries
+    DuckDB resource profile for this process: configured values (and whether they
+    came from AEO_DUCKDB_CONFIG or environment variables), the effective settings
+    reported by DuckDB, and query pool counters
     """
     try:
         if not duckdb_service:
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
-        # Basic security: limit query execution
-        if not sql.strip().upper().startswith("SELECT"):
-            raise HTTPException(status_code=400, detail="Only SELECT queries allowed")
-        
-        start_time = time.time()
-        result = duckdb_service.query(sql)
-        elapsed = time.time() - start_time
+        diagnostics = await duckdb_service.run(duckdb_service.get_resource_diagnostics)
         
         return {
             "status": "success",
-            "row_count": len(result),
-            "execution_time_ms": f"{elapsed*1000:.2f}",
-            "data": result
+            **diagnostics
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Diagnostics endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/query")
+async def execute_query(request: Request, sql: str, max_rows: Optional[int] = None, stream: bool = False,
+                        layout: str = "rows"):
+    """
+    Execute a custom SQL query on DuckDB
+    WARNING: Only use for internal/trusted queries
+    
+    - Single SELECT only; file/env access functions are rejected before execution
+    - Interrupted after AEO_QUERY_TIMEOUT_S or when the client disconnects
+    - At most max_rows rows (capped by AEO_QUERY_MAX_ROWS); "truncated" flags the cut
+    - stream=true returns NDJSON in batches instead of one JSON document
+    - layout=columnar returns {"columns": [...], "data": {column: [values]}}
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        return await _run_adhoc_query(request, sql, max_rows, stream, layout=layout)
     
     except HTTPException:
         raise
@@ -187,30 +396,45 @@ async def execute_query(sql: str):
 
 
 @router.get("/output-data")
-async def get_output_data(skip: int = 0, limit: int = 1000):
+async def get_output_data(request: Request, skip: int = 0, limit: int = 1000, format: Optional[str] = None):
     """
     Get data from Output sheet of Dummy Data_v6.xlsx
     Supports pagination for large datasets
+    
+    format=arrow|parquet (or an Accept header) returns an Arrow IPC stream / Parquet
+    file with pagination in X-Total-Count / X-Has-More / ... headers
     """
     try:
         if not duckdb_service:
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
-        if not duckdb_service.output_df:
+        if duckdb_service.output_df is None:
             raise HTTPException(status_code=404, detail="Output sheet not loaded")
         
+        response_format = _response_format(request, format)
         start_time = time.time()
         
-        # Query all data with pagination
-        sql = f"SELECT * FROM output_data LIMIT {limit} OFFSET {skip}"
-        result = duckdb_service.query_output_data(sql)
+        def fetch_page():
+            # Query all data with pagination
+            sql = f"SELECT * FROM output_data LIMIT {int(limit)} OFFSET {int(skip)}"
+            if response_format == "json":
+                result = duckdb_service.query_output_data(sql)
+            else:
+                result = duckdb_service._fetch_arrow(sql)
+            
+            # Get total count
+            total = duckdb_service._fetchall("SELECT COUNT(*) FROM output_data")[0][0]
+            return result, total
         
-        # Get total count
-        total = duckdb_service.conn.execute("SELECT COUNT(*) FROM output_data").fetchall()[0][0]
+        result, total = await duckdb_service.run(fetch_page)
         
         elapsed = time.time() - start_time
         
-        return {
+        if response_format != "json":
+            headers = pagination_headers(total, skip, limit, result.num_rows, elapsed)
+            return binary_response(result, response_format, headers)
+        
+        return FastJSONResponse(content={
             "status": "success",
             "source": "Output sheet from Dummy Data_v6.xlsx",
             "total_rows": total,
@@ -219,7 +443,7 @@ async def get_output_data(skip: int = 0, limit: int = 1000):
             "returned_rows": len(result),
             "execution_time_ms": f"{elapsed*1000:.2f}",
             "data": result
-        }
+        })
     
     except HTTPException:
         raise
@@ -238,11 +462,11 @@ async def get_output_info():
         if not duckdb_service:
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
-        if not duckdb_service.output_df:
+        if duckdb_service.output_df is None:
             raise HTTPException(status_code=404, detail="Output sheet not loaded")
         
         start_time = time.time()
-        info = duckdb_service.get_output_sheet_info()
+        info = await duckdb_service.run(duckdb_service.get_output_sheet_info)
         elapsed = time.time() - start_time
         
         return {
@@ -260,7 +484,8 @@ async def get_output_info():
 
 
 @router.get("/output-query")
-async def query_output_data(sql: str):
+async def query_output_data(request: Request, sql: str, max_rows: Optional[int] = None, stream: bool = False,
+                            layout: str = "rows"):
     """
     Execute a custom SQL query on the Output sheet data
     The table name is 'output_data'
@@ -269,29 +494,18 @@ async def query_output_data(sql: str):
     /api/output-query?sql=SELECT * FROM output_data LIMIT 10
     /api/output-query?sql=SELECT COUNT(*) FROM output_data
     /api/output-query?sql=SELECT DISTINCT column_name FROM output_data
+    
+    Same limits as /api/query (timeout, row cap, stream=true)
     """
     try:
         if not duckdb_service:
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
-        if not duckdb_service.output_df:
+        if duckdb_service.output_df is None:
             raise HTTPException(status_code=404, detail="Output sheet not loaded")
         
-        # Basic security: limit query execution
-        if not sql.strip().upper().startswith("SELECT"):
-            raise HTTPException(status_code=400, detail="Only SELECT queries allowed")
-        
-        start_time = time.time()
-        result = duckdb_service.query_output_data(sql)
-        elapsed = time.time() - start_time
-        
-        return {
-            "status": "success",
-            "source": "Output sheet from Dummy Data_v6.xlsx",
-            "row_count": len(result),
-            "execution_time_ms": f"{elapsed*1000:.2f}",
-            "data": result
-        }
+        return await _run_adhoc_query(request, sql, max_rows, stream, source="Output sheet from Dummy Data_v6.xlsx",
+                                      layout=layout)
     
     except HTTPException:
         raise
@@ -311,52 +525,9 @@ async def get_datatable_filter_options():
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
         start_time = time.time()
-        main_table = duckdb_service._get_main_table()
-        
-        # Get all unique values for each filter column in parallel using DuckDB
-        filter_options = {}
-        
-        # Safely get column names
-        column_check = duckdb_service.conn.execute(f"SELECT * FROM {main_table} LIMIT 0").description
-        column_names = [col[0] for col in column_check]
-        
-        # Map filter names to actual column names
-        filter_columns = {
-            "productLines": "ENGINE_PROGRAM" if "ENGINE_PROGRAM" in column_names else "ENGINE PROGRAM",
-            "configs": "Configuration" if "Configuration" in column_names else None,
-            "suppliers": "Parent_Part_Supplier" if "Parent_Part_Supplier" in column_names else "Parent Part Supplier",
-            "rmSuppliers": "Level_2_Raw_Material_Supplier" if "Level_2_Raw_Material_Supplier" in column_names else "Level 2 Raw Material Supplier",
-            "hwOwners": "HW_Owner" if "HW_Owner" in column_names else "HW OWNER",
-            "modules": "Module" if "Module" in column_names else None,
-            "partNumbers": "Level_1_PN" if "Level_1_PN" in column_names else "Part Number",
-        }
-        
-        # Get unique values for each filter
-        for filter_name, col_name in filter_columns.items():
-            if col_name and col_name in column_names:
-                values = duckdb_service.conn.execute(f"""
-                    SELECT DISTINCT "{col_name}" as value
-                    FROM {main_table}
-                    WHERE "{col_name}" IS NOT NULL AND TRIM(CAST("{col_name}" AS VARCHAR)) != ''
-                    ORDER BY value
-                """).fetchall()
-                filter_options[filter_name] = [v[0] for v in values if v[0]]
-            else:
-                filter_options[filter_name] = []
-        
-        # Get years from Target_Ship_Date
-        date_col = "Target_Ship_Date" if "Target_Ship_Date" in column_names else "Target Ship Date"
-        if date_col in column_names:
-            years = duckdb_service.conn.execute(f"""
-                SELECT DISTINCT CAST(YEAR(TRY_CAST("{date_col}" AS DATE)) AS VARCHAR) as year
-                FROM {main_table}
-                WHERE "{date_col}" IS NOT NULL
-                ORDER BY year DESC
-            """).fetchall()
-            filter_options["years"] = [y[0] for y in years if y[0]]
-        else:
-            filter_options["years"] = []
-        
+        filter_options = await duckdb_service.run_shared(
+            "datatable_filter_options", duckdb_service.get_datatable_filter_options
+        )
         elapsed = time.time() - start_time
         
         return {
@@ -374,6 +545,7 @@ async def get_datatable_filter_options():
 
 @router.post("/datatable/filter")
 async def filter_datatable(
+    request: Request,
     productLines: Optional[List[str]] = Query(None),
     year: Optional[str] = Query(None),
     configs: Optional[List[str]] = Query(None),
@@ -382,114 +554,455 @@ async def filter_datatable(
     hwOwners: Optional[List[str]] = Query(None),
     modules: Optional[List[str]] = Query(None),
     partNumbers: Optional[List[str]] = Query(None),
-    skip: int = Query(0),
-    limit: int = Query(1000)
+    q: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1),
+    cursor: Optional[str] = Query(None),
+    layout: str = Query("rows"),
+    format: Optional[str] = Query(None)
 ):
     """
     Server-side filtering using DuckDB SQL - ULTRA FAST
     Returns paginated results after applying filters
+    
+    Rows come in a stable order (program, config, ESN, part, L2 part). Every page
+    returns "next", an opaque cursor for the following page; pass it back as
+    cursor=... (cursor= with no value starts at page 1) to page without OFFSET
+    scans. skip still works for random access. The total is counted once per
+    filter set.
+    
+    - sort=Part_Number,-ESN sorts server-side ("-" = descending), ahead of the stable order
+    - q=... case-insensitive substring search over part numbers, ESN, descriptions
+      and suppliers (precomputed search index)
+    
+    layout=columnar returns data as {"columns": [...], "data": {column: [values]}}
+    format=arrow|parquet (or Accept: application/vnd.apache.arrow.stream /
+    application/vnd.apache.parquet) returns the page as an Arrow IPC stream or
+    Parquet file; total/skip/limit/hasMore move to X-* headers
     """
     try:
         if not duckdb_service:
             raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
+        layout = _check_layout(layout)
+        response_format = _response_format(request, format)
         start_time = time.time()
-        main_table = duckdb_service._get_main_table()
-        
-        # Get column names
-        column_check = duckdb_service.conn.execute(f"SELECT * FROM {main_table} LIMIT 0").description
-        column_names = [col[0] for col in column_check]
-        
-        # Map to actual column names
-        col_map = {
-            "ENGINE_PROGRAM": "ENGINE_PROGRAM" if "ENGINE_PROGRAM" in column_names else "ENGINE PROGRAM",
-            "Configuration": "Configuration" if "Configuration" in column_names else None,
-            "Parent_Part_Supplier": "Parent_Part_Supplier" if "Parent_Part_Supplier" in column_names else "Parent Part Supplier",
-            "Level_2_Raw_Material_Supplier": "Level_2_Raw_Material_Supplier" if "Level_2_Raw_Material_Supplier" in column_names else "Level 2 Raw Material Supplier",
-            "HW_Owner": "HW_Owner" if "HW_Owner" in column_names else "HW OWNER",
-            "Module": "Module" if "Module" in column_names else None,
-            "Level_1_PN": "Level_1_PN" if "Level_1_PN" in column_names else "Part Number",
-            "Target_Ship_Date": "Target_Ship_Date" if "Target_Ship_Date" in column_names else "Target Ship Date",
-        }
-        
-        # Build WHERE clause
-        where_clauses = []
-        params = []
-        
-        if productLines:
-            placeholders = ','.join(['?' for _ in productLines])
-            where_clauses.append(f'"{col_map["ENGINE_PROGRAM"]}" IN ({placeholders})')
-            params.extend(productLines)
-        
-        if year:
-            where_clauses.append(f'YEAR(TRY_CAST("{col_map["Target_Ship_Date"]}" AS DATE)) = ?')
-            params.append(int(year))
-        
-        if configs and col_map["Configuration"]:
-            placeholders = ','.join(['?' for _ in configs])
-            where_clauses.append(f'"{col_map["Configuration"]}" IN ({placeholders})')
-            params.extend(configs)
         
-        if suppliers:
-            placeholders = ','.join(['?' for _ in suppliers])
-            where_clauses.append(f'"{col_map["Parent_Part_Supplier"]}" IN ({placeholders})')
-            params.extend(suppliers)
-        
-        if rmSuppliers:
-            placeholders = ','.join(['?' for _ in rmSuppliers])
-            where_clauses.append(f'"{col_map["Level_2_Raw_Material_Supplier"]}" IN ({placeholders})')
-            params.extend(rmSuppliers)
+        filters = {
+            "productLines": productLines,
+            "year": year,
+            "configs": configs,
+            "suppliers": suppliers,
+            "rmSuppliers": rmSuppliers,
+            "hwOwners": hwOwners,
+            "modules": modules,
+            "partNumbers": partNumbers,
+            "q": q,
+        }
         
-        if hwOwners:
-            placeholders = ','.join(['?' for _ in hwOwners])
-            where_clauses.append(f'"{col_map["HW_Owner"]}" IN ({placeholders})')
-            params.extend(hwOwners)
+        try:
+            if response_format != "json":
+                total, table, next_cursor = await duckdb_service.run(
+                    duckdb_service.filter_datatable_arrow, filters, skip, limit, cursor, sort
+                )
+                headers = pagination_headers(total, skip, limit, table.num_rows, time.time() - start_time)
+                headers["X-Has-More"] = "true" if next_cursor else "false"
+                if next_cursor:
+                    headers["X-Next-Cursor"] = next_cursor
+                return binary_response(table, response_format, headers)
+            
+            page = await duckdb_service.run(
+                duckdb_service.filter_datatable, filters, skip, limit, layout, cursor, sort
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        total = page["total"]
+        data = page["data"]
         
-        if modules and col_map["Module"]:
-            placeholders = ','.join(['?' for _ in modules])
-            where_clauses.append(f'"{col_map["Module"]}" IN ({placeholders})')
-            params.extend(modules)
+        elapsed = time.time() - start_time
         
-        if partNumbers:
-            placeholders = ','.join(['?' for _ in partNumbers])
-            where_clauses.append(f'"{col_map["Level_1_PN"]}" IN ({placeholders})')
-            params.extend(partNumbers)
+        return FastJSONResponse(content={
+            "status": "success",
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "hasMore": page["next"] is not None,
+            "next": page["next"],
+            "returned_rows": page["row_count"],
+            "layout": layout,
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            "data": data
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Datatable filter endpoint error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/datatable/facets")
+async def get_datatable_facets(
+    productLines: Optional[List[str]] = Query(None),
+    year: Optional[str] = Query(None),
+    configs: Optional[List[str]] = Query(None),
+    suppliers: Optional[List[str]] = Query(None),
+    rmSuppliers: Optional[List[str]] = Query(None),
+    hwOwners: Optional[List[str]] = Query(None),
+    modules: Optional[List[str]] = Query(None),
+    partNumbers: Optional[List[str]] = Query(None),
+    q: Optional[str] = Query(None)
+):
+    """
+    Matching row counts per value of every datatable filter, under the current
+    filters (same params as /api/datatable/filter)
+    
+    Each filter's counts ignore its own selection, so they show how many rows
+    picking another value would give. Answered with popcounts over the in-memory
+    filter bitmaps unless q is set.
+    
+    Returns: {"total": N, "facets": {"productLines": {"LM2500": 1080, ...}, ...}}
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
         
-        # Build final query
-        where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+        start_time = time.time()
         
-        # Get total count
-        count_query = f"SELECT COUNT(*) FROM {main_table} WHERE {where_sql}"
-        total = duckdb_service.conn.execute(count_query, params).fetchall()[0][0]
+        filters = {
+            "productLines": productLines,
+            "year": year,
+            "configs": configs,
+            "suppliers": suppliers,
+            "rmSuppliers": rmSuppliers,
+            "hwOwners": hwOwners,
+            "modules": modules,
+            "partNumbers": partNumbers,
+            "q": q,
+        }
         
-        # Get paginated data
-        data_query = f"SELECT * FROM {main_table} WHERE {where_sql} LIMIT ? OFFSET ?"
-        result = duckdb_service.conn.execute(data_query, params + [limit, skip]).fetchall()
-        columns = [col[0] for col in duckdb_service.conn.description]
+        def compute():
+            return duckdb_service.count_datatable(filters), duckdb_service.get_datatable_facets(filters)
         
-        data = [dict(zip(columns, row)) for row in result]
+        try:
+            total, facets = await duckdb_service.run(compute)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         elapsed = time.time() - start_time
-        has_more = (skip + limit) < total
         
-        return {
+        return FastJSONResponse({
             "status": "success",
             "total": total,
-            "skip": skip,
-            "limit": limit,
-            "hasMore": has_more,
-            "returned_rows": len(data),
             "execution_time_ms": f"{elapsed*1000:.2f}",
-            "data": data
+            "facets": facets
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Datatable facets endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/datatable/export")
+async def export_datatable(
+    format: str = Query("csv"),
+    productLines: Optional[List[str]] = Query(None),
+    year: Optional[str] = Query(None),
+    configs: Optional[List[str]] = Query(None),
+    suppliers: Optional[List[str]] = Query(None),
+    rmSuppliers: Optional[List[str]] = Query(None),
+    hwOwners: Optional[List[str]] = Query(None),
+    modules: Optional[List[str]] = Query(None),
+    partNumbers: Optional[List[str]] = Query(None),
+    q: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None)
+):
+    """
+    Export the full filtered datatable result (same filters, q and sort as /api/datatable/filter)
+    
+    - format=csv / parquet: streamed from a DuckDB record batch reader as it is produced
+    - format=xlsx: written with a write-only workbook to a temp file, then sent
+    Memory stays flat regardless of the number of exported rows.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        export_format = format.lower()
+        if export_format not in EXPORT_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown export format '{format}' - expected one of: {', '.join(EXPORT_FORMATS)}"
+            )
+        
+        filters = {
+            "productLines": productLines,
+            "year": year,
+            "configs": configs,
+            "suppliers": suppliers,
+            "rmSuppliers": rmSuppliers,
+            "hwOwners": hwOwners,
+            "modules": modules,
+            "partNumbers": partNumbers,
+            "q": q,
         }
+        try:
+            duckdb_service.parse_sort(sort)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        filename = f"aeo-datatable-{time.strftime('%Y%m%d-%H%M%S')}"
+        print(f"[EXPORT] Datatable export started - format={export_format}")
+        
+        if export_format != "xlsx":
+            try:
+                schema, batches = await duckdb_service.run(
+                    duckdb_service.open_datatable_export, filters, sort=sort
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return stream_batches_response(schema, batches, export_format, attachment_headers(filename, export_format))
+        
+        try:
+            total = await duckdb_service.run(duckdb_service.count_datatable, filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if total > XLSX_MAX_ROWS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{total} rows exceed the XLSX sheet limit of {XLSX_MAX_ROWS} - use format=csv or parquet"
+            )
+        
+        fd, path = tempfile.mkstemp(prefix="aeo-export-", suffix=".xlsx")
+        os.close(fd)
+        
+        def write_export():
+            schema, batches = duckdb_service.open_datatable_export(filters, sort=sort)
+            try:
+                return write_xlsx(schema, batches, path)
+            finally:
+                batches.close()
+        
+        try:
+            row_count = await duckdb_service.run(write_export)
+        except Exception:
+            os.remove(path)
+            raise
+        
+        print(f"[EXPORT] ✓ Wrote {row_count} rows to XLSX")
+        return FileResponse(
+            path,
+            media_type=media_type("xlsx"),
+            filename=f"{filename}.xlsx",
+            background=BackgroundTask(os.remove, path)
+        )
     
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[ERROR] Datatable filter endpoint error: {e}")
+        print(f"[ERROR] Datatable export endpoint error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================
+# Batch endpoint - dashboard bootstrap fan-out
+# ============================================
+
+# Upper bound on sub-requests per batch
+BATCH_MAX_REQUESTS = 32
+
+
+class BatchItem(BaseModel):
+    id: str
+    op: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+
+async def _batch_filter_options(params: Dict[str, Any]):
+    return await _load_filter_options(params.get("column", ""), params.get("extract"))
+
+
+async def _batch_datatable_filter_options(params: Dict[str, Any]):
+    return await duckdb_service.run_shared("datatable_filter_options", duckdb_service.get_datatable_filter_options)
+
+
+async def _batch_stats(params: Dict[str, Any]):
+    return await duckdb_service.run(duckdb_service.get_summary_stats)
+
+
+async def _batch_chart_data(params: Dict[str, Any]):
+    return await duckdb_service.run_shared("cdata", duckdb_service.get_cdata_cached)
+
+
+async def _batch_demand_programs(params: Dict[str, Any]):
+    skip = int(params.get("skip", 0))
+    limit = int(params.get("limit", 50))
+    
+    def fetch_page():
+        return (
+            duckdb_service.get_demand_chunk(skip, limit),
+            duckdb_service.get_demand_data_count(),
+        )
+    
+    data, total = await duckdb_service.run_shared(("demand_programs", skip, limit), fetch_page)
+    return {"data": data, "total": total, "skip": skip, "limit": limit, "hasMore": (skip + limit) < total}
+
+
+async def _batch_datatable_filter(params: Dict[str, Any]):
+    filters = {name: params.get(name) for name in duckdb_service.DATATABLE_LIST_FILTERS}
+    filters["year"] = params.get("year")
+    filters["q"] = params.get("q")
+    skip = int(params.get("skip", 0))
+    limit = int(params.get("limit", 1000))
+    layout = validate_layout(params.get("layout", "rows"))
+    page = await duckdb_service.run(
+        duckdb_service.filter_datatable, filters, skip, limit, layout, params.get("cursor"), params.get("sort")
+    )
+    return {**page, "skip": skip, "limit": limit, "hasMore": page["next"] is not None}
+
+
+async def _batch_datatable_facets(params: Dict[str, Any]):
+    filters = {name: params.get(name) for name in duckdb_service.DATATABLE_LIST_FILTERS}
+    filters["year"] = params.get("year")
+    filters["q"] = params.get("q")
+    
+    def compute():
+        return {
+            "total": duckdb_service.count_datatable(filters),
+            "facets": duckdb_service.get_datatable_facets(filters),
+        }
+    
+    return await duckdb_service.run(compute)
+
+
+# Sub-request operations: op name -> async handler(params)
+BATCH_OPS = {
+    "filter_options": _batch_filter_options,
+    "datatable_filter_options": _batch_datatable_filter_options,
+    "stats": _batch_stats,
+    "chart_data": _batch_chart_data,
+    "demand_programs": _batch_demand_programs,
+    "datatable_filter": _batch_datatable_filter,
+    "datatable_facets": _batch_datatable_facets,
+}
+
+
+async def _run_batch_item(item: BatchItem) -> Dict[str, Any]:
+    """Run one sub-request; failures are reported per item instead of failing the batch"""
+    start_time = time.time()
+    try:
+        handler = BATCH_OPS.get(item.op)
+        if handler is None:
+            raise ValueError(f"Unknown op '{item.op}' - expected one of: {', '.join(BATCH_OPS)}")
+        data = await handler(item.params)
+        result = {"id": item.id, "status": "success", "data": data}
+    except HTTPException as e:
+        result = {"id": item.id, "status": "error", "status_code": e.status_code, "detail": e.detail}
+    except ValueError as e:
+        result = {"id": item.id, "status": "error", "status_code": 400, "detail": str(e)}
+    except Exception as e:
+        print(f"[ERROR] Batch sub-request {item.id} ({item.op}) error: {e}")
+        result = {"id": item.id, "status": "error", "status_code": 500, "detail": str(e)}
+    result["execution_time_ms"] = f"{(time.time() - start_time)*1000:.2f}"
+    return result
+
+
+@router.post("/batch")
+async def run_batch(batch: BatchRequest):
+    """
+    Run several named sub-requests in one round trip (dashboard bootstrap)
+    
+    Body: {"requests": [{"id": "programs", "op": "filter_options",
+                         "params": {"column": "ENGINE PROGRAM"}}, ...]}
+    
+    Ops: filter_options (column, extract), datatable_filter_options, stats,
+    chart_data, demand_programs (skip, limit), datatable_filter (same params as
+    /api/datatable/filter), datatable_facets (filter params).
+    
+    Sub-requests run concurrently in the query pool while the batch holds the read
+    side of the snapshot lock, so ingests cannot change data between them.
+    Results are keyed by id; a failing sub-request does not fail the others.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        if len(batch.requests) > BATCH_MAX_REQUESTS:
+            raise HTTPException(
+                status_code=400, detail=f"At most {BATCH_MAX_REQUESTS} sub-requests per batch"
+            )
+        ids = [item.id for item in batch.requests]
+        if len(set(ids)) != len(ids):
+            raise HTTPException(status_code=400, detail="Sub-request ids must be unique")
+        
+        start_time = time.time()
+        async with duckdb_service.snapshot.read():
+            results = await asyncio.gather(*(_run_batch_item(item) for item in batch.requests))
+        elapsed = time.time() - start_time
+        
+        failed = sum(1 for r in results if r["status"] != "success")
+        return FastJSONResponse(content={
+            "status": "success" if not failed else "partial",
+            "request_count": len(results),
+            "failed": failed,
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            "results": {r["id"]: r for r in results}
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Batch endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ingest/delta")
+async def ingest_delta(file: UploadFile = File(...)):
+    """
+    Upsert a delta file (CSV or Parquet, main-table column names) into the main
+    table, keyed on (ESN, Part_Number, Level_2_PN)
+    
+    Holds the snapshot write lock, so batches never see a half-applied delta.
+    Only the touched ESNs / parts / programs / configs are refreshed. Needs a
+    read-write worker (409 otherwise) - multi-worker deployments use
+    `python ingest_delta.py` before the workers start.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        content = await file.read()
+        suffix = ".parquet" if (file.filename or "").lower().endswith(".parquet") else ".csv"
+        
+        with csv_upload_file(content, "aeo-delta-", suffix) as path:
+            relation, params = duckdb_service.delta_source(path)
+            try:
+                async with duckdb_service.snapshot.write():
+                    result = await duckdb_service.run(duckdb_service.apply_delta, relation, params)
+            except PermissionError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            except (ValueError, duckdb.Error) as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        return FastJSONResponse({"status": "success", "filename": file.filename, **result})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Delta ingest endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/demand/programs")
 async def get_demand_programs(skip: int = 0, limit: int = 50):
     """
@@ -507,8 +1020,13 @@ async def get_demand_programs(skip: int = 0, limit: int = 50):
         start_time = time.time()
         
         # Use true server-side pagination
-        paginated_data = duckdb_service.get_demand_data_paginated(skip, limit)
-        total = duckdb_service.get_demand_data_count()
+        def fetch_page():
+            return (
+                duckdb_service.get_demand_chunk(skip, limit),
+                duckdb_service.get_demand_data_count(),
+            )
+        
+        paginated_data, total = await duckdb_service.run_shared(("demand_programs", skip, limit), fetch_page)
         has_more = (skip + limit) < total
         
         elapsed = time.time() - start_time
@@ -544,7 +1062,7 @@ async def get_demand_chart_data():
         start_time = time.time()
         
         # Use the cached cdata transformation
-        chart_data = duckdb_service.get_cdata()
+        chart_data = await duckdb_service.run_shared("cdata", duckdb_service.get_cdata_cached)
         
         elapsed = time.time() - start_time
         
@@ -562,6 +1080,154 @@ async def get_demand_chart_data():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse_event(event: str, data: Any) -> bytes:
+    """One Server-Sent Events message"""
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+@router.get("/demand/stream")
+async def stream_demand_data(request: Request, chunk_size: int = Query(50, ge=1, le=1000)):
+    """
+    Server-Sent Events stream of the demand dashboard data over one connection
+    
+    Events, in order:
+    - progress: {stage, programs_loaded, programs_total, rows_loaded, rows_total, percent}
+    - chunk: {skip, limit, data: [programs...]} - one per page of programs, each
+      followed by a progress event
+    - aggregates: {cdata, stats} - chart data once the hierarchy is complete
+    - done: {programs, rows, execution_time_ms, data_version}
+    - error: {detail, data_version} - the stream ends after an error
+    
+    Chunks and aggregates come from the same per-version caches as
+    /api/demand/programs and /api/demand/chart-data, so each piece is computed
+    once however many dashboards are open.
+    
+    Every piece is read under the snapshot read lock and only while the data
+    version is the one the stream started with. If a delta ingest lands
+    mid-stream, the stream ends with an error event instead of mixing versions;
+    the client reloads. The lock is released between pieces, so a slow client
+    never holds up an ingest.
+    """
+    if not duckdb_service:
+        raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+    
+    async def generate():
+        start_time = time.time()
+        version = duckdb_service.data_version
+        
+        async def read(key, fn, *args):
+            """fn's result for the stream's data version, or None once the data has changed"""
+            async with duckdb_service.snapshot.read():
+                if duckdb_service.data_version != version:
+                    return None
+                # Keyed by version: never join a computation started outside the lock
+                return (await duckdb_service.run_shared(("demand_stream", version, key), fn, *args),)
+        
+        def changed() -> bytes:
+            print("[DEMAND] Data changed mid-stream - stopping")
+            return _sse_event("error", {
+                "detail": "Data changed during the stream - reload to get the new version",
+                "data_version": duckdb_service.data_version,
+            })
+        
+        try:
+            result = await read("program_rows", duckdb_service.get_program_row_counts)
+            if result is None:
+                yield changed()
+                return
+            row_counts = result[0]
+            programs_total = len(row_counts)
+            rows_total = sum(row_counts.values())
+            loaded = {"programs": 0, "rows": 0}
+            
+            def progress(stage: str) -> bytes:
+                return _sse_event("progress", {
+                    "stage": stage,
+                    "programs_loaded": loaded["programs"],
+                    "programs_total": programs_total,
+                    "rows_loaded": loaded["rows"],
+                    "rows_total": rows_total,
+                    "percent": round(100 * loaded["programs"] / programs_total, 1) if programs_total else 100.0,
+                })
+            
+            yield progress("started")
+            
+            for skip in range(0, programs_total, chunk_size):
+                if await request.is_disconnected():
+                    print("[DEMAND] Stream client disconnected - stopping")
+                    return
+                result = await read(("demand_chunk", skip, chunk_size), duckdb_service.get_demand_chunk, skip, chunk_size)
+                if result is None:
+                    yield changed()
+                    return
+                chunk = result[0]
+                loaded["programs"] += len(chunk)
+                loaded["rows"] += sum(row_counts.get(p.get("engineProgram"), 0) for p in chunk)
+                yield _sse_event("chunk", {"skip": skip, "limit": chunk_size, "data": chunk})
+                yield progress("hierarchy")
+            
+            def aggregates():
+                return {"cdata": duckdb_service.get_cdata_cached(), "stats": duckdb_service.get_summary_stats()}
+            
+            result = await read(("demand_aggregates",), aggregates)
+            if result is None:
+                yield changed()
+                return
+            yield _sse_event("aggregates", result[0])
+            yield progress("complete")
+            
+            elapsed = time.time() - start_time
+            yield _sse_event("done", {
+                "programs": loaded["programs"],
+                "rows": loaded["rows"],
+                "execution_time_ms": f"{elapsed*1000:.2f}",
+                "data_version": version,
+            })
+        except Exception as e:
+            print(f"[ERROR] Demand stream error: {e}")
+            yield _sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/esn/{esn}")
+async def get_esn_trace(esn: str):
+    """
+    Drill-down for a single engine: what ESN X needs, from whom, and when
+    
+    Returns program, config, target ship date, Level 1 parts (QPE, supplier,
+    HW owners, raw type) and each part's Level 2 parts (raw type, RM supplier),
+    from one indexed ESN lookup.
+    """
+    try:
+        if not duckdb_service:
+            raise HTTPException(status_code=500, detail="DuckDB service not initialized")
+        
+        start_time = time.time()
+        
+        trace = await duckdb_service.run(duckdb_service.get_esn_trace, esn)
+        if trace is None:
+            raise HTTPException(status_code=404, detail=f"ESN not found: {esn}")
+        
+        elapsed = time.time() - start_time
+        
+        return FastJSONResponse({
+            "status": "success",
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+            **trace
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] ESN trace endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/supplier-details")
 async def get_supplier_details(
     supplier_name: str,
@@ -587,7 +1253,9 @@ async def get_supplier_details(
         start_time = time.time()
         
         # Get demand data from DuckDB
-        demand_data = duckdb_service.get_demand_data()
+        demand_data = await duckdb_service.run(duckdb_service.get_demand_data)
+        lead_times = await duckdb_service.run(duckdb_service.phasing.lead_times)
+        default_lead_time = duckdb_service.phasing.default_days
         
         # Extract supplier details from the demand data
         supplier_details = []
@@ -606,7 +1274,7 @@ async def get_supplier_details(
                             'hwo': part.get('hwo', 'HWO1'),
                             'level': part.get('level', 'L1'),
                             'qpe': part.get('qpe') or part.get('qtyPerEngine', '-'),
-                            'mfgLT': part.get('mfgLT', 50),
+                            'mfgLT': lead_times.get(part.get('pn'), default_lead_time),
                             'demand2025Q1': part.get('demand2025Q1', 0),
                             'demand2025Q2': part.get('demand2025Q2', 0),
                             'demand2025Q3': part.get('demand2025Q3', 0),
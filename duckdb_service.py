@@ -3,20 +3,50 @@ DuckDB Service for ultra-fast data loading, filtering, and aggregations
 DuckDB is an embedded SQL database optimized for OLAP queries and analytical workloads
 """
 
+import os
+import threading
+import time
 import duckdb
 import polars as pl
-import pandas as pd
+import pyarrow as pa
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 from datetime import datetime
-import json
+
+from connection_manager import ConnectionManager
+from duckdb_config import load_resource_profile, RESOURCE_SETTINGS
+from serialization import fetch_arrow, fetch_arrow_batches, shape_arrow, ARROW_BATCH_ROWS
+from pagination import filter_fingerprint, encode_cursor, decode_cursor, TotalCache
+from prefix_index import PrefixIndex
+from bitmap_index import BitmapIndex
+from gap_analysis import GapAnalysis, DEMAND_TABLE, RESULTS_TABLE
+from scenarios import ScenarioManager
+from time_phasing import TimePhasing
+from single_flight import SingleFlight
+from snapshot_lock import SnapshotLock
+from statements import StatementRegistry
 
 
 class DuckDBService:
     """Service for loading and querying data using DuckDB"""
     
     def __init__(self, duckdb_path: str = "data/data.duckdb", data_path: str = "data/AEO-transformed-data.xlsx", 
-                 sheet_name: str = "Sheet1", load_output_sheet: bool = False, df: pl.DataFrame = None):
+                 sheet_name: str = "Sheet1", load_output_sheet: bool = False, df: pl.DataFrame = None,
+                 timer=None, read_only: Optional[bool] = None):
+        # Optional StartupTimer - init phases are recorded into the startup report
+        self.timer = timer
+        
+        # Read-only mode (multi-worker deployments): attach the file without write
+        # locks and never build derived objects - prestart.py builds them once
+        if read_only is None:
+            read_only = os.environ.get("AEO_READ_ONLY", "").lower() in ("1", "true", "yes")
+        self.read_only = read_only
+        
+        # Resource profile (threads, memory_limit, temp_directory, ...) for every connection
+        self.resource_config, self.resource_sources = load_resource_profile()
+        self._df: Optional[pl.DataFrame] = None
+        
         # If dataframe is provided (already loaded), use it directly
         if df is not None:
             self.df = df
@@ -43,6 +73,10 @@ class DuckDBService:
         
         self.load_output_sheet = load_output_sheet
         self.conn: Optional[duckdb.DuckDBPyConnection] = None
+        self.connections: Optional[ConnectionManager] = None
+        self.single_flight = SingleFlight()
+        # Batch requests read under the shared side; ingests take the exclusive side
+        self.snapshot = SnapshotLock()
         self.output_df: Optional[pl.DataFrame] = None
         self.main_table: str = "raw_data"  # Will be set during initialization
         
@@ -58,19 +92,113 @@ class DuckDBService:
         self.target_date_col: str = "Target_Ship_Date"
         self.level2_pn_col: str = "Level_2_PN"
         self.level2_raw_type_col: str = "Level_2_Raw_Type"
+        self.column_names: List[str] = []
+        
+        # Main-table row count, cached for pagination (reset by invalidate_caches)
+        self._row_count: Optional[int] = None
+        
+        # Datatable match counts per filter set (keyset pagination reuses them)
+        self._datatable_totals = TotalCache()
+        
+        # Derived results computed once per data version (demand chunks, chart data, ...)
+        self._derived: Dict[Any, Any] = {}
+        self._derived_lock = threading.Lock()
+        self.data_version = 0
+        
+        # Callbacks run by invalidate_caches() for caches kept outside the service (see on_invalidate)
+        self._invalidation_hooks: List[Callable[[], None]] = []
+        
+        # Precomputed lowercase search text for datatable `q` search (see _build_search_index)
+        self.search_table: Optional[str] = None
+        
+        # Reverse BOM (part -> level 1 parents, configs, programs, ESNs) for where-used lookups
+        self.where_used_table: Optional[str] = None
+        
+        # Typeahead index over part numbers and ESNs (see _build_part_index)
+        self.part_index: Optional[PrefixIndex] = None
+        
+        # Row bitmaps per datatable filter value (see _build_filter_bitmaps)
+        self.filter_bitmaps: Optional[BitmapIndex] = None
+        
+        # Parameterized hierarchy queries with per-statement counters (see _define_statements)
+        self.statements = StatementRegistry()
+        
+        # Demand vs uploaded supplier capacity, built on first use per data version
+        self.gap = GapAnalysis(self)
+        
+        # What-if overlays (date shifts, QPE overrides) evaluated against the baseline
+        self.scenarios = ScenarioManager(self)
+        
+        # Per-part lead times and order-by time phasing of demand
+        self.phasing = TimePhasing(self)
         
         self._initialize_duckdb()
+        
+        # Requests never touch self.conn directly - each unit of work gets its own cursor
+        self.connections = ConnectionManager(self.conn)
+    
+    def cursor(self):
+        """
+        Context manager yielding a DuckDB cursor for the current unit of work
+        
+        Inside run() the job's cursor is reused, so nested service calls share it.
+        """
+        if self.connections is None:
+            return nullcontext(self.conn)
+        return self.connections.cursor()
+    
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking service call in the query thread pool with its own cursor"""
+        return await self.connections.run(fn, *args, **kwargs)
+    
+    async def run_guarded(self, fn, *args, timeout: Optional[float] = None, is_disconnected=None):
+        """Run a blocking call in the pool, interrupting it on timeout or client disconnect"""
+        return await self.connections.run_guarded(fn, *args, timeout=timeout, is_disconnected=is_disconnected)
+    
+    async def run_shared(self, key, fn, *args, **kwargs):
+        """
+        Like run(), but concurrent calls with the same key share one computation
+        
+        Use for expensive, read-only results that many clients request at once.
+        """
+        return await self.single_flight.do(key, lambda: self.run(fn, *args, **kwargs))
+    
+    def _phase(self, name: str):
+        """Time an initialization phase when a startup timer is attached"""
+        return self.timer.phase(name) if self.timer else nullcontext()
+    
+    @property
+    def df(self) -> Optional[pl.DataFrame]:
+        """
+        Main table as a Polars DataFrame
+        
+        For the external DuckDB file this is materialized on first access only -
+        SQL paths never need it, so it is kept out of the startup path.
+        """
+        if self._df is None and self.use_external_db and self.conn is not None and self.main_table:
+            print(f"[DUCKDB] Materializing {self.main_table} as DataFrame...")
+            with self.cursor() as cur:
+                self._df = cur.execute(f"SELECT * FROM {self.main_table}").pl()
+            print(f"     Loaded {self._df.shape[0]:,} rows, {self._df.shape[1]} columns")
+        return self._df
+    
+    @df.setter
+    def df(self, value: Optional[pl.DataFrame]):
+        self._df = value
     
     def _initialize_duckdb(self):
         """Initialize DuckDB connection and load data"""
         try:
             # If using external DuckDB file, connect to it directly
             if self.use_external_db and self.duckdb_path:
-                print(f"Connecting to existing DuckDB file: {self.duckdb_path}...")
-                self.conn = duckdb.connect(str(self.duckdb_path), read_only=False)
+                mode = "read-only" if self.read_only else "read-write"
+                print(f"Connecting to existing DuckDB file: {self.duckdb_path} ({mode})...")
+                with self._phase("duckdb_connect"):
+                    self.conn = duckdb.connect(str(self.duckdb_path), read_only=self.read_only,
+                                               config=self.resource_config)
                 
-                # Get the table names in the database
-                tables = self.conn.execute("SELECT table_name FROM information_schema.tables WHERE table_schema='main'").fetchall()
+                # Get the table names in the database (base tables only - views are ours)
+                tables = self.conn.execute("SELECT table_name FROM information_schema.tables WHERE table_schema='main' AND table_type='BASE TABLE'").fetchall()
                 table_names = [t[0] for t in tables]
                 print(f"[OK] Connected to DuckDB database")
                 print(f"     Source: {self.duckdb_path}")
@@ -90,43 +218,54 @@ class DuckDBService:
                 
                 if main_table:
                     self.main_table = main_table  # Store the main table name
-                    self.df = self.conn.execute(f"SELECT * FROM {main_table}").pl()
-                    print(f"     Loaded {self.df.shape[0]:,} rows, {self.df.shape[1]} columns")
+                    # DataFrame is materialized lazily (see df property)
                 else:
                     print("[WARN] No tables found in DuckDB database")
                     self.df = pl.DataFrame()
             else:
                 # Create in-memory DuckDB connection
-                self.conn = duckdb.connect(':memory:')
+                self.conn = duckdb.connect(':memory:', config=self.resource_config)
                 
                 # If dataframe not provided, load from file
                 if self.df is None:
                     print(f"Loading Excel data into DuckDB from {self.sheet_name}...")
                     print(f"  Using pandas for reading large file...")
-                    try:
-                        df_pd = pd.read_excel(self.data_path, sheet_name=self.sheet_name, dtype=str)
-                        df = pl.from_pandas(df_pd)
-                    except Exception as e:
-                        print(f"  Pandas failed ({e}), trying Polars...")
-                        df = pl.read_excel(self.data_path, sheet_name=self.sheet_name)
+                    with self._phase("excel_load"):
+                        try:
+                            # pandas is only needed for the Excel fallback - import it here
+                            import pandas as pd
+                            df_pd = pd.read_excel(self.data_path, sheet_name=self.sheet_name, dtype=str)
+                            df = pl.from_pandas(df_pd)
+                        except Exception as e:
+                            print(f"  Pandas failed ({e}), trying Polars...")
+                            df = pl.read_excel(self.data_path, sheet_name=self.sheet_name)
                     self.df = df
                 else:
                     print(f"Using pre-loaded DataFrame with {self.df.shape[0]:,} rows...")
                 
-                # Register the DataFrame as a DuckDB table
-                self.conn.register("raw_data", self.df)
+                # Copy the DataFrame into a DuckDB table - registered DataFrames are only
+                # visible to the registering connection, not to per-request cursors
+                self.conn.register("_raw_data_df", self.df)
+                self.conn.execute("CREATE OR REPLACE TABLE raw_data AS SELECT * FROM _raw_data_df")
+                self.conn.unregister("_raw_data_df")
+                self._drop_derived_tables()
                 
                 print(f"[OK] DuckDB initialized with {self.df.shape[0]:,} rows, {self.df.shape[1]} columns")
                 if self.data_path:
                     print(f"     Source: {self.data_path} ({self.sheet_name})")
                 print(f"     Table 'raw_data' registered for SQL queries")
             
+            if self.resource_config:
+                print(f"     Resource profile: {self.resource_config}")
+            
             # Load Output sheet from Dummy Data_v6.xlsx if requested
             if self.load_output_sheet:
-                self._load_output_sheet()
+                with self._phase("output_sheet_load"):
+                    self._load_output_sheet()
             
             # Create useful indexes/views for common queries
-            self._create_indexes()
+            with self._phase("indexes_and_views"):
+                self._create_indexes()
             
         except Exception as e:
             print(f"✗ Error initializing DuckDB: {e}")
@@ -160,6 +299,7 @@ class DuckDBService:
             
             try:
                 # Try using pandas with dtype as string to avoid type inference issues
+                import pandas as pd
                 output_pd = pd.read_excel(output_path, sheet_name="Output", dtype=str)
                 # Convert to Polars for consistency
                 output_df = pl.from_pandas(output_pd)
@@ -174,8 +314,10 @@ class DuckDBService:
             
             self.output_df = output_df
             
-            # Register as output_data table
-            self.conn.register("output_data", output_df)
+            # Copy into output_data table (visible to every cursor)
+            self.conn.register("_output_data_df", output_df)
+            self.conn.execute("CREATE OR REPLACE TABLE output_data AS SELECT * FROM _output_data_df")
+            self.conn.unregister("_output_data_df")
             
             print(f"✓ Output data loaded: {output_df.shape[0]:,} rows, {output_df.shape[1]} columns")
             print(f"  Table 'output_data' registered for SQL queries")
@@ -183,12 +325,108 @@ class DuckDBService:
         except Exception as e:
             print(f"⚠ Error loading Output sheet: {type(e).__name__}: {e}")
     
+    def _detect_columns(self, main_table: str) -> List[str]:
+        """Detect the column naming convention (spaces vs underscores) of the main table"""
+        columns_result = self.conn.execute(f"SELECT * FROM {main_table} LIMIT 0").description
+        column_names = [col[0] for col in columns_result]
+        
+        # Determine which column naming convention is used and store as instance variables
+        self.program_col = "ENGINE_PROGRAM" if "ENGINE_PROGRAM" in column_names else "ENGINE PROGRAM"
+        self.config_col = "Configuration" if "Configuration" in column_names else "CONFIGURATION"
+        self.part_col = "Part_Number" if "Part_Number" in column_names else "Part Number"
+        self.rm_supplier_col = "Level_2_Raw_Material_Supplier" if "Level_2_Raw_Material_Supplier" in column_names else "Level 2 Raw Material Supplier"
+        self.supplier_col = "Parent_Part_Supplier" if "Parent_Part_Supplier" in column_names else "Parent Part Supplier"
+        self.hw_owner_col = "HW_OWNER" if "HW_OWNER" in column_names else "HW OWNER"
+        self.module_col = "Module" if "Module" in column_names else None
+        self.esn_col = "ESN" if "ESN" in column_names else "esn"
+        self.target_date_col = "Target_Ship_Date" if "Target_Ship_Date" in column_names else "Target Ship Date"
+        self.level2_pn_col = "Level_2_PN" if "Level_2_PN" in column_names else "Level 2 PN"
+        self.level2_raw_type_col = "Level_2_Raw_Type" if "Level_2_Raw_Type" in column_names else "Level 2 Raw Type"
+        self.column_names = column_names
+        return column_names
+    
+    def _define_statements(self, main_table: str):
+        """Register the demand hierarchy queries for the detected column layout"""
+        defs = {
+            "demand_programs": f"""
+                SELECT DISTINCT "{self.program_col}" as program
+                FROM {main_table}
+                WHERE "{self.program_col}" IS NOT NULL AND "{self.program_col}" != ''
+                ORDER BY program
+            """,
+            "demand_programs_page": f"""
+                SELECT DISTINCT "{self.program_col}" as program
+                FROM {main_table}
+                WHERE "{self.program_col}" IS NOT NULL AND "{self.program_col}" != ''
+                ORDER BY program
+                LIMIT ? OFFSET ?
+            """,
+            "demand_configs": f"""
+                SELECT DISTINCT "{self.config_col}" as config
+                FROM {main_table}
+                WHERE "{self.program_col}" = ?
+                AND "{self.config_col}" IS NOT NULL AND "{self.config_col}" != ''
+                ORDER BY config
+            """,
+            "demand_esns": f"""
+                SELECT DISTINCT "{self.esn_col}" as esn, "{self.target_date_col}" as target_date
+                FROM {main_table}
+                WHERE "{self.program_col}" = ?
+                AND "{self.config_col}" = ?
+                AND "{self.esn_col}" IS NOT NULL AND "{self.esn_col}" != ''
+                ORDER BY esn
+            """,
+            "level1_parts": f"""
+                SELECT DISTINCT 
+                    "{self.part_col}" as pn,
+                    "{self.hw_owner_col}" as hw_owner,
+                    "{self.supplier_col}" as supplier,
+                    CAST("QPE" AS INTEGER) as qpe
+                FROM {main_table}
+                WHERE "{self.program_col}" = ?
+                AND "{self.config_col}" = ?
+                AND "{self.part_col}" IS NOT NULL AND "{self.part_col}" != ''
+            """,
+            "level2_parts": f"""
+                SELECT DISTINCT
+                    "{self.level2_pn_col}" as pn,
+                    "{self.level2_raw_type_col}" as raw_type,
+                    "{self.rm_supplier_col}" as rm_supplier
+                FROM {main_table}
+                WHERE "{self.program_col}" = ?
+                AND "{self.config_col}" = ?
+                AND "{self.part_col}" = ?
+                AND "{self.level2_pn_col}" IS NOT NULL AND "{self.level2_pn_col}" != ''
+            """,
+        }
+        for name, sql in defs.items():
+            self.statements.define(name, sql)
+    
+    def _existing_indexes(self) -> set:
+        """Names of indexes already present in the database"""
+        try:
+            return {row[0] for row in self.conn.execute("SELECT index_name FROM duckdb_indexes()").fetchall()}
+        except Exception:
+            return set()
+    
+    def _existing_views(self) -> set:
+        """Names of user views already present in the database"""
+        try:
+            return {row[0] for row in self.conn.execute(
+                "SELECT view_name FROM duckdb_views() WHERE NOT internal"
+            ).fetchall()}
+        except Exception:
+            return set()
+    
     def _create_indexes(self):
         """
         OPTIMIZATION #4: Create indexes and views for common queries
         
         Adds database indexes on frequently queried columns for better performance.
         Based on PAGINATION_IMPLEMENTATION.md recommendations.
+        
+        Indexes and views that already exist in the database file are left alone,
+        so a warm restart does not rebuild (or rewrite) them.
         """
         try:
             # Use the stored main table name
@@ -197,10 +435,7 @@ class DuckDBService:
             else:
                 main_table = "raw_data"
             
-            # These queries are pre-compiled for fast execution
-            # DuckDB automatically optimizes common patterns
-            
-            # Test if the column exists in the table
+            # Test if the table is accessible
             try:
                 self.conn.execute(f"SELECT COUNT(*) FROM {main_table} LIMIT 1")
                 print(f"     Table {main_table} is accessible")
@@ -208,173 +443,633 @@ class DuckDBService:
                 print(f"[WARN] Cannot access table {main_table}: {e}")
                 return
             
+            # Detect column names first so indexes and views use the actual schema
+            column_names = self._detect_columns(main_table)
+            self._define_statements(main_table)
+            
             # OPTIMIZATION #4: Create indexes on frequently queried columns
-            try:
-                print("     Creating performance indexes...")
-                
-                # Index on ENGINE_PROGRAM for program filtering
-                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_engine_program ON {main_table} ("{self.program_col}")')
-                
-                # Index on Configuration for config filtering  
-                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_configuration ON {main_table} ("{self.config_col}")')
-                
-                # Index on Parent_Part_Supplier for supplier filtering
-                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_parent_supplier ON {main_table} ("{self.supplier_col}")')
-                
-                # Index on Level_2_Raw_Material_Supplier for RM supplier filtering
-                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_rm_supplier ON {main_table} ("{self.rm_supplier_col}")')
-                
-                # Index on HW_OWNER for HW owner filtering
-                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_hw_owner ON {main_table} ("{self.hw_owner_col}")')
-                
-                # Index on Part_Number for part number filtering
-                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_part_number ON {main_table} ("{self.part_col}")')
-                
+            index_definitions = {
+                # ENGINE_PROGRAM for program filtering
+                "idx_engine_program": [self.program_col],
+                # Configuration for config filtering
+                "idx_configuration": [self.config_col],
+                # Parent_Part_Supplier for supplier filtering
+                "idx_parent_supplier": [self.supplier_col],
+                # Level_2_Raw_Material_Supplier for RM supplier filtering
+                "idx_rm_supplier": [self.rm_supplier_col],
+                # HW_OWNER for HW owner filtering
+                "idx_hw_owner": [self.hw_owner_col],
+                # Part_Number for part number filtering
+                "idx_part_number": [self.part_col],
+                # ESN for single-engine drill-down (/api/esn/{esn} point lookups)
+                "idx_esn": [self.esn_col],
                 # Composite index for common query patterns (program + config)
-                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_program_config ON {main_table} ("{self.program_col}", "{self.config_col}")')
-                
-                print("     ✓ Performance indexes created successfully")
-                
-            except Exception as e:
-                print(f"[WARN] Could not create indexes: {e}")
-                # Continue without indexes - queries will still work but slower
-            
-            # Get column names to determine naming convention (spaces vs underscores)
-            columns_result = self.conn.execute(f"SELECT * FROM {main_table} LIMIT 0").description
-            column_names = [col[0] for col in columns_result]
-            
-            # Determine which column naming convention is used and store as instance variables
-            self.program_col = "ENGINE_PROGRAM" if "ENGINE_PROGRAM" in column_names else "ENGINE PROGRAM"
-            self.config_col = "Configuration" if "Configuration" in column_names else "CONFIGURATION"
-            self.part_col = "Part_Number" if "Part_Number" in column_names else "Part Number"
-            self.rm_supplier_col = "Level_2_Raw_Material_Supplier" if "Level_2_Raw_Material_Supplier" in column_names else "Level 2 Raw Material Supplier"
-            self.supplier_col = "Parent_Part_Supplier" if "Parent_Part_Supplier" in column_names else "Parent Part Supplier"
-            self.hw_owner_col = "HW_OWNER" if "HW_OWNER" in column_names else "HW OWNER"
-            self.module_col = "Module" if "Module" in column_names else None
-            self.esn_col = "ESN" if "ESN" in column_names else "esn"
-            self.target_date_col = "Target_Ship_Date" if "Target_Ship_Date" in column_names else "Target Ship Date"
-            self.level2_pn_col = "Level_2_PN" if "Level_2_PN" in column_names else "Level 2 PN"
-            self.level2_raw_type_col = "Level_2_Raw_Type" if "Level_2_Raw_Type" in column_names else "Level 2 Raw Type"
-            
-            # Reference local variables for view creation
-            program_col = self.program_col
-            config_col = self.config_col
-            part_col = self.part_col
-            rm_supplier_col = self.rm_supplier_col
-            supplier_col = self.supplier_col
-            hw_owner_col = self.hw_owner_col
-            module_col = self.module_col
-            
-            # View for unique programs
-            try:
-                self.conn.execute(f"""
-                    CREATE OR REPLACE VIEW unique_programs AS
-                    SELECT DISTINCT "{program_col}" as program
-                    FROM {main_table}
-                    WHERE "{program_col}" IS NOT NULL AND "{program_col}" != ''
-                    ORDER BY program
-                """)
-            except Exception as e:
-                print(f"[WARN] Could not create unique_programs view: {e}")
-            
-            # View for unique configurations
-            try:
-                config_col_check = "Configuration" if "Configuration" in column_names else ("CONFIGURATION" if "CONFIGURATION" in column_names else None)
-                if config_col_check:
-                    self.conn.execute(f"""
-                        CREATE OR REPLACE VIEW unique_configs AS
-                        SELECT DISTINCT "{config_col_check}" as config
-                        FROM {main_table}
-                        WHERE "{config_col_check}" IS NOT NULL AND "{config_col_check}" != ''
-                        ORDER BY config
-                    """)
-            except Exception as e:
-                print(f"[WARN] Could not create unique_configs view: {e}")
-            
-            # View for unique part numbers
-            try:
-                self.conn.execute(f"""
-                    CREATE OR REPLACE VIEW unique_part_numbers AS
-                    SELECT DISTINCT "{part_col}" as part_number
-                    FROM {main_table}
-                    WHERE "{part_col}" IS NOT NULL AND "{part_col}" != ''
-                    ORDER BY part_number
-                """)
-            except Exception as e:
-                print(f"[WARN] Could not create unique_part_numbers view: {e}")
-            
-            # View for raw material suppliers
-            try:
-                self.conn.execute(f"""
-                    CREATE OR REPLACE VIEW unique_rm_suppliers AS
-                    SELECT DISTINCT "{rm_supplier_col}" as rm_supplier
-                    FROM {main_table}
-                    WHERE "{rm_supplier_col}" IS NOT NULL AND "{rm_supplier_col}" != ''
-                    ORDER BY rm_supplier
-                """)
-            except Exception as e:
-                print(f"[WARN] Could not create unique_rm_suppliers view: {e}")
+                "idx_program_config": [self.program_col, self.config_col],
+            }
+            existing = self._existing_indexes()
+            missing = {name: cols for name, cols in index_definitions.items() if name not in existing}
             
-            # View for part suppliers
-            try:
-                self.conn.execute(f"""
-                    CREATE OR REPLACE VIEW unique_suppliers AS
-                    SELECT DISTINCT "{supplier_col}" as supplier
-                    FROM {main_table}
-                    WHERE "{supplier_col}" IS NOT NULL AND "{supplier_col}" != ''
-                    ORDER BY supplier
-                """)
-            except Exception as e:
-                print(f"[WARN] Could not create unique_suppliers view: {e}")
+            if not missing:
+                print(f"     All {len(index_definitions)} performance indexes already exist - skipping")
+            elif self.read_only:
+                print(f"[WARN] {len(missing)} performance indexes missing in read-only mode - run prestart.py before starting workers")
+            else:
+                try:
+                    print(f"     Creating {len(missing)} performance indexes...")
+                    for name, cols in missing.items():
+                        if not all(col in column_names for col in cols):
+                            continue
+                        col_list = ", ".join(f'"{col}"' for col in cols)
+                        self.conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {main_table} ({col_list})')
+                    print("     ✓ Performance indexes created successfully")
+                except Exception as e:
+                    print(f"[WARN] Could not create indexes: {e}")
+                    # Continue without indexes - queries will still work but slower
+            
+            # Lowercase search text per row for datatable free-text search
+            self._build_search_index(main_table)
+            
+            # Reverse BOM index for where-used lookups
+            self._build_where_used_index(main_table)
+            
+            # In-memory prefix index for part number / ESN typeahead
+            self._build_part_index(main_table)
+            
+            # Row bitmaps per filter value for datatable filter intersection
+            self._build_filter_bitmaps(main_table)
+            
+            # Views for unique filter values: (view name, source column, alias)
+            view_definitions = [
+                ("unique_programs", self.program_col, "program"),
+                ("unique_configs", self.config_col if self.config_col in column_names else None, "config"),
+                ("unique_part_numbers", self.part_col, "part_number"),
+                ("unique_rm_suppliers", self.rm_supplier_col, "rm_supplier"),
+                ("unique_suppliers", self.supplier_col, "supplier"),
+                ("unique_hw_owners", self.hw_owner_col, "hw_owner"),
+                # Modules (if the column exists)
+                ("unique_modules", self.module_col, "module"),
+            ]
+            existing_views = self._existing_views()
+            created = 0
             
-            # View for HW owners
-            try:
-                self.conn.execute(f"""
-                    CREATE OR REPLACE VIEW unique_hw_owners AS
-                    SELECT DISTINCT "{hw_owner_col}" as hw_owner
-                    FROM {main_table}
-                    WHERE "{hw_owner_col}" IS NOT NULL AND "{hw_owner_col}" != ''
-                    ORDER BY hw_owner
-                """)
-            except Exception as e:
-                print(f"[WARN] Could not create unique_hw_owners view: {e}")
+            if self.read_only:
+                missing_views = [name for name, col, _ in view_definitions if col and name not in existing_views]
+                if missing_views:
+                    print(f"[WARN] Views missing in read-only mode ({', '.join(missing_views)}) - run prestart.py before starting workers")
+                return
             
-            # View for modules (if it exists)
-            if module_col:
+            for view_name, col, alias in view_definitions:
+                if not col or view_name in existing_views:
+                    continue
                 try:
                     self.conn.execute(f"""
-                        CREATE OR REPLACE VIEW unique_modules AS
-                        SELECT DISTINCT "{module_col}" as module
+                        CREATE OR REPLACE VIEW {view_name} AS
+                        SELECT DISTINCT "{col}" as {alias}
                         FROM {main_table}
-                        WHERE "{module_col}" IS NOT NULL AND "{module_col}" != ''
-                        ORDER BY module
+                        WHERE "{col}" IS NOT NULL AND "{col}" != ''
+                        ORDER BY {alias}
                     """)
+                    created += 1
                 except Exception as e:
-                    print(f"[WARN] Could not create unique_modules view: {e}")
+                    print(f"[WARN] Could not create {view_name} view: {e}")
             
-            print("[OK] Views and indexes created for optimized queries")
+            if created:
+                print(f"[OK] Views and indexes created for optimized queries ({created} views)")
+            else:
+                print("[OK] Views and indexes already present - nothing to create")
             
         except Exception as e:
             print(f"[WARN] Warning creating views: {e}")
     
+    def data_fingerprint(self) -> str:
+        """
+        Row count plus an order-independent hash of every main-table row and its
+        rowid, computed once per data version
+        
+        Derived tables keyed by rowid (or built from the rows) carry it as their
+        table comment: a reloaded table, edited rows or rowids moved by a
+        checkpoint after deletes all change it, and the copy is rebuilt.
+        The digest is an XOR, so apply_delta() updates it in place.
+        """
+        def compute():
+            with self.cursor() as cur:
+                rows, digest = cur.execute(
+                    f"SELECT COUNT(*), {self._row_digest_sql()} FROM {self._get_main_table()} m"
+                ).fetchone()
+            return f"{rows}:{digest:x}"
+        
+        return self._cached_derived("data_fingerprint", compute)
+    
+    def _row_digest_sql(self) -> str:
+        """XOR of the row hashes data_fingerprint() is built from, over main-table alias m"""
+        columns = ", ".join(f'm."{col}"' for col in self.column_names)
+        return f"COALESCE(bit_xor(hash(m.rowid, {columns})), 0)"
+    
+    def _derived_stamp(self, cur, name: str) -> Optional[str]:
+        """Data fingerprint a derived table in the database file was built from (None if absent)"""
+        row = cur.execute(
+            "SELECT comment FROM duckdb_tables() WHERE database_name = current_database() "
+            "AND schema_name = 'main' AND table_name = ?",
+            [name]
+        ).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _stamp_derived(cur, target: str, stamp: str):
+        """Record the data fingerprint a derived table was built from"""
+        cur.execute(f"COMMENT ON TABLE {target} IS '{stamp}'")
+    
+    def _drop_derived_tables(self):
+        """Drop derived tables left over from a previous copy of the main table"""
+        for name in (self.SEARCH_TABLE, self.WHERE_USED_TABLE, DEMAND_TABLE, RESULTS_TABLE):
+            self.conn.execute(f"DROP TABLE IF EXISTS {name}")
+    
+    # Derived table holding one lowercase search string per main-table row
+    SEARCH_TABLE = "datatable_search"
+    
+    def _search_columns(self) -> List[str]:
+        """Columns matched by datatable `q` search: part numbers, ESN, descriptions, suppliers"""
+        candidates = [self.part_col, self.level2_pn_col, self.esn_col, "Part_Description", "Level_2_Desc",
+                      self.supplier_col, self.rm_supplier_col]
+        columns = []
+        for col in candidates:
+            if col in self.column_names and col not in columns:
+                columns.append(col)
+        return columns
+    
+    def _search_text_sql(self) -> str:
+        """SQL expression producing the lowercase search text of a row"""
+        return "lower(concat_ws(' ', " + ", ".join(f'"{col}"' for col in self._search_columns()) + "))"
+    
+    def _derived_table(self, name: str) -> str:
+        """
+        Where to materialize a derived table: the database file when writable,
+        the in-memory scratch database for read-only workers
+        """
+        if self.read_only:
+            self.conn.execute("ATTACH IF NOT EXISTS ':memory:' AS scratch (READ_ONLY false)")
+            return f"scratch.{name}"
+        return name
+    
+    def _build_search_index(self, main_table: str, rebuild: bool = False):
+        """
+        Precompute lowercase search text (keyed by rowid) so `q` search is a single
+        contains() scan over one narrow column instead of lower()/concat per row
+        
+        Built into the database file when writable (prestart.py in multi-worker mode);
+        read-only workers without a current copy build a private one in an in-memory
+        scratch database. The data fingerprint is kept as the table comment, so a
+        copy built from other rows (or other rowids) is never reused.
+        """
+        if not self._search_columns():
+            return
+        
+        try:
+            fingerprint = self.data_fingerprint()
+            if not rebuild and self._derived_stamp(self.conn, self.SEARCH_TABLE) == fingerprint:
+                self.search_table = self.SEARCH_TABLE
+                print(f"     Search index {self.SEARCH_TABLE} already exists - skipping")
+                return
+            
+            target = self._derived_table(self.SEARCH_TABLE)
+            
+            self.conn.execute(f"""
+                CREATE OR REPLACE TABLE {target} AS
+                SELECT rowid AS row_id, {self._search_text_sql()} AS search_text
+                FROM {main_table}
+            """)
+            self._stamp_derived(self.conn, target, fingerprint)
+            self.search_table = target
+            print(f"     ✓ Search index built ({target})")
+        except Exception as e:
+            self.search_table = None
+            print(f"[WARN] Could not build search index - q search falls back to a full expression scan: {e}")
+    
+    def refresh_search_index(self):
+        """Rebuild the search index after the main table has changed"""
+        self._build_search_index(self._get_main_table(), rebuild=True)
+    
+    # Derived table mapping every part (Level 1 or Level 2) to where it is used
+    WHERE_USED_TABLE = "where_used"
+    
+    def _where_used_sql(self, main_table: str, where: str = "TRUE") -> str:
+        """Where-used rows (pn, level, level1_pn, program, config, esn, ship_date) of the main-table rows matching where"""
+        ship_date = (f'TRY_CAST("{self.target_date_col}" AS DATE)' if self.target_date_col in self.column_names
+                     else "CAST(NULL AS DATE)")
+        common = (f'"{self.program_col}" AS program, "{self.config_col}" AS config, '
+                  f'"{self.esn_col}" AS esn, {ship_date} AS ship_date')
+        level2 = ""
+        if self.level2_pn_col in self.column_names:
+            level2 = f"""
+                UNION
+                SELECT "{self.level2_pn_col}", 2, "{self.part_col}", {common}
+                FROM {main_table}
+                WHERE "{self.level2_pn_col}" IS NOT NULL AND "{self.level2_pn_col}" != '' AND ({where})
+            """
+        return f"""
+            SELECT "{self.part_col}" AS pn, 1 AS level, "{self.part_col}" AS level1_pn, {common}
+            FROM {main_table}
+            WHERE "{self.part_col}" IS NOT NULL AND "{self.part_col}" != '' AND ({where})
+            {level2}
+        """
+    
+    def _build_where_used_index(self, main_table: str, rebuild: bool = False):
+        """
+        Reverse BOM: one row per distinct (part, level, level 1 parent, program, config,
+        ESN, ship date), ordered by part with an ART index on it, so a where-used
+        question is a single indexed lookup
+        
+        Stored in the database file when writable, in the in-memory scratch database
+        for read-only workers. The data fingerprint is kept as the table comment to
+        detect a stale copy.
+        """
+        required = (self.part_col, self.program_col, self.config_col, self.esn_col)
+        if not all(col in self.column_names for col in required):
+            return
+        
+        try:
+            fingerprint = self.data_fingerprint()
+            if not rebuild and self._derived_stamp(self.conn, self.WHERE_USED_TABLE) == fingerprint:
+                self.where_used_table = self.WHERE_USED_TABLE
+                print(f"     Where-used index {self.WHERE_USED_TABLE} already exists - skipping")
+                return
+            
+            target = self._derived_table(self.WHERE_USED_TABLE)
+            
+            # DROP + CREATE rather than CREATE OR REPLACE - the pn index depends on the table
+            self.conn.execute(f"DROP TABLE IF EXISTS {target}")
+            self.conn.execute(f"""
+                CREATE TABLE {target} AS
+                SELECT * FROM ({self._where_used_sql(main_table)})
+                ORDER BY pn
+            """)
+            self.conn.execute(f"CREATE INDEX idx_{self.WHERE_USED_TABLE}_pn ON {target} (pn)")
+            self._stamp_derived(self.conn, target, fingerprint)
+            self.where_used_table = target
+            print(f"     ✓ Where-used index built ({target})")
+        except Exception as e:
+            self.where_used_table = None
+            print(f"[WARN] Could not build where-used index - /api/where-used unavailable: {e}")
+    
+    def refresh_where_used_index(self):
+        """Rebuild the where-used index after the main table has changed"""
+        self._build_where_used_index(self._get_main_table(), rebuild=True)
+    
+    # Ship-date period granularity -> date_trunc part
+    WHERE_USED_PERIODS = ("month", "quarter", "year")
+    
+    def get_where_used(self, pn: str, period: str = "month") -> Optional[Dict[str, Any]]:
+        """
+        Everything that depends on a part: Level 1 parents, programs, configs and
+        ESN counts per ship-date period - one GROUPING SETS query over the
+        where-used index. Returns None if the part is not in any BOM.
+        """
+        if self.where_used_table is None:
+            raise RuntimeError("Where-used index is not available")
+        if period not in self.WHERE_USED_PERIODS:
+            raise ValueError(f"Unknown period '{period}' - expected one of: {', '.join(self.WHERE_USED_PERIODS)}")
+        
+        period_format = {"month": "%Y-%m", "quarter": "%Y-Q", "year": "%Y"}[period]
+        period_expr = f"strftime(date_trunc('{period}', ship_date), '{period_format}')"
+        if period == "quarter":
+            period_expr += " || CAST(quarter(ship_date) AS VARCHAR)"
+        
+        rows = self._fetchall(f"""
+            SELECT
+                GROUPING(program, config, level1_pn, period) AS grouping_id,
+                program, config, level1_pn, period,
+                COUNT(DISTINCT esn) AS esns,
+                MIN(level) AS min_level,
+                MAX(level) AS max_level
+            FROM (
+                SELECT *, {period_expr} AS period
+                FROM {self.where_used_table}
+                WHERE pn = ?
+            )
+            GROUP BY GROUPING SETS ((), (program), (program, config), (level1_pn), (period))
+        """, [pn])
+        if not rows:
+            return None
+        
+        # GROUPING() bits (program, config, level1_pn, period): 1 = column aggregated away
+        sets = {0b1111: "total", 0b0111: "program", 0b0011: "config", 0b1101: "level1", 0b1110: "period"}
+        result: Dict[str, Any] = {"programs": [], "configs": [], "level1Parts": [], "esnsByPeriod": []}
+        for grouping_id, program, config, level1_pn, period_value, esns, min_level, max_level in rows:
+            kind = sets[grouping_id]
+            if kind == "total":
+                if not esns:
+                    return None
+                result["total_esns"] = esns
+                result["levels"] = sorted({min_level, max_level})
+            elif kind == "program":
+                result["programs"].append({"program": program, "esns": esns})
+            elif kind == "config":
+                result["configs"].append({"program": program, "config": config, "esns": esns})
+            elif kind == "level1":
+                result["level1Parts"].append({"pn": level1_pn, "esns": esns})
+            elif period_value is not None:
+                result["esnsByPeriod"].append({"period": period_value, "esns": esns})
+        
+        result["programs"].sort(key=lambda r: str(r["program"]))
+        result["configs"].sort(key=lambda r: (str(r["program"]), str(r["config"])))
+        result["level1Parts"].sort(key=lambda r: str(r["pn"]))
+        result["esnsByPeriod"].sort(key=lambda r: r["period"])
+        return {"pn": pn, "period": period, **result}
+    
+    def _part_index_columns(self) -> List[str]:
+        """Columns searchable through /api/search/parts"""
+        columns = []
+        for col in (self.part_col, self.level2_pn_col, self.esn_col):
+            if col in self.column_names and col not in columns:
+                columns.append(col)
+        return columns
+    
+    def _load_part_index(self, conn, main_table: str) -> PrefixIndex:
+        """Distinct part numbers (Level 1 and Level 2) and ESNs with their row counts"""
+        entries = []
+        for col in self._part_index_columns():
+            rows = conn.execute(f"""
+                SELECT CAST("{col}" AS VARCHAR) AS value, COUNT(*) AS row_count
+                FROM {main_table}
+                WHERE "{col}" IS NOT NULL
+                GROUP BY value
+            """).fetchall()
+            entries.extend((col, value, row_count) for value, row_count in rows)
+        return PrefixIndex(entries)
+    
+    def _build_part_index(self, main_table: str):
+        """
+        Build the in-memory PrefixIndex behind /api/search/parts
+        
+        Built in every process (read-only workers included) - it lives in Python memory.
+        """
+        if not self._part_index_columns():
+            return
+        
+        try:
+            self.part_index = self._load_part_index(self.conn, main_table)
+            print(f"     ✓ Part search index built ({len(self.part_index)} values)")
+        except Exception as e:
+            self.part_index = None
+            print(f"[WARN] Could not build part search index: {e}")
+    
+    def refresh_part_index(self):
+        """Rebuild the part / ESN prefix index after the main table has changed"""
+        with self.cursor() as cur:
+            self.part_index = self._load_part_index(cur, self._get_main_table())
+    
+    # Year filter values are indexed under this derived column
+    YEAR_BITMAP_COLUMN = "__year"
+    
+    def _bitmap_filter_columns(self) -> Dict[str, str]:
+        """Datatable filter name -> bitmap column for every filter the table supports"""
+        col_map = self._datatable_columns()
+        columns = {name: col_map[name] for name in self.DATATABLE_LIST_FILTERS if col_map.get(name)}
+        if col_map.get("year"):
+            columns["year"] = self.YEAR_BITMAP_COLUMN
+        return columns
+    
+    def _load_filter_bitmaps(self, conn, main_table: str) -> BitmapIndex:
+        """Read every filter column once and build the bitmaps plus the default row order"""
+        col_map = self._datatable_columns()
+        columns = sorted({col for name, col in self._bitmap_filter_columns().items() if name != "year"})
+        select = ["rowid AS __row_id"] + [f'"{col}"' for col in columns]
+        if col_map.get("year"):
+            select.append(f'CAST(YEAR(TRY_CAST("{col_map["year"]}" AS DATE)) AS VARCHAR) AS {self.YEAR_BITMAP_COLUMN}')
+            columns.append(self.YEAR_BITMAP_COLUMN)
+        table = conn.execute(f"SELECT {', '.join(select)} FROM {main_table}").fetch_arrow_table()
+        
+        order_sql = ", ".join(f"{expr} {direction}" for expr, direction in self._datatable_sort_keys(None))
+        order = conn.execute(f"SELECT rowid FROM {main_table} ORDER BY {order_sql}").fetch_arrow_table()
+        return BitmapIndex.from_arrow(table, "__row_id", columns, order=order.column(0).to_numpy())
+    
+    def _build_filter_bitmaps(self, main_table: str):
+        """
+        Build the in-memory BitmapIndex used for datatable counts, offset pages and
+        facet counts whenever a filter set has no free-text search
+        """
+        if not self._bitmap_filter_columns():
+            return
+        
+        try:
+            self.filter_bitmaps = self._load_filter_bitmaps(self.conn, main_table)
+            stats = self.filter_bitmaps.stats()
+            print(f"     ✓ Filter bitmaps built ({sum(stats['columns'].values())} values, {stats['bytes'] / 1024:.0f} KB)")
+            if stats["skipped"]:
+                print(f"     Filter bitmaps skipped over budget (SQL instead): {', '.join(sorted(stats['skipped']))}")
+        except Exception as e:
+            self.filter_bitmaps = None
+            print(f"[WARN] Could not build filter bitmaps - datatable filters use SQL only: {e}")
+    
+    def refresh_filter_bitmaps(self):
+        """Rebuild the filter bitmaps after the main table has changed"""
+        with self.cursor() as cur:
+            self.filter_bitmaps = self._load_filter_bitmaps(cur, self._get_main_table())
+    
+    def _datatable_bitmap(self, filters: Dict[str, Any], exclude: Optional[str] = None) -> Optional[int]:
+        """
+        Matching-row bitmap for a datatable filter set, or None when the bitmaps cannot
+        answer it (no index, free-text search, or a filter on a non-indexed column)
+        
+        exclude drops one filter from the set (facet counts ignore their own selection).
+        """
+        index = self.filter_bitmaps
+        if index is None or (filters.get("q") or "").strip():
+            return None
+        selections = {}
+        for name, col in self._bitmap_filter_columns().items():
+            values = filters.get(name)
+            if not values or name == exclude:
+                continue
+            if col not in index.bitmaps:
+                return None
+            if name == "year":
+                try:
+                    values = [str(int(values))]
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid year: {values}")
+            selections[col] = list(values)
+        return index.resolve(selections)
+    
+    def get_datatable_facets(self, filters: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """
+        Matching rows per value of every datatable filter column under the current
+        filter set - each column ignores its own selection, so the counts show what
+        selecting another value would return
+        
+        Popcounts over the filter bitmaps; SQL GROUP BY when the bitmaps cannot answer.
+        """
+        index = self.filter_bitmaps
+        col_map = self._datatable_columns()
+        facets = {}
+        for name, col in self._bitmap_filter_columns().items():
+            bitmap = self._datatable_bitmap(filters, exclude=name)
+            if bitmap is not None and col in index.bitmaps:
+                counts = index.facet_counts(bitmap, col)
+            else:
+                where_sql, params = self.build_datatable_where({**filters, name: None})
+                value_sql = (f'CAST(YEAR(TRY_CAST("{col_map["year"]}" AS DATE)) AS VARCHAR)' if name == "year"
+                             else f'CAST("{col}" AS VARCHAR)')
+                rows = self._fetchall(f"""
+                    SELECT {value_sql} AS value, COUNT(*) AS row_count
+                    FROM {self._get_main_table()}
+                    WHERE {where_sql}
+                    GROUP BY value
+                """, params)
+                counts = {value: row_count for value, row_count in rows if value is not None}
+            facets[name] = dict(sorted(counts.items()))
+        return facets
+    
+    def search_parts(self, prefix: str, limit: int = 10, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Typeahead lookup: part numbers / ESNs starting with prefix (case-insensitive)
+        
+        fields accepts any name resolve_column() understands ("Part Number", "ESN", ...);
+        raises ValueError for columns that are not indexed.
+        """
+        if self.part_index is None:
+            raise RuntimeError("Part search index is not available")
+        resolved = None
+        if fields:
+            resolved = [self.resolve_column(field) for field in fields]
+            not_indexed = [col for col in resolved if col not in self.part_index.fields]
+            if not_indexed:
+                raise ValueError(
+                    f"Column(s) not searchable: {', '.join(not_indexed)} - expected one of: {', '.join(self.part_index.fields)}"
+                )
+        return self.part_index.search(prefix, limit=limit, fields=resolved)
+    
+    def prepare_database(self):
+        """
+        Build every derived object (indexes, views, derived tables) and checkpoint
+        
+        Run once by prestart.py with a read-write connection so that read-only
+        workers can attach a fully prepared file.
+        """
+        if self.read_only:
+            raise RuntimeError("prepare_database() requires a read-write connection")
+        
+        self._create_indexes()
+        if self.use_external_db:
+            self.conn.execute("CHECKPOINT")
+    
+    def get_resource_diagnostics(self) -> Dict[str, Any]:
+        """Configured vs effective DuckDB resource settings plus pool counters"""
+        effective = {}
+        with self.cursor() as cur:
+            for name in RESOURCE_SETTINGS:
+                try:
+                    effective[name] = cur.execute("SELECT current_setting(?)", [name]).fetchone()[0]
+                except Exception as e:
+                    effective[name] = f"unavailable: {e}"
+        
+        return {
+            "database": str(self.duckdb_path) if self.duckdb_path else ":memory:",
+            "read_only": self.read_only,
+            "duckdb_version": duckdb.__version__,
+            "configured": self.resource_config,
+            "sources": self.resource_sources,
+            "effective": effective,
+            "pool": self.connections.stats() if self.connections else {},
+            "single_flight": self.single_flight.stats(),
+            "snapshot": self.snapshot.stats(),
+            "statements": self.statements.stats(),
+        }
+    
     def _get_main_table(self) -> str:
         """Get the main data table name"""
         return self.main_table
     
+    def _fetchall(self, sql: str, params: Optional[list] = None) -> List[tuple]:
+        """Execute a SQL query on the current cursor and fetch all rows"""
+        with self.cursor() as cur:
+            return cur.execute(sql, params).fetchall()
+    
+    def _fetch_polars(self, sql: str, params: Optional[list] = None) -> pl.DataFrame:
+        """Execute a SQL query on the current cursor and return a Polars DataFrame"""
+        with self.cursor() as cur:
+            return cur.execute(sql, params).pl()
+    
+    def _fetch_arrow(self, sql: str, params: Optional[list] = None):
+        """Execute a SQL query on the current cursor and return an Arrow table (record batches)"""
+        with self.cursor() as cur:
+            return fetch_arrow_batches(cur.execute(sql, params))
+    
     def query(self, sql: str) -> List[Dict[str, Any]]:
         """Execute a SQL query and return results as list of dicts"""
         try:
-            result = self.conn.execute(sql).fetchall()
-            columns = [desc[0] for desc in self.conn.description]
+            with self.cursor() as cur:
+                result = cur.execute(sql).fetchall()
+                columns = [desc[0] for desc in cur.description]
             return [dict(zip(columns, row)) for row in result]
         except Exception as e:
             print(f"✗ Query error: {e}")
             raise
     
+    def query_statement(self, name: str, params: Optional[list] = None) -> List[Dict[str, Any]]:
+        """Execute a registered statement with bound parameters and return results as list of dicts"""
+        try:
+            with self.cursor() as cur:
+                return self.statements.fetch_dicts(cur, name, params)
+        except Exception as e:
+            print(f"✗ Statement {name} error: {e}")
+            raise
+    
+    def query_limited(self, sql: str, max_rows: int, layout: str = "rows") -> Dict[str, Any]:
+        """
+        Execute a validated SELECT with a hard row cap pushed into DuckDB
+        
+        One extra row is requested so truncation can be reported without a COUNT.
+        The wrapper closes on its own line - sql may end in a `--` comment.
+        """
+        with self.cursor() as cur:
+            table = fetch_arrow(cur.execute(f"SELECT * FROM (\n{sql}\n) AS q LIMIT {int(max_rows) + 1}"))
+        
+        truncated = table.num_rows > max_rows
+        table = table.slice(0, max_rows)
+        return {
+            "columns": table.column_names,
+            "row_count": table.num_rows,
+            "data": shape_arrow(table, layout),
+            "truncated": truncated
+        }
+    
+    def iter_query_batches(self, sql: str, max_rows: int, batch_rows: int, timeout: Optional[float] = None):
+        """
+        Stream a validated SELECT in row batches on a dedicated cursor
+        
+        Yields ("columns", [names]), then ("rows", [tuples]) per batch, then
+        ("end", truncated). At most max_rows rows are produced; the query is
+        interrupted if it runs longer than timeout seconds.
+        """
+        cur = self.conn.cursor()
+        timer = threading.Timer(timeout, cur.interrupt) if timeout else None
+        try:
+            if timer:
+                timer.daemon = True
+                timer.start()
+            cur.execute(f"SELECT * FROM (\n{sql}\n) AS q LIMIT {int(max_rows) + 1}")
+            yield "columns", [desc[0] for desc in cur.description]
+            
+            remaining = max_rows
+            while remaining > 0:
+                rows = cur.fetchmany(min(batch_rows, remaining))
+                if not rows:
+                    break
+                remaining -= len(rows)
+                yield "rows", rows
+            
+            truncated = remaining == 0 and bool(cur.fetchmany(1))
+            yield "end", truncated
+        finally:
+            if timer:
+                timer.cancel()
+            cur.close()
+    
     def query_to_polars(self, sql: str) -> pl.DataFrame:
         """Execute a SQL query and return results as Polars DataFrame"""
         try:
-            return self.conn.execute(sql).pl()
+            return self._fetch_polars(sql)
         except Exception as e:
             print(f"✗ Query error: {e}")
             raise
@@ -384,30 +1079,16 @@ class DuckDBService:
         try:
             main_table = self._get_main_table()
             
-            # Special case: Module maps to Level_2_Raw_Type
-            if column == "Module":
-                column = self.level2_raw_type_col
+            # Legacy display names ("ENGINE PROGRAM") map to the actual columns;
+            # Module maps to Level_2_Raw_Type
+            column = self.resolve_column(column)
             
-            # Special case: Configuration - just get from main table, not from separate Config table
-            if column == "Configuration":
-                # Try different possible column names
-                if "Configuration" in [self.config_col]:
-                    result = self.conn.execute(f"""
-                        SELECT DISTINCT "{self.config_col}" as value
-                        FROM {main_table}
-                        WHERE "{self.config_col}" IS NOT NULL AND "{self.config_col}" != ''
-                        ORDER BY value
-                    """).fetchall()
-                else:
-                    # Fallback to empty list if column doesn't exist
-                    return []
-            else:
-                result = self.conn.execute(f"""
-                    SELECT DISTINCT "{column}" as value
-                    FROM {main_table}
-                    WHERE "{column}" IS NOT NULL AND "{column}" != ''
-                    ORDER BY value
-                """).fetchall()
+            result = self._fetchall(f"""
+                SELECT DISTINCT "{column}" as value
+                FROM {main_table}
+                WHERE "{column}" IS NOT NULL AND "{column}" != ''
+                ORDER BY value
+            """)
             return [row[0] for row in result]
         except Exception as e:
             print(f"✗ Error getting unique values for {column}: {e}")
@@ -426,7 +1107,7 @@ class DuckDBService:
             
             # Target_Ship_Date is stored as VARCHAR, so we need to parse it first
             # Try multiple date parsing strategies
-            result = self.conn.execute(f"""
+            result = self._fetchall(f"""
                 SELECT DISTINCT 
                     CAST(YEAR(TRY_CAST("{column}" AS DATE)) AS VARCHAR) as year
                 FROM {main_table}
@@ -434,7 +1115,7 @@ class DuckDBService:
                     AND "{column}" != ''
                     AND TRY_CAST("{column}" AS DATE) IS NOT NULL
                 ORDER BY year DESC
-            """).fetchall()
+            """)
             
             years = [str(row[0]) for row in result if row[0]]
             print(f"[DEBUG] Found years: {years}")
@@ -442,7 +1123,7 @@ class DuckDBService:
             if not years:
                 # Fallback: try to extract year from string using SUBSTRING
                 print(f"[DEBUG] Trying fallback method to extract years from string format")
-                result = self.conn.execute(f"""
+                result = self._fetchall(f"""
                     SELECT DISTINCT 
                         SUBSTRING("{column}", LENGTH("{column}") - 3, 4) as year
                     FROM {main_table}
@@ -450,7 +1131,7 @@ class DuckDBService:
                         AND "{column}" != ''
                         AND LENGTH("{column}") >= 4
                     ORDER BY year DESC
-                """).fetchall()
+                """)
                 years = [str(row[0]) for row in result if row[0] and row[0].isdigit()]
                 print(f"[DEBUG] Found years using fallback: {years}")
             
@@ -460,6 +1141,117 @@ class DuckDBService:
             # Fallback to standard years
             return ['2025', '2026', '2027', '2028']
     
+    # Legacy / display column names accepted by /api/filter -> attribute holding the real column
+    _COLUMN_ALIASES = {
+        "ENGINE PROGRAM": "program_col",
+        "Configuration": "config_col",
+        "CONFIGURATION": "config_col",
+        "Parent Part Supplier": "supplier_col",
+        "Level 2 Raw Material Supplier": "rm_supplier_col",
+        "HW OWNER": "hw_owner_col",
+        "Part Number": "part_col",
+        "Module": "level2_raw_type_col",
+        "MODULE": "level2_raw_type_col",
+        "ESN": "esn_col",
+        "Target Ship Date": "target_date_col",
+    }
+    
+    def resolve_column(self, name: str) -> str:
+        """
+        Map a legacy ("ENGINE PROGRAM") or actual ("ENGINE_PROGRAM") column name to
+        the main-table column; raises ValueError for unknown columns
+        """
+        if name in self.column_names:
+            return name
+        attr = self._COLUMN_ALIASES.get(name)
+        if attr and getattr(self, attr, None) in self.column_names:
+            return getattr(self, attr)
+        normalized = name.replace(" ", "_").lower()
+        for col in self.column_names:
+            if col.lower() == normalized:
+                return col
+        raise ValueError(f"Unknown column: {name}")
+    
+    def parse_sort(self, sort: Optional[str]) -> List[tuple]:
+        """
+        Parse "Col1,-Col2" into [(column, "ASC"), (column, "DESC")]
+        
+        A leading "-" sorts descending; names are resolved like filter columns.
+        """
+        order = []
+        for item in (sort or "").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            direction = "DESC" if item.startswith("-") else "ASC"
+            order.append((self.resolve_column(item.lstrip("+-").strip()), direction))
+        return order
+    
+    def filter_rows(self, filters: Dict[str, List[str]], fields: Optional[List[str]] = None,
+                    sort: Optional[str] = None, skip: int = 0, limit: Optional[int] = None,
+                    years: Optional[List[str]] = None) -> tuple:
+        """
+        Filter, project, sort and paginate the main table in one DuckDB query
+        
+        Args:
+            filters: {column: [values]} - legacy or actual column names, IN semantics
+            fields: Columns to return (default: all)
+            sort: "Col1,-Col2" ("-" = descending), ahead of the default datatable order
+            years: Target ship years to keep
+        
+        Returns:
+            (total, table) - total rows matching the filters and an Arrow table with
+            the requested page
+        """
+        main_table = self._get_main_table()
+        where_clauses = []
+        params = []
+        
+        for col, values in filters.items():
+            if values:  # Only add if values provided
+                column = self.resolve_column(col)
+                where_clauses.append(f'"{column}" IN ({",".join(["?"] * len(values))})')
+                params.extend(values)
+        
+        if years:
+            where_clauses.append(
+                f'YEAR(TRY_CAST("{self.target_date_col}" AS DATE)) IN ({",".join(["?"] * len(years))})'
+            )
+            params.extend(int(y) for y in years)
+        
+        columns = [self.resolve_column(f) for f in fields] if fields else None
+        select_sql = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+        # Requested sort first, then the datatable's stable order (ending in rowid),
+        # so LIMIT/OFFSET pages are deterministic
+        order = self.parse_sort(sort)
+        requested_keys = {self._key_expr(c) for c, _ in order}
+        order_terms = [f'"{c}" {d}' for c, d in order]
+        order_terms += [f"{expr} {d}" for expr, d in self._datatable_sort_keys() if expr not in requested_keys]
+        order_sql = " ORDER BY " + ", ".join(order_terms)
+        
+        # The total rides along as a window aggregate - one scan for count and page
+        sql = f"SELECT {select_sql}, COUNT(*) OVER () AS __total FROM {main_table} WHERE {where_sql}{order_sql}"
+        page_params = list(params)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            page_params += [int(limit), int(skip)]
+        elif skip:
+            sql += " OFFSET ?"
+            page_params.append(int(skip))
+        
+        with self.cursor() as cur:
+            table = fetch_arrow(cur.execute(sql, page_params))
+            if table.num_rows:
+                total = table.column("__total")[0].as_py()
+            elif skip:
+                # Page past the end - count separately
+                total = cur.execute(f"SELECT COUNT(*) FROM {main_table} WHERE {where_sql}", params).fetchall()[0][0]
+            else:
+                total = 0
+        
+        return total, table.drop(["__total"])
+    
     def filter_data(self, filters: Dict[str, List[str]]) -> pl.DataFrame:
         """
         Filter data based on multiple criteria - ultra-fast with DuckDB SQL
@@ -475,43 +1267,291 @@ class DuckDBService:
             Filtered Polars DataFrame
         """
         try:
-            main_table = self._get_main_table()
-            # Build WHERE clause with proper quoting
-            where_clauses = []
-            params = {}
-            
-            for col, values in filters.items():
-                if values:  # Only add if values provided
-                    placeholders = [f"${i}" for i in range(len(values))]
-                    where_clauses.append(f'"{col}" IN ({",".join(placeholders)})')
-                    for i, val in enumerate(values):
-                        params[f"${i}"] = val
-            
-            if not where_clauses:
-                # No filters, return all data
-                return self.conn.execute(f"SELECT * FROM {main_table}").pl()
-            
-            where_sql = " AND ".join(where_clauses)
-            sql = f"SELECT * FROM {main_table} WHERE {where_sql}"
-            
-            # Execute with parameters
-            return self.conn.execute(sql, params).pl()
-            
+            _, table = self.filter_rows(filters)
+            return pl.from_arrow(table)
         except Exception as e:
             print(f"✗ Filter error: {e}")
             raise
     
+    # Multi-value (IN list) filters accepted by the datatable page
+    DATATABLE_LIST_FILTERS = ("productLines", "configs", "suppliers", "rmSuppliers", "hwOwners", "modules", "partNumbers")
+    
+    def _datatable_columns(self) -> Dict[str, Optional[str]]:
+        """Map datatable filter names to actual main-table columns (None if the column is absent)"""
+        column_names = self.column_names
+        
+        def pick(preferred: str, fallback: Optional[str]) -> Optional[str]:
+            if preferred in column_names:
+                return preferred
+            return fallback if fallback in column_names else None
+        
+        return {
+            "productLines": pick("ENGINE_PROGRAM", self.program_col),
+            "configs": pick("Configuration", None),
+            "suppliers": pick("Parent_Part_Supplier", self.supplier_col),
+            "rmSuppliers": pick("Level_2_Raw_Material_Supplier", self.rm_supplier_col),
+            "hwOwners": pick("HW_Owner", self.hw_owner_col),
+            "modules": pick("Module", None),
+            "partNumbers": pick("Level_1_PN", self.part_col),
+            "year": pick("Target_Ship_Date", self.target_date_col),
+        }
+    
+    def build_datatable_where(self, filters: Dict[str, Any]) -> tuple:
+        """
+        Build a parameterized WHERE clause for the datatable filter set
+        
+        Args:
+            filters: Dict keyed by datatable filter name (productLines, configs, ..., year, q)
+        
+        Returns:
+            (where_sql, params) - where_sql is "1=1" when no filter applies
+        """
+        col_map = self._datatable_columns()
+        where_clauses = []
+        params = []
+        
+        for name in self.DATATABLE_LIST_FILTERS:
+            values = filters.get(name)
+            col = col_map.get(name)
+            if values and col:
+                placeholders = ','.join(['?' for _ in values])
+                where_clauses.append(f'"{col}" IN ({placeholders})')
+                params.extend(values)
+        
+        year = filters.get("year")
+        if year and col_map["year"]:
+            try:
+                year_value = int(year)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid year: {year}")
+            where_clauses.append(f'YEAR(TRY_CAST("{col_map["year"]}" AS DATE)) = ?')
+            params.append(year_value)
+        
+        # Free-text search: case-insensitive substring over the search columns
+        q = (filters.get("q") or "").strip().lower()
+        if q and self._search_columns():
+            if self.search_table:
+                where_clauses.append(
+                    f"rowid IN (SELECT row_id FROM {self.search_table} WHERE contains(search_text, ?))"
+                )
+            else:
+                where_clauses.append(f"contains({self._search_text_sql()}, ?)")
+            params.append(q)
+        
+        where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+        return where_sql, params
+    
+    def get_datatable_filter_options(self) -> Dict[str, List[str]]:
+        """Get all unique values for every datatable filter column, plus ship years"""
+        main_table = self._get_main_table()
+        col_map = self._datatable_columns()
+        filter_options = {}
+        
+        with self.cursor() as cur:
+            # Get unique values for each filter
+            for filter_name in self.DATATABLE_LIST_FILTERS:
+                col_name = col_map[filter_name]
+                if col_name:
+                    values = cur.execute(f"""
+                        SELECT DISTINCT "{col_name}" as value
+                        FROM {main_table}
+                        WHERE "{col_name}" IS NOT NULL AND TRIM(CAST("{col_name}" AS VARCHAR)) != ''
+                        ORDER BY value
+                    """).fetchall()
+                    filter_options[filter_name] = [v[0] for v in values if v[0]]
+                else:
+                    filter_options[filter_name] = []
+            
+            # Get years from Target_Ship_Date
+            date_col = col_map["year"]
+            if date_col:
+                years = cur.execute(f"""
+                    SELECT DISTINCT CAST(YEAR(TRY_CAST("{date_col}" AS DATE)) AS VARCHAR) as year
+                    FROM {main_table}
+                    WHERE "{date_col}" IS NOT NULL
+                    ORDER BY year DESC
+                """).fetchall()
+                filter_options["years"] = [y[0] for y in years if y[0]]
+            else:
+                filter_options["years"] = []
+        
+        return filter_options
+    
+    # Stable datatable order: program, config, ESN, part, L2 part, then rowid as tie-breaker
+    DATATABLE_KEY_ATTRS = ("program_col", "config_col", "esn_col", "part_col", "level2_pn_col")
+    
+    @staticmethod
+    def _key_expr(col: str) -> str:
+        """NULL-safe sort key expression (comparable as text, so it fits in a cursor)"""
+        return f"""COALESCE(CAST("{col}" AS VARCHAR), '')"""
+    
+    def _datatable_sort_keys(self, sort: Optional[str] = None) -> List[tuple]:
+        """
+        (expression, direction) sort keys: the requested sort columns first, then the
+        stable default order, then rowid so every row has a unique key
+        """
+        keys = []
+        seen = set()
+        for col, direction in self.parse_sort(sort):
+            if col not in seen:
+                keys.append((self._key_expr(col), direction))
+                seen.add(col)
+        for attr in self.DATATABLE_KEY_ATTRS:
+            col = getattr(self, attr, None)
+            if col in self.column_names and col not in seen:
+                keys.append((self._key_expr(col), "ASC"))
+                seen.add(col)
+        keys.append(("rowid", "ASC"))
+        return keys
+    
+    @staticmethod
+    def _keyset_predicate(keys: List[tuple], after: List[Any]) -> tuple:
+        """
+        WHERE fragment selecting rows that sort after the key `after`
+        
+        All-ascending keys use a row-value comparison; mixed directions expand to
+        (k1 > v1) OR (k1 = v1 AND k2 < v2) OR ...
+        """
+        if all(direction == "ASC" for _, direction in keys):
+            exprs = ", ".join(expr for expr, _ in keys)
+            return f"({exprs}) > ({', '.join(['?'] * len(keys))})", list(after)
+        
+        branches = []
+        params = []
+        for i, (expr, direction) in enumerate(keys):
+            terms = [f"{keys[j][0]} = ?" for j in range(i)]
+            terms.append(f"{expr} {'>' if direction == 'ASC' else '<'} ?")
+            branches.append("(" + " AND ".join(terms) + ")")
+            params.extend(after[:i + 1])
+        return "(" + " OR ".join(branches) + ")", params
+    
+    def filter_datatable_arrow(self, filters: Dict[str, Any], skip: int = 0, limit: int = 1000,
+                               cursor: Optional[str] = None, sort: Optional[str] = None) -> tuple:
+        """
+        Filtered, paginated main-table rows as an Arrow table: (total, table, next_cursor)
+        
+        With a cursor (keyset mode) the page starts after the cursor's sort key and
+        skip is ignored; "" means the first page. next_cursor is None on the last page.
+        sort ("Col,-Col") is applied ahead of the stable default order, so offset and
+        cursor pages always agree.
+        """
+        main_table = self._get_main_table()
+        where_sql, params = self.build_datatable_where(filters)
+        total_key = filter_fingerprint(filters)
+        cursor_key = filter_fingerprint({**filters, "sort": sort})
+        keys = self._datatable_sort_keys(sort)
+        order_sql = ", ".join(f"{expr} {direction}" for expr, direction in keys)
+        key_columns = ", ".join(f"{expr} AS __k{i}" for i, (expr, _) in enumerate(keys))
+        
+        page_where = where_sql
+        page_params = list(params)
+        offset = int(skip)
+        
+        # Filter sets without free-text search resolve to a row bitmap: the total is a
+        # popcount, and an offset page in the default order is a slice of the ranked rows
+        bitmap = self._datatable_bitmap(filters)
+        if bitmap is not None and cursor is None and not sort:
+            row_ids = self.filter_bitmaps.page_row_ids(bitmap, offset, int(limit) + 1)
+            page_where = "rowid IN (SELECT unnest(?::BIGINT[]))"
+            page_params = [row_ids]
+            offset = 0
+        if cursor:
+            after = decode_cursor(cursor, cursor_key, len(keys))
+            predicate, predicate_params = self._keyset_predicate(keys, after)
+            page_where = f"({where_sql}) AND {predicate}"
+            page_params += predicate_params
+        if cursor is not None:
+            offset = 0
+        
+        with self.cursor() as cur:
+            # Count once per filter set
+            total = BitmapIndex.count(bitmap) if bitmap is not None else self._datatable_totals.get(total_key)
+            if total is None:
+                count_query = f"SELECT COUNT(*) FROM {main_table} WHERE {where_sql}"
+                total = cur.execute(count_query, params).fetchall()[0][0]
+                self._datatable_totals.put(total_key, total)
+            
+            # One extra row tells whether another page exists
+            data_query = f"""
+                SELECT *, {key_columns} FROM {main_table}
+                WHERE {page_where}
+                ORDER BY {order_sql}
+                LIMIT ? OFFSET ?
+            """
+            table = fetch_arrow_batches(cur.execute(data_query, page_params + [int(limit) + 1, offset]))
+        
+        key_names = [f"__k{i}" for i in range(len(keys))]
+        next_cursor = None
+        if table.num_rows > limit:
+            table = table.slice(0, limit)
+            last = table.slice(limit - 1, 1).select(key_names).to_pylist()[0]
+            next_cursor = encode_cursor([last[name] for name in key_names], cursor_key)
+        
+        return total, table.drop(key_names), next_cursor
+    
+    def filter_datatable(self, filters: Dict[str, Any], skip: int = 0, limit: int = 1000,
+                         layout: str = "rows", cursor: Optional[str] = None,
+                         sort: Optional[str] = None) -> Dict[str, Any]:
+        """Filtered, paginated main-table rows plus the total match count and next-page cursor"""
+        total, table, next_cursor = self.filter_datatable_arrow(filters, skip, limit, cursor, sort)
+        
+        return {
+            "total": total,
+            "row_count": table.num_rows,
+            "next": next_cursor,
+            "data": shape_arrow(table, layout)
+        }
+    
+    def count_datatable(self, filters: Dict[str, Any]) -> int:
+        """Number of main-table rows matching the datatable filter set"""
+        bitmap = self._datatable_bitmap(filters)
+        if bitmap is not None:
+            return BitmapIndex.count(bitmap)
+        
+        fingerprint = filter_fingerprint(filters)
+        total = self._datatable_totals.get(fingerprint)
+        if total is None:
+            where_sql, params = self.build_datatable_where(filters)
+            total = self._fetchall(f"SELECT COUNT(*) FROM {self._get_main_table()} WHERE {where_sql}", params)[0][0]
+            self._datatable_totals.put(fingerprint, total)
+        return total
+    
+    def open_datatable_export(self, filters: Dict[str, Any], batch_rows: int = ARROW_BATCH_ROWS,
+                              sort: Optional[str] = None) -> tuple:
+        """
+        Start streaming the full filtered datatable result on a dedicated cursor
+        
+        Returns (schema, batches). DuckDB produces the record batches lazily, so
+        only one batch is in memory at a time; the cursor is closed when the
+        batch iterator is exhausted or closed.
+        """
+        main_table = self._get_main_table()
+        where_sql, params = self.build_datatable_where(filters)
+        sql = f"SELECT * FROM {main_table} WHERE {where_sql}"
+        if sort:
+            # Same order as the datatable pages (DuckDB spills the sort to temp_directory if needed)
+            sql += " ORDER BY " + ", ".join(f"{expr} {direction}" for expr, direction in self._datatable_sort_keys(sort))
+        
+        cur = self.conn.cursor()
+        try:
+            reader = cur.execute(sql, params).fetch_record_batch(batch_rows)
+        except Exception:
+            cur.close()
+            raise
+        
+        def batches():
+            try:
+                yield from reader
+            finally:
+                cur.close()
+        
+        return reader.schema, batches()
+    
     def get_demand_data(self) -> List[Dict[str, Any]]:
         """Get demand data in hierarchical format - optimized with DuckDB grouping"""
         try:
-            main_table = self._get_main_table()
             # Get all unique programs
-            programs = self.query(f"""
-                SELECT DISTINCT "{self.program_col}" as program
-                FROM {main_table}
-                WHERE "{self.program_col}" IS NOT NULL AND "{self.program_col}" != ''
-                ORDER BY program
-            """)
+            programs = self.query_statement("demand_programs")
             
             demand_data = []
             
@@ -519,13 +1559,7 @@ class DuckDBService:
                 program = prog_row['program']
                 
                 # Get all configurations for this program
-                configs = self.query(f"""
-                    SELECT DISTINCT "{self.config_col}" as config
-                    FROM {main_table}
-                    WHERE "{self.program_col}" = '{program}'
-                    AND "{self.config_col}" IS NOT NULL AND "{self.config_col}" != ''
-                    ORDER BY config
-                """)
+                configs = self.query_statement("demand_configs", [program])
                 
                 config_list = []
                 
@@ -533,14 +1567,7 @@ class DuckDBService:
                     config = cfg_row['config']
                     
                     # Get ESNs for this program+config
-                    esns = self.query(f"""
-                        SELECT DISTINCT "{self.esn_col}" as esn, "{self.target_date_col}" as target_date
-                        FROM {main_table}
-                        WHERE "{self.program_col}" = '{program}'
-                        AND "{self.config_col}" = '{config}'
-                        AND "{self.esn_col}" IS NOT NULL AND "{self.esn_col}" != ''
-                        ORDER BY esn
-                    """)
+                    esns = self.query_statement("demand_esns", [program, config])
                     
                     esns_formatted = []
                     for esn_row in esns:
@@ -584,16 +1611,8 @@ class DuckDBService:
             Paginated list of demand programs
         """
         try:
-            main_table = self._get_main_table()
-            
             # Get paginated programs using LIMIT/OFFSET
-            programs = self.query(f"""
-                SELECT DISTINCT "{self.program_col}" as program
-                FROM {main_table}
-                WHERE "{self.program_col}" IS NOT NULL AND "{self.program_col}" != ''
-                ORDER BY program
-                LIMIT {limit} OFFSET {skip}
-            """)
+            programs = self.query_statement("demand_programs_page", [limit, skip])
             
             demand_data = []
             
@@ -601,13 +1620,7 @@ class DuckDBService:
                 program = prog_row['program']
                 
                 # Get all configurations for this program
-                configs = self.query(f"""
-                    SELECT DISTINCT "{self.config_col}" as config
-                    FROM {main_table}
-                    WHERE "{self.program_col}" = '{program}'
-                    AND "{self.config_col}" IS NOT NULL AND "{self.config_col}" != ''
-                    ORDER BY config
-                """)
+                configs = self.query_statement("demand_configs", [program])
                 
                 config_list = []
                 
@@ -615,14 +1628,7 @@ class DuckDBService:
                     config = cfg_row['config']
                     
                     # Get ESNs for this program+config
-                    esns = self.query(f"""
-                        SELECT DISTINCT "{self.esn_col}" as esn, "{self.target_date_col}" as target_date
-                        FROM {main_table}
-                        WHERE "{self.program_col}" = '{program}'
-                        AND "{self.config_col}" = '{config}'
-                        AND "{self.esn_col}" IS NOT NULL AND "{self.esn_col}" != ''
-                        ORDER BY esn
-                    """)
+                    esns = self.query_statement("demand_esns", [program, config])
                     
                     esns_formatted = []
                     for esn_row in esns:
@@ -761,18 +1767,7 @@ class DuckDBService:
     def _get_level1_parts(self, program: str, config: str) -> List[Dict[str, Any]]:
         """Get Level 1 parts for a program and config using DuckDB query"""
         try:
-            main_table = self._get_main_table()
-            parts = self.query(f"""
-                SELECT DISTINCT 
-                    "{self.part_col}" as pn,
-                    "{self.hw_owner_col}" as hw_owner,
-                    "{self.supplier_col}" as supplier,
-                    CAST("QPE" AS INTEGER) as qpe
-                FROM {main_table}
-                WHERE "{self.program_col}" = '{program}'
-                AND "{self.config_col}" = '{config}'
-                AND "{self.part_col}" IS NOT NULL AND "{self.part_col}" != ''
-            """)
+            parts = self.query_statement("level1_parts", [program, config])
             
             result = []
             for part in parts:
@@ -803,18 +1798,7 @@ class DuckDBService:
     def _get_level2_parts(self, program: str, config: str, parent_pn: str) -> List[Dict[str, Any]]:
         """Get Level 2 parts for a parent part"""
         try:
-            main_table = self._get_main_table()
-            level2 = self.query(f"""
-                SELECT DISTINCT
-                    "{self.level2_pn_col}" as pn,
-                    "{self.level2_raw_type_col}" as raw_type,
-                    "{self.rm_supplier_col}" as rm_supplier
-                FROM {main_table}
-                WHERE "{self.program_col}" = '{program}'
-                AND "{self.config_col}" = '{config}'
-                AND "{self.part_col}" = '{parent_pn}'
-                AND "{self.level2_pn_col}" IS NOT NULL AND "{self.level2_pn_col}" != ''
-            """)
+            level2 = self.query_statement("level2_parts", [program, config, parent_pn])
             
             result = []
             for l2 in level2:
@@ -831,18 +1815,262 @@ class DuckDBService:
             print(f"⚠ Error getting Level 2 parts: {e}")
             return []
     
+    def _select_col(self, name: Optional[str], alias: str, cast: Optional[str] = None) -> str:
+        """SELECT item for an optional column: "col" AS alias, or NULL AS alias when the table lacks it"""
+        if not name or name not in self.column_names:
+            return f"NULL AS {alias}"
+        return f'TRY_CAST("{name}" AS {cast}) AS {alias}' if cast else f'"{name}" AS {alias}'
+    
+    def get_esn_trace(self, esn: str) -> Optional[Dict[str, Any]]:
+        """
+        Everything one engine needs: program, config, ship date, Level 1 parts (QPE,
+        supplier, HW owners) and their Level 2 parts (raw type, RM supplier)
+        
+        A single `ESN = ?` query, answered from the idx_esn ART index. Returns None
+        for unknown ESNs.
+        """
+        main_table = self._get_main_table()
+        col = self._select_col
+        
+        table = self._fetch_arrow(f"""
+            SELECT
+                {col(self.program_col, "program")},
+                {col(self.config_col, "config")},
+                {col(self.target_date_col, "target_ship_date")},
+                {col(self.part_col, "pn")},
+                {col("Part_Description", "description")},
+                {col("QPE", "qpe", "INTEGER")},
+                {col(self.supplier_col, "supplier")},
+                {col(self.hw_owner_col, "hw_owner")},
+                {col("Level_1_Raw_Type", "raw_type")},
+                {col("Level_1_Raw_Material_Supplier", "rm_supplier")},
+                {col(self.level2_pn_col, "l2_pn")},
+                {col("Level_2_Desc", "l2_description")},
+                {col("Level_2_QPE", "l2_qpe", "INTEGER")},
+                {col(self.level2_raw_type_col, "l2_raw_type")},
+                {col(self.rm_supplier_col, "l2_rm_supplier")}
+            FROM {main_table}
+            WHERE "{self.esn_col}" = ?
+            ORDER BY pn, l2_pn
+        """, [esn])
+        rows = table.to_pylist()
+        if not rows:
+            return None
+        
+        level1: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            pn = str(row["pn"] or "").strip()
+            if not pn:
+                continue
+            part = level1.get(pn)
+            if part is None:
+                hw_owner_str = str(row["hw_owner"] or "")
+                part = level1[pn] = {
+                    "pn": pn,
+                    "description": row["description"],
+                    "qpe": row["qpe"] if row["qpe"] is not None else 1,
+                    "supplier": row["supplier"],
+                    "hwo": [h.strip() for h in hw_owner_str.split(",") if h.strip()],
+                    "rawType": row["raw_type"],
+                    "rmSupplier": row["rm_supplier"],
+                    "level2Parts": [],
+                }
+            l2_pn = str(row["l2_pn"] or "").strip()
+            if l2_pn:
+                part["level2Parts"].append({
+                    "pn": l2_pn,
+                    "description": row["l2_description"],
+                    "qpe": row["l2_qpe"] if row["l2_qpe"] is not None else 1,
+                    "rawType": row["l2_raw_type"],
+                    "rmSupplier": row["l2_rm_supplier"],
+                })
+        
+        first = rows[0]
+        return {
+            "esn": esn,
+            "program": first["program"],
+            "config": first["config"],
+            "targetShipDate": first["target_ship_date"],
+            "row_count": len(rows),
+            "level1Parts": list(level1.values()),
+        }
+    
+    # Recursion guard for BOM explosion (cycles are also cut by the path check)
+    BOM_MAX_DEPTH = 10
+    
+    def explode_bom(self, program: Optional[str] = None, config: Optional[str] = None,
+                    part: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Multi-level BOM explosion with QPE roll-up (cached per program/config/part)
+        
+        Parent/child links are the Part_Number -> Level_2_PN pairs of the rows in scope;
+        a recursive CTE follows them to any depth (a Level 2 part that is itself a
+        parent elsewhere keeps expanding) and multiplies QPE down each path. Roots
+        are the config's Level 1 parts (with their QPE), or `part` with quantity 1.
+        When rows disagree on a QPE the largest value is used.
+        
+        Returns:
+            {"scope", "engines", "indented": [...], "leaves": [...], "rawMaterials": [...]}
+            - indented: one row per BOM line in depth-first order (level, part, parent,
+              qpe, qty = extended quantity per engine, isLeaf, ...)
+            - leaves: total quantity per engine of every leaf part (summed over paths)
+              and for all engines in scope
+            - rawMaterials: leaf totals grouped by raw type and RM supplier
+        """
+        if not config and not part:
+            raise ValueError("config or part is required")
+        return self._cached_derived(("bom", program, config, part),
+                                    lambda: self._explode_bom(program, config, part))
+    
+    def _explode_bom(self, program: Optional[str], config: Optional[str], part: Optional[str]) -> Dict[str, Any]:
+        main_table = self._get_main_table()
+        col = self._select_col
+        
+        scope_clauses = []
+        scope_params: List[Any] = []
+        for column, value in ((self.program_col, program), (self.config_col, config)):
+            if value:
+                scope_clauses.append(f'"{column}" = ?')
+                scope_params.append(value)
+        scope_where = " AND ".join(scope_clauses) if scope_clauses else "1=1"
+        
+        if part:
+            roots_sql = "SELECT CAST(? AS VARCHAR) AS part, CAST(1 AS DOUBLE) AS qpe"
+            roots_params: List[Any] = [part]
+            # Engines that use the part anywhere in their BOM
+            engines_where = "WHERE pn = ? OR l2_pn = ?"
+            engines_params: List[Any] = [part, part]
+        else:
+            roots_sql = """
+                SELECT pn AS part, MAX(COALESCE(qpe, 1)) AS qpe
+                FROM scope
+                WHERE pn IS NOT NULL AND pn != ''
+                GROUP BY pn
+            """
+            roots_params = []
+            engines_where = ""
+            engines_params = []
+        
+        sql = f"""
+            WITH RECURSIVE scope AS (
+                SELECT
+                    {col(self.part_col, "pn")},
+                    {col("QPE", "qpe", "DOUBLE")},
+                    {col("Part_Description", "description")},
+                    {col("Level_1_Raw_Type", "raw_type")},
+                    {col("Level_1_Raw_Material_Supplier", "rm_supplier")},
+                    {col(self.level2_pn_col, "l2_pn")},
+                    {col("Level_2_QPE", "l2_qpe", "DOUBLE")},
+                    {col("Level_2_Desc", "l2_description")},
+                    {col(self.level2_raw_type_col, "l2_raw_type")},
+                    {col(self.rm_supplier_col, "l2_rm_supplier")},
+                    {col(self.esn_col, "esn")}
+                FROM {main_table}
+                WHERE {scope_where}
+            ),
+            edges AS (
+                SELECT pn AS parent, l2_pn AS child, MAX(COALESCE(l2_qpe, 1)) AS qpe
+                FROM scope
+                WHERE pn IS NOT NULL AND pn != '' AND l2_pn IS NOT NULL AND l2_pn != ''
+                GROUP BY pn, l2_pn
+            ),
+            attrs AS (
+                SELECT part, ANY_VALUE(description) AS description, ANY_VALUE(raw_type) AS raw_type,
+                       ANY_VALUE(rm_supplier) AS rm_supplier
+                FROM (
+                    SELECT pn AS part, description, raw_type, rm_supplier FROM scope
+                    UNION ALL
+                    SELECT l2_pn, l2_description, l2_raw_type, l2_rm_supplier FROM scope
+                )
+                WHERE part IS NOT NULL AND part != ''
+                GROUP BY part
+            ),
+            roots AS ({roots_sql}),
+            bom(part, parent, level, qpe, qty, path) AS (
+                SELECT part, CAST(NULL AS VARCHAR), 1, CAST(qpe AS DOUBLE), CAST(qpe AS DOUBLE), [part]
+                FROM roots
+                UNION ALL
+                SELECT e.child, b.part, b.level + 1, e.qpe, b.qty * e.qpe, list_append(b.path, e.child)
+                FROM bom b
+                JOIN edges e ON e.parent = b.part
+                WHERE b.level < {int(self.BOM_MAX_DEPTH)} AND NOT list_contains(b.path, e.child)
+            )
+            SELECT
+                b.level, b.part, b.parent, b.qpe, b.qty,
+                a.description, a.raw_type, a.rm_supplier,
+                NOT EXISTS (SELECT 1 FROM edges e WHERE e.parent = b.part) AS is_leaf,
+                array_to_string(b.path, ' > ') AS path,
+                (SELECT COUNT(DISTINCT esn) FROM scope {engines_where}) AS engines
+            FROM bom b
+            LEFT JOIN attrs a ON a.part = b.part
+            ORDER BY b.path
+        """
+        rows = self._fetch_arrow(sql, scope_params + roots_params + engines_params).to_pylist()
+        engines = rows[0]["engines"] if rows else 0
+        
+        indented = []
+        leaves: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            indented.append({
+                "level": row["level"],
+                "part": row["part"],
+                "parent": row["parent"],
+                "description": row["description"],
+                "qpe": row["qpe"],
+                "qty": row["qty"],
+                "rawType": row["raw_type"],
+                "rmSupplier": row["rm_supplier"],
+                "isLeaf": row["is_leaf"],
+                "path": row["path"],
+            })
+            if row["is_leaf"]:
+                leaf = leaves.setdefault(row["part"], {
+                    "part": row["part"],
+                    "description": row["description"],
+                    "rawType": row["raw_type"],
+                    "rmSupplier": row["rm_supplier"],
+                    "qtyPerEngine": 0.0,
+                    "paths": 0,
+                })
+                leaf["qtyPerEngine"] += row["qty"]
+                leaf["paths"] += 1
+        
+        raw_materials: Dict[tuple, Dict[str, Any]] = {}
+        for leaf in leaves.values():
+            leaf["totalQty"] = leaf["qtyPerEngine"] * engines
+            key = (leaf["rawType"], leaf["rmSupplier"])
+            material = raw_materials.setdefault(key, {
+                "rawType": leaf["rawType"],
+                "rmSupplier": leaf["rmSupplier"],
+                "qtyPerEngine": 0.0,
+                "totalQty": 0.0,
+                "parts": 0,
+            })
+            material["qtyPerEngine"] += leaf["qtyPerEngine"]
+            material["totalQty"] += leaf["totalQty"]
+            material["parts"] += 1
+        
+        return {
+            "scope": {"program": program, "config": config, "part": part},
+            "engines": engines,
+            "line_count": len(indented),
+            "indented": indented,
+            "leaves": sorted(leaves.values(), key=lambda leaf: leaf["part"]),
+            "rawMaterials": sorted(raw_materials.values(), key=lambda m: (str(m["rawType"]), str(m["rmSupplier"]))),
+        }
+    
     def get_summary_stats(self) -> Dict[str, Any]:
         """Get summary statistics"""
         try:
-            stats = self.conn.execute("""
+            stats = self._fetchall(f"""
                 SELECT 
                     COUNT(*) as total_rows,
-                    COUNT(DISTINCT "ENGINE PROGRAM") as unique_programs,
-                    COUNT(DISTINCT "Configuration") as unique_configs,
-                    COUNT(DISTINCT "Part Number") as unique_parts,
-                    COUNT(DISTINCT "Parent Part Supplier") as unique_suppliers
-                FROM raw_data
-            """).fetchall()[0]
+                    COUNT(DISTINCT "{self.program_col}") as unique_programs,
+                    COUNT(DISTINCT "{self.config_col}") as unique_configs,
+                    COUNT(DISTINCT "{self.part_col}") as unique_parts,
+                    COUNT(DISTINCT "{self.supplier_col}") as unique_suppliers
+                FROM {self._get_main_table()}
+            """)[0]
             
             return {
                 "total_rows": stats[0],
@@ -850,7 +2078,7 @@ class DuckDBService:
                 "unique_configs": stats[2],
                 "unique_parts": stats[3],
                 "unique_suppliers": stats[4],
-                "columns": self.df.columns if self.df else []
+                "columns": list(self.column_names)
             }
         except Exception as e:
             print(f"⚠ Error getting summary stats: {e}")
@@ -859,17 +2087,17 @@ class DuckDBService:
     def query_output_data(self, sql: str = None) -> List[Dict[str, Any]]:
         """Query the Output sheet data"""
         try:
-            if not self.output_df:
+            if self.output_df is None:
                 return []
             
             # If no SQL provided, return all output data
             if sql is None:
                 sql = "SELECT * FROM output_data"
             
-            result = self.conn.execute(sql).fetchall()
-            columns = [desc[0] for desc in self.conn.description]
+            with self.cursor() as cur:
+                table = fetch_arrow(cur.execute(sql))
             
-            return [dict(zip(columns, row)) for row in result]
+            return shape_arrow(table)
         except Exception as e:
             print(f"⚠ Error querying output data: {e}")
             return []
@@ -880,12 +2108,12 @@ class DuckDBService:
             if not self.output_df:
                 return {"error": "Output sheet not loaded"}
             
-            info = self.conn.execute("""
+            info = self._fetchall("""
                 SELECT 
                     COUNT(*) as total_rows,
                     COUNT(DISTINCT column_names) as total_columns
                 FROM (SELECT UNNEST(list_distinct([column_names])) as column_names FROM output_data)
-            """).fetchall()
+            """)
             
             return {
                 "rows": self.output_df.shape[0],
@@ -901,24 +2129,305 @@ class DuckDBService:
                 "column_names": self.output_df.columns if self.output_df else []
             }
     
-    def get_all_output_data(self) -> List[Dict[str, Any]]:
+    def get_main_table_count(self) -> int:
+        """Total rows in the main table (cached - the table only changes on ingest)"""
+        if self._row_count is None:
+            self._row_count = self._fetchall(f"SELECT COUNT(*) FROM {self._get_main_table()}")[0][0]
+        return self._row_count
+    
+    def invalidate_caches(self, scope: Optional[Dict[str, Any]] = None):
+        """
+        Drop cached counts and derived results after the main table has changed
+        
+        With a delta scope (see apply_delta), derived results that only depend on
+        untouched programs / configs are kept.
+        """
+        self._row_count = None
+        self._datatable_totals.clear()
+        with self._derived_lock:
+            if scope is None:
+                self._derived.clear()
+            else:
+                self._derived = {key: value for key, value in self._derived.items()
+                                 if self._derived_unaffected(key, value, scope)}
+            self.data_version += 1
+        
+        # The DataFrame copy of the file is re-materialized on next access
+        if self.use_external_db:
+            self._df = None
+        for callback in list(self._invalidation_hooks):
+            callback()
+    
+    def on_invalidate(self, callback: Callable[[], None]):
+        """Register a callback to drop caches held outside the service whenever the data changes"""
+        self._invalidation_hooks.append(callback)
+    
+    @staticmethod
+    def _derived_unaffected(key, value, scope: Dict[str, Any]) -> bool:
+        """True if a cached derived result is still valid after a delta with this scope"""
+        kind = key[0] if isinstance(key, tuple) else key
+        if kind == "bom":
+            # Explosions only read rows of their config (or program)
+            program, config, _ = key[1:]
+            if config is not None:
+                return config not in scope["configs"]
+            return program is not None and program not in scope["programs"]
+        if kind == "demand_chunk":
+            # A page of programs is unchanged if the program list is and none of its programs was touched
+            return (not scope["programs_changed"]
+                    and not any(item.get("engineProgram") in scope["programs"] for item in value))
+        # Everything else aggregates over the whole table
+        return False
+    
+    def _cached_derived(self, key, compute):
+        """
+        Return a derived result, computing it on first use for the current data version
+        
+        Concurrent first calls are coalesced by run_shared() at the route level.
+        """
+        with self._derived_lock:
+            if key in self._derived:
+                return self._derived[key]
+            version = self.data_version
+        
+        value = compute()
+        
+        with self._derived_lock:
+            if version == self.data_version:
+                self._derived.setdefault(key, value)
+        return value
+    
+    # Natural key of a main-table row for delta ingests
+    DELTA_KEY_ATTRS = ("esn_col", "part_col", "level2_pn_col")
+    
+    @staticmethod
+    def delta_source(path: str) -> tuple:
+        """(relation, params) reading a delta file: Parquet, or CSV with every column as text"""
+        if str(path).lower().endswith(".parquet"):
+            return "read_parquet(?)", [str(path)]
+        return "read_csv(?, header = true, all_varchar = true)", [str(path)]
+    
+    def apply_delta(self, relation: str, params: Optional[list] = None) -> Dict[str, Any]:
+        """
+        Upsert a delta (new ESNs, date changes, ...) into the main table, keyed on
+        (ESN, Part_Number, Level_2_PN), and refresh only what it touched
+        
+        relation is a SQL relation holding the delta rows with its params, e.g.
+        from delta_source(path). Columns missing from
+        the delta keep their current values on updated rows. The last row wins when
+        a key appears twice.
+        
+        Afterwards, for the touched ESNs / parts / programs / configs only:
+        search-index and where-used rows are replaced, gap-analysis demand is
+        recomputed, and cached results scoped to untouched programs and configs are
+        kept. The in-memory part index and filter bitmaps are rebuilt (rowids move).
+        A cached data fingerprint is updated from the touched rows' hashes.
+        ART indexes are maintained by DuckDB, views need no change.
+        
+        Callers that serve requests concurrently hold snapshot.write() around it.
+        Raises PermissionError in read-only mode, ValueError for a bad delta.
+        """
+        if self.read_only:
+            raise PermissionError("Delta ingest needs a read-write database - this worker is read-only")
+        main_table = self._get_main_table()
+        key_cols = [getattr(self, attr) for attr in self.DELTA_KEY_ATTRS]
+        if not all(col in self.column_names for col in key_cols):
+            raise ValueError(f"Main table lacks the delta key columns: {', '.join(key_cols)}")
+        
+        start_time = time.time()
+        with self.cursor() as cur:
+            cur.execute(f"CREATE OR REPLACE TEMP TABLE delta_raw AS SELECT * FROM {relation}", params or [])
+            try:
+                delta_cols = [d[0] for d in cur.execute("SELECT * FROM delta_raw LIMIT 0").description]
+                unknown = [col for col in delta_cols if col not in self.column_names]
+                if unknown:
+                    raise ValueError(f"Delta has columns the main table does not: {', '.join(unknown)}")
+                missing = [col for col in key_cols if col not in delta_cols]
+                if missing:
+                    raise ValueError(f"Delta is missing key column(s): {', '.join(missing)}")
+                
+                types = dict(cur.execute(
+                    "SELECT column_name, data_type FROM information_schema.columns "
+                    "WHERE table_schema = 'main' AND table_name = ?", [main_table]
+                ).fetchall())
+                # Keys compare as text with NULL = '' (rows without a Level 2 part), as in _key_expr
+                key_match = " AND ".join(f"COALESCE(CAST(m.\"{col}\" AS VARCHAR), '') = d.\"__key_{i}\""
+                                         for i, col in enumerate(key_cols))
+                casts = ", ".join(f'TRY_CAST("{col}" AS {types[col]}) AS "{col}"' for col in delta_cols)
+                keys = ", ".join(f'{self._key_expr(col)} AS "__key_{i}"' for i, col in enumerate(key_cols))
+                partition = ", ".join(f'"__key_{i}"' for i in range(len(key_cols)))
+                cur.execute(f"""
+                    CREATE OR REPLACE TEMP TABLE delta_rows AS
+                    SELECT {casts}, {keys}
+                    FROM (SELECT *, row_number() OVER () AS __seq FROM delta_raw)
+                    WHERE {self._key_expr(key_cols[0])} != ''
+                    QUALIFY row_number() OVER (PARTITION BY {partition} ORDER BY __seq DESC) = 1
+                """)
+                
+                programs_before = {row[0] for row in cur.execute(
+                    f'SELECT DISTINCT "{self.program_col}" FROM {main_table}').fetchall()}
+                
+                # Scope: the rows being replaced plus the incoming ones
+                scope_cols = {"programs": self.program_col, "configs": self.config_col, "esns": self.esn_col,
+                              "parts": self.part_col, "level2_parts": self.level2_pn_col}
+                scope = {name: set() for name in scope_cols}
+                existing = cur.execute(f"""
+                    SELECT {", ".join(f'm."{col}"' for col in scope_cols.values())}
+                    FROM {main_table} m JOIN delta_rows d ON {key_match}
+                """).fetchall()
+                incoming = cur.execute(f"""
+                    SELECT {", ".join(f'"{col}"' if col in delta_cols else "NULL" for col in scope_cols.values())}
+                    FROM delta_rows
+                """).fetchall()
+                for row in existing + incoming:
+                    for name, value in zip(scope_cols, row):
+                        if value is not None and value != "":
+                            scope[name].add(value)
+                
+                # XOR the replaced rows out of the cached fingerprint now and the new ones in after COMMIT
+                # (inserted rows get their final rowids on commit), instead of rescanning the table
+                with self._derived_lock:
+                    previous = self._derived.get("data_fingerprint")
+                touched_digest = f"SELECT {self._row_digest_sql()} FROM {main_table} m JOIN delta_rows d ON {key_match}"
+                if previous:
+                    removed = cur.execute(touched_digest).fetchone()[0]
+                
+                set_cols = [col for col in delta_cols if col not in key_cols]
+                cur.execute("BEGIN TRANSACTION")
+                try:
+                    updated = 0
+                    if set_cols:
+                        updated = cur.execute(f"""
+                            UPDATE {main_table} AS m
+                            SET {", ".join(f'"{col}" = d."{col}"' for col in set_cols)}
+                            FROM delta_rows d
+                            WHERE {key_match}
+                        """).fetchone()[0]
+                    inserted = cur.execute(f"""
+                        INSERT INTO {main_table} ({", ".join(f'"{col}"' for col in delta_cols)})
+                        SELECT {", ".join(f'd."{col}"' for col in delta_cols)}
+                        FROM delta_rows d
+                        WHERE NOT EXISTS (SELECT 1 FROM {main_table} m WHERE {key_match})
+                    """).fetchone()[0]
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+                
+                fingerprint = None
+                if previous:
+                    rows, digest = previous.split(":")
+                    added = cur.execute(touched_digest).fetchone()[0]
+                    fingerprint = f"{int(rows) + inserted}:{int(digest, 16) ^ removed ^ added:x}"
+                
+                programs_after = {row[0] for row in cur.execute(
+                    f'SELECT DISTINCT "{self.program_col}" FROM {main_table}').fetchall()}
+                scope["programs_changed"] = programs_before != programs_after
+                
+                self._refresh_delta_rows(cur, main_table, scope)
+            finally:
+                cur.execute("DROP TABLE IF EXISTS delta_rows")
+                cur.execute("DROP TABLE IF EXISTS delta_raw")
+        
+        self.invalidate_caches(scope)
+        if fingerprint:
+            with self._derived_lock:
+                self._derived["data_fingerprint"] = fingerprint
+        self.refresh_part_index()
+        self.refresh_filter_bitmaps()
+        self.gap.refresh_parts(scope["parts"] | scope["level2_parts"])
+        
+        # The refreshed tables now match the new data
+        fingerprint = self.data_fingerprint()
+        with self.cursor() as cur:
+            for table in (self.search_table, self.where_used_table):
+                if table:
+                    self._stamp_derived(cur, table, fingerprint)
+        
+        elapsed = time.time() - start_time
+        print(f"[OK] Delta applied: {updated:,} updated, {inserted:,} inserted "
+              f"({len(scope['esns'])} ESNs, {len(scope['configs'])} configs) in {elapsed*1000:.0f}ms")
+        return {
+            "updated": updated,
+            "inserted": inserted,
+            "programs": sorted(scope["programs"]),
+            "configs": sorted(scope["configs"]),
+            "esns": len(scope["esns"]),
+            "parts": len(scope["parts"] | scope["level2_parts"]),
+            "execution_time_ms": f"{elapsed*1000:.2f}",
+        }
+    
+    def _refresh_delta_rows(self, cur, main_table: str, scope: Dict[str, Any]):
+        """Replace the touched ESNs' rows in the search and where-used tables"""
+        cur.register("delta_esns", pa.table({"esn": pa.array(sorted(str(esn) for esn in scope["esns"]), pa.string())}))
+        try:
+            esn_match = f'CAST("{self.esn_col}" AS VARCHAR) IN (SELECT esn FROM delta_esns)'
+            if self.search_table:
+                # Updated rows may have moved to new rowids - drop the touched ESNs' and any orphaned entries
+                cur.execute(f"""
+                    DELETE FROM {self.search_table}
+                    WHERE row_id IN (SELECT rowid FROM {main_table} WHERE {esn_match})
+                       OR row_id NOT IN (SELECT rowid FROM {main_table})
+                """)
+                cur.execute(f"""
+                    INSERT INTO {self.search_table}
+                    SELECT rowid AS row_id, {self._search_text_sql()} AS search_text
+                    FROM {main_table}
+                    WHERE {esn_match}
+                """)
+            if self.where_used_table:
+                cur.execute(f"DELETE FROM {self.where_used_table} WHERE CAST(esn AS VARCHAR) IN (SELECT esn FROM delta_esns)")
+                cur.execute(f"INSERT INTO {self.where_used_table} {self._where_used_sql(main_table, esn_match)}")
+        finally:
+            cur.unregister("delta_esns")
+    
+    def get_demand_chunk(self, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """Demand hierarchy for one page of programs (cached per page)"""
+        return self._cached_derived(("demand_chunk", skip, limit),
+                                    lambda: self.get_demand_data_paginated(skip, limit))
+    
+    def get_cdata_cached(self) -> List[Dict[str, Any]]:
+        """Engine Program Overview chart data (cached)"""
+        return self._cached_derived(("cdata",), self.get_cdata)
+    
+    def get_program_row_counts(self) -> Dict[str, int]:
+        """Main-table rows per program, in program order (cached) - used for progress reporting"""
+        def compute():
+            rows = self._fetchall(f"""
+                SELECT "{self.program_col}" AS program, COUNT(*) AS row_count
+                FROM {self._get_main_table()}
+                WHERE "{self.program_col}" IS NOT NULL AND "{self.program_col}" != ''
+                GROUP BY program
+                ORDER BY program
+            """)
+            return {program: count for program, count in rows}
+        return self._cached_derived(("program_rows",), compute)
+    
+    def get_all_output_data(self, skip: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Get all data from the main data table as a list of dictionaries
+        Get rows from the main data table as a list of dictionaries
         This is used for the datatable page to display all records with filters
+        
+        skip/limit are pushed into DuckDB (LIMIT/OFFSET), so a page costs the same
+        regardless of table size; limit=None returns everything from skip on.
+        Rows are ordered by rowid so pages neither overlap nor skip rows when
+        preserve_insertion_order is off.
         """
         try:
-            print(f"[DUCKDB] Fetching all data from {self.main_table} table...")
-            
-            # Use DuckDB to fetch all data from main table
-            result = self.conn.execute(f"SELECT * FROM {self.main_table}").fetchall()
-            columns = [desc[0] for desc in self.conn.description]
-            
-            # Convert to list of dictionaries
-            data = [dict(zip(columns, row)) for row in result]
-            
-            print(f"[DUCKDB] ✓ Fetched {len(data)} records with {len(columns)} columns")
-            
-            return data
+            sql = f"SELECT * FROM {self._get_main_table()} ORDER BY rowid"
+            params = []
+            if limit is not None:
+                sql += " LIMIT ? OFFSET ?"
+                params = [int(limit), int(skip)]
+            elif skip:
+                sql += " OFFSET ?"
+                params = [int(skip)]
+            
+            # Fetch columnar (Arrow) from DuckDB, then build row dicts in one pass
+            with self.cursor() as cur:
+                table = fetch_arrow(cur.execute(sql, params))
+            
+            return shape_arrow(table)
         except Exception as e:
             print(f"[ERROR] Error fetching all data: {e}")
             import traceback
@@ -927,6 +2436,8 @@ class DuckDBService:
     
     def close(self):
         """Close DuckDB connection"""
+        if self.connections:
+            self.connections.shutdown()
         if self.conn:
             self.conn.close()
             print("✓ DuckDB connection closed")
@@ -312,6 +312,150 @@ class ChunkLoader {
     }
   }
 
+  /**
+   * Load all data over one Server-Sent Events connection
+   * The server pushes `chunk` events (one page of programs each), `progress`
+   * events with program/row counts, then `aggregates` and `done`.
+   * Aggregates (chart data, summary stats) are kept in this.aggregates.
+   * @param {string} url - The SSE endpoint URL
+   * @returns {Promise} Resolves with all data when the `done` event arrives
+   */
+  loadStream(url) {
+    this.isLoading = true;
+    this.hasMore = true;
+    this.skip = 0;
+    this.loadedCount = 0;
+    this.allData = [];
+    this.total = 0;
+    this.rowsLoaded = 0;
+    this.rowsTotal = 0;
+    this.aggregates = null;
+
+    this.showLoadingIndicator();
+    this.updateProgress();
+
+    const streamUrl = `${url}${url.includes('?') ? '&' : '?'}chunk_size=${this.chunkSize}`;
+    console.log(`📡 Opening demand stream: ${streamUrl}`);
+
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(streamUrl);
+      let finished = false;
+
+      const fail = (error) => {
+        if (finished) return;
+        finished = true;
+        source.close();
+        this.isLoading = false;
+
+        const statusEl = document.getElementById('loader-status');
+        if (statusEl) {
+          statusEl.textContent = `❌ Loading failed: ${error.message}`;
+        }
+        const progressEl = document.getElementById('loader-progress');
+        if (progressEl) {
+          progressEl.textContent = 'Error - Loading Failed';
+        }
+        const barEl = document.getElementById('loader-bar');
+        if (barEl) {
+          barEl.style.background = '#dc3545'; // Red color for error
+        }
+        setTimeout(() => {
+          this.hideLoadingIndicator();
+        }, 3000);
+
+        console.error('Error loading stream:', error);
+        if (this.onError) {
+          this.onError(error);
+        }
+        reject(error);
+      };
+
+      source.addEventListener('progress', (event) => {
+        const progress = JSON.parse(event.data);
+        this.total = progress.programs_total;
+        this.rowsLoaded = progress.rows_loaded;
+        this.rowsTotal = progress.rows_total;
+        this.updateProgress();
+
+        const statusEl = document.getElementById('loader-status');
+        if (statusEl && progress.rows_total > 0) {
+          statusEl.textContent = `${progress.programs_loaded.toLocaleString()} of ${progress.programs_total.toLocaleString()} programs (${progress.rows_loaded.toLocaleString()} of ${progress.rows_total.toLocaleString()} rows)`;
+        }
+
+        if (this.onProgress) {
+          this.onProgress({
+            loaded: progress.programs_loaded,
+            total: progress.programs_total,
+            percentage: Math.round(progress.percent),
+            hasMore: progress.programs_loaded < progress.programs_total,
+            rowsLoaded: progress.rows_loaded,
+            rowsTotal: progress.rows_total,
+            stage: progress.stage
+          });
+        }
+      });
+
+      source.addEventListener('chunk', (event) => {
+        const chunk = JSON.parse(event.data);
+        const data = Array.isArray(chunk.data) ? chunk.data : [];
+        this.allData.push(...data);
+        this.loadedCount += data.length;
+        this.skip = chunk.skip + data.length;
+
+        if (this.onChunkLoaded) {
+          this.onChunkLoaded(data, this.loadedCount, this.total);
+        }
+        console.log(`📦 Stream chunk: ${data.length} items (total: ${this.loadedCount}/${this.total})`);
+      });
+
+      source.addEventListener('aggregates', (event) => {
+        this.aggregates = JSON.parse(event.data);
+        console.log('📊 Stream aggregates received');
+      });
+
+      source.addEventListener('error', (event) => {
+        // Server-sent `error` events carry a payload; connection errors do not
+        if (event.data) {
+          fail(new Error(JSON.parse(event.data).detail));
+        } else if (!finished) {
+          fail(new Error('Stream connection lost'));
+        }
+      });
+
+      source.addEventListener('done', async (event) => {
+        const done = JSON.parse(event.data);
+        finished = true;
+        source.close();
+        this.hasMore = false;
+        console.log(`✅ Stream complete: ${done.programs} programs, ${done.rows} rows in ${done.execution_time_ms}ms`);
+
+        const statusEl = document.getElementById('loader-status');
+        if (statusEl) {
+          statusEl.textContent = `✅ Successfully loaded ${this.loadedCount.toLocaleString()} programs`;
+        }
+        const progressEl = document.getElementById('loader-progress');
+        if (progressEl) {
+          progressEl.textContent = '100% Complete';
+        }
+        const barEl = document.getElementById('loader-bar');
+        if (barEl) {
+          barEl.style.width = '100%';
+        }
+
+        // Brief delay to show completion before hiding
+        await new Promise(r => setTimeout(r, 800));
+
+        this.isLoading = false;
+        this.hideLoadingIndicator();
+
+        if (this.onAllLoaded) {
+          this.onAllLoaded(this.allData);
+        }
+        resolve(this.allData);
+      });
+    });
+  }
+
   /**
    * Load a single chunk of data
    * @param {string} url - The endpoint URL
@@ -137,6 +137,8 @@ class DataTableManager {
     this.totalRecords = 0;
     this.currentPage = 1;
     this.itemsPerPage = 10; // Default to 10 items per page
+    // Keyset cursors: page number -> cursor that starts it ('' = first page)
+    this.pageCursors = { 1: '' };
     this.filterValues = {
       productLine: [],
       year: '',
@@ -145,8 +147,11 @@ class DataTableManager {
       rmSupplier: [],
       hwOwner: [],
       module: [],
-      partNumber: []
+      partNumber: [],
+      search: ''
     };
+    // Server-side sort: [{ column, desc }] - click a header to sort, shift+click to add a column
+    this.sortSpec = [];
     
     // Initialize checkbox dropdowns
     this.dropdowns = {
@@ -168,6 +173,13 @@ class DataTableManager {
     // Event listeners for filter buttons
     document.getElementById('btnApplyFilters').addEventListener('click', () => this.applyFilters());
     document.getElementById('btnResetFilters').addEventListener('click', () => this.resetFilters());
+    document.getElementById('filterSearch').addEventListener('keydown', (e) => {
+      if (e.key === 'Enter') this.applyFilters();
+    });
+    document.getElementById('tableContainer').addEventListener('click', (e) => {
+      const header = e.target.closest('th[data-column]');
+      if (header) this.toggleSort(header.dataset.column, e.shiftKey);
+    });
     document.getElementById('btnExportCSV').addEventListener('click', () => this.exportToCSV());
     
     // Pagination event listeners
@@ -211,6 +223,46 @@ class DataTableManager {
     }
   }
 
+  buildFilterParams() {
+    /**
+     * Current filter selections as query parameters (shared by filtering and export)
+     */
+    const params = new URLSearchParams();
+    
+    if (this.filterValues.productLine.length > 0) {
+      this.filterValues.productLine.forEach(v => params.append('productLines', v));
+    }
+    if (this.filterValues.year) {
+      params.append('year', this.filterValues.year);
+    }
+    if (this.filterValues.engineConfig.length > 0) {
+      this.filterValues.engineConfig.forEach(v => params.append('configs', v));
+    }
+    if (this.filterValues.supplier.length > 0) {
+      this.filterValues.supplier.forEach(v => params.append('suppliers', v));
+    }
+    if (this.filterValues.rmSupplier.length > 0) {
+      this.filterValues.rmSupplier.forEach(v => params.append('rmSuppliers', v));
+    }
+    if (this.filterValues.hwOwner.length > 0) {
+      this.filterValues.hwOwner.forEach(v => params.append('hwOwners', v));
+    }
+    if (this.filterValues.module.length > 0) {
+      this.filterValues.module.forEach(v => params.append('modules', v));
+    }
+    if (this.filterValues.partNumber.length > 0) {
+      this.filterValues.partNumber.forEach(v => params.append('partNumbers', v));
+    }
+    if (this.filterValues.search) {
+      params.append('q', this.filterValues.search);
+    }
+    if (this.sortSpec.length > 0) {
+      params.append('sort', this.sortSpec.map(s => (s.desc ? '-' : '') + s.column).join(','));
+    }
+    
+    return params;
+  }
+
   async fetchFilteredData() {
     /**
      * Fetch filtered data from server using DuckDB SQL filtering
@@ -223,36 +275,16 @@ class DataTableManager {
       const skip = (this.currentPage - 1) * this.itemsPerPage;
       const limit = this.itemsPerPage;
       
-      // Build query parameters
-      const params = new URLSearchParams();
-      params.append('skip', skip);
-      params.append('limit', limit);
-      
-      // Add filters
-      if (this.filterValues.productLine.length > 0) {
-        this.filterValues.productLine.forEach(v => params.append('productLines', v));
-      }
-      if (this.filterValues.year) {
-        params.append('year', this.filterValues.year);
-      }
-      if (this.filterValues.engineConfig.length > 0) {
-        this.filterValues.engineConfig.forEach(v => params.append('configs', v));
-      }
-      if (this.filterValues.supplier.length > 0) {
-        this.filterValues.supplier.forEach(v => params.append('suppliers', v));
-      }
-      if (this.filterValues.rmSupplier.length > 0) {
-        this.filterValues.rmSupplier.forEach(v => params.append('rmSuppliers', v));
-      }
-      if (this.filterValues.hwOwner.length > 0) {
-        this.filterValues.hwOwner.forEach(v => params.append('hwOwners', v));
-      }
-      if (this.filterValues.module.length > 0) {
-        this.filterValues.module.forEach(v => params.append('modules', v));
-      }
-      if (this.filterValues.partNumber.length > 0) {
-        this.filterValues.partNumber.forEach(v => params.append('partNumbers', v));
+      // Build query parameters - use the page's cursor when known (no OFFSET scan),
+      // fall back to skip for jumps (e.g. last page)
+      const params = this.buildFilterParams();
+      const cursor = this.pageCursors[this.currentPage];
+      if (cursor !== undefined) {
+        params.append('cursor', cursor);
+      } else {
+        params.append('skip', skip);
       }
+      params.append('limit', limit);
       
       // Fetch from server
       const response = await fetch(`/api/datatable/filter?${params.toString()}`, {
@@ -268,6 +300,9 @@ class DataTableManager {
       
       // Update internal state
       this.totalRecords = result.total;
+      if (result.next) {
+        this.pageCursors[this.currentPage + 1] = result.next;
+      }
       
       // Display the data
       this.displayTable(result.data);
@@ -341,11 +376,13 @@ class DataTableManager {
     this.filterValues.hwOwner = this.dropdowns.hwOwner.getSelectedValues();
     this.filterValues.module = this.dropdowns.module.getSelectedValues();
     this.filterValues.partNumber = this.dropdowns.partNumber.getSelectedValues();
+    this.filterValues.search = document.getElementById('filterSearch').value.trim();
     
     console.log('📋 Filter values:', this.filterValues);
     
     // Reset to page 1 when applying filters
     this.currentPage = 1;
+    this.pageCursors = { 1: '' };
     
     // Fetch filtered data from server (DuckDB will do the heavy lifting)
     this.fetchFilteredData();
@@ -363,8 +400,9 @@ class DataTableManager {
     this.dropdowns.module.reset();
     this.dropdowns.partNumber.reset();
     
-    // Reset year select
+    // Reset year select and search box
     document.getElementById('filterYear').selectedIndex = 0;
+    document.getElementById('filterSearch').value = '';
     
     // Reset filter values
     this.filterValues = {
@@ -375,11 +413,14 @@ class DataTableManager {
       rmSupplier: [],
       hwOwner: [],
       module: [],
-      partNumber: []
+      partNumber: [],
+      search: ''
     };
+    this.sortSpec = [];
     
     // Reset to page 1
     this.currentPage = 1;
+    this.pageCursors = { 1: '' };
     
     // Fetch all data (no filters)
     this.fetchFilteredData();
@@ -406,7 +447,9 @@ class DataTableManager {
     // Table header
     tableHTML += '<thead><tr>';
     columns.forEach(col => {
-      tableHTML += `<th>${this.formatColumnName(col)}</th>`;
+      const sorted = this.sortSpec.find(s => s.column === col);
+      const indicator = sorted ? (sorted.desc ? ' ▼' : ' ▲') : '';
+      tableHTML += `<th class="sortable" data-column="${col}">${this.formatColumnName(col)}${indicator}</th>`;
     });
     tableHTML += '</tr></thead>';
     
@@ -486,6 +529,29 @@ class DataTableManager {
     document.getElementById('btnLastPage').disabled = this.currentPage >= totalPages;
   }
 
+  toggleSort(column, addColumn) {
+    /**
+     * Sort server-side by a column: ascending -> descending -> off.
+     * Shift+click keeps the existing sort columns (multi-column sort).
+     */
+    const existing = this.sortSpec.find(s => s.column === column);
+    if (!addColumn) {
+      this.sortSpec = existing ? [existing] : [];
+    }
+    if (!existing) {
+      this.sortSpec.push({ column, desc: false });
+    } else if (!existing.desc) {
+      existing.desc = true;
+    } else {
+      this.sortSpec = this.sortSpec.filter(s => s !== existing);
+    }
+    
+    console.log('↕️ Sort:', this.sortSpec);
+    this.currentPage = 1;
+    this.pageCursors = { 1: '' };
+    this.fetchFilteredData();
+  }
+
   goToFirstPage() {
     this.currentPage = 1;
     this.fetchFilteredData();
@@ -515,17 +581,20 @@ class DataTableManager {
   changeItemsPerPage(value) {
     this.itemsPerPage = parseInt(value);
     this.currentPage = 1; // Reset to first page
+    this.pageCursors = { 1: '' };
     this.fetchFilteredData();
   }
 
   exportToCSV() {
-    console.log('💾 Exporting to CSV...');
-    
-    alert('CSV export will export the currently filtered results. This feature needs to be implemented with server-side export for large datasets.');
+    /**
+     * Server-side export of the full filtered result (streamed by DuckDB,
+     * not limited to the rows loaded in the table)
+     */
+    console.log('💾 Exporting filtered results to CSV...');
     
-    // TODO: Implement server-side CSV export endpoint
-    // For now, just show a message
-    console.log('✓ CSV export placeholder');
+    const params = this.buildFilterParams();
+    params.append('format', 'csv');
+    window.location.href = `/api/datatable/export?${params.toString()}`;
   }
 
   showError(message) {
@@ -830,6 +830,10 @@ const chunkLoader = new ChunkLoader({
   },
   onAllLoaded: (allData) => {
     console.log(`✅ All data loaded: ${allData.length} items`);
+    // Chart data arrives with the stream - no separate /api/demand/chart-data request
+    if (chunkLoader.aggregates && Array.isArray(chunkLoader.aggregates.cdata)) {
+      window.STREAMED_CDATA = chunkLoader.aggregates.cdata;
+    }
     initializeDashboard(allData);
   },
   onProgress: (progress) => {
@@ -849,8 +853,12 @@ const chunkLoader = new ChunkLoader({
   }
 });
 
-// Start loading chunks from DuckDB API endpoint
-chunkLoader.loadChunks('/api/demand/programs').catch(error => {
+// Start loading from the DuckDB API: one Server-Sent Events stream where
+// supported, otherwise paginated requests
+const demandLoad = typeof window.EventSource !== 'undefined'
+  ? chunkLoader.loadStream('/api/demand/stream')
+  : chunkLoader.loadChunks('/api/demand/programs');
+demandLoad.catch(error => {
   console.error('Fatal error loading data:', error);
   showDataError('Failed to load dashboard data: ' + error.message);
 });
@@ -2544,17 +2552,18 @@ function initHWOwnerFilter() {
 
 // Initialize Part Number Filter
 function initPartNumberFilter() {
-  const checkboxes = document.querySelectorAll('#partNoDropdown + .dropdown-menu input[type="checkbox"]');
+  // Looked up on each use - the DuckDB typeahead replaces the options as the user types
+  const getCheckboxes = () => document.querySelectorAll('#partNoDropdown + .dropdown-menu input[type="checkbox"]');
   const searchInput = document.getElementById('partNoSearch');
   const selectAllBtn = document.getElementById('selectAllPartNos');
   const clearBtn = document.getElementById('clearPartNos');
   const applyBtn = document.getElementById('applyPartNos');
   const dropdownButton = document.getElementById('partNoDropdown');
 
-  if (searchInput) {
+  if (searchInput && !searchInput.dataset.typeahead) {
     searchInput.addEventListener('input', (e) => {
       const searchTerm = e.target.value.toLowerCase();
-      checkboxes.forEach(checkbox => {
+      getCheckboxes().forEach(checkbox => {
         const label = checkbox.parentElement.querySelector('label').textContent.toLowerCase();
         checkbox.parentElement.style.display = label.includes(searchTerm) ? 'block' : 'none';
       });
@@ -2563,19 +2572,19 @@ function initPartNumberFilter() {
 
   if (selectAllBtn) {
     selectAllBtn.addEventListener('click', () => {
-      checkboxes.forEach(cb => { if (cb.parentElement.style.display !== 'none') cb.checked = true; });
+      getCheckboxes().forEach(cb => { if (cb.parentElement.style.display !== 'none') cb.checked = true; });
     });
   }
 
   if (clearBtn) {
     clearBtn.addEventListener('click', () => {
-      checkboxes.forEach(cb => cb.checked = false);
+      getCheckboxes().forEach(cb => cb.checked = false);
     });
   }
 
   if (applyBtn) {
     applyBtn.addEventListener('click', () => {
-      const selectedPartNumbers = Array.from(checkboxes)
+      const selectedPartNumbers = Array.from(getCheckboxes())
         .filter(cb => cb.checked)
         .map(cb => cb.value);
 
@@ -5857,6 +5866,12 @@ function renderEngineProgramChart() {
     return;
   }
 
+  // Chart data delivered with the demand stream
+  if (Array.isArray(window.STREAMED_CDATA)) {
+    processEmbeddedCData(window.STREAMED_CDATA);
+    return;
+  }
+
   // Otherwise, try to fetch from DuckDB API endpoint
   console.log('Fetching cdata from DuckDB API endpoint');
   fetch('/api/demand/chart-data')
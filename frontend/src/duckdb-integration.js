@@ -9,12 +9,55 @@
 // FAST FILTER POPULATION USING DUCKDB
 // ============================================================================
 
+// Filter options prefetched by one /api/batch call: "column" or "column?extract=year" -> values
+const duckdbFilterOptionsCache = new Map();
+
+/**
+ * Run several API sub-requests in one round trip via /api/batch
+ * @param {Array<{id: string, op: string, params?: Object}>} requests
+ * @returns {Promise<Object>} Results keyed by sub-request id
+ */
+async function duckdbBatch(requests) {
+  const response = await fetch('/api/batch', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ requests })
+  });
+  if (!response.ok) {
+    throw new Error(`Batch request failed: ${response.status}`);
+  }
+  const result = await response.json();
+  console.log(`✓ DuckDB batch: ${result.request_count} sub-requests in ${result.execution_time_ms}ms (${result.failed} failed)`);
+  return result.results;
+}
+
+/**
+ * Prefetch filter options for several columns with a single batch request
+ * @param {Array<{column: string, extract?: string}>} columns
+ */
+async function prefetchFilterOptions_DuckDB(columns) {
+  const requests = columns.map(({ column, extract }) => ({
+    id: extract ? `${column}?extract=${extract}` : column,
+    op: 'filter_options',
+    params: extract ? { column, extract } : { column }
+  }));
+  const results = await duckdbBatch(requests);
+  Object.values(results).forEach(item => {
+    if (item.status === 'success') {
+      duckdbFilterOptionsCache.set(item.id, item.data);
+    }
+  });
+}
+
 /**
  * Get filter options from DuckDB (0.5-1ms)
  * @param {string} columnName - Column to get unique values for
  * @returns {Promise<Array>} Array of unique values
  */
 async function getDuckDBFilterOptions(columnName) {
+  if (duckdbFilterOptionsCache.has(columnName)) {
+    return duckdbFilterOptionsCache.get(columnName);
+  }
   try {
     const start = performance.now();
     const response = await fetch(`/api/filter-options/${encodeURIComponent(columnName)}`);
@@ -80,16 +123,19 @@ async function initializeYearFilterOptions_DuckDB() {
 
   try {
     // Get years from DuckDB using SQL to extract year from Target Ship Date
-    const response = await fetch('/api/filter-options/Target%20Ship%20Date?extract=year');
-    
-    if (!response.ok) {
-      console.error('Failed to fetch years:', response.status);
-      return;
+    let years = duckdbFilterOptionsCache.get('Target Ship Date?extract=year');
+    if (!years) {
+      const response = await fetch('/api/filter-options/Target%20Ship%20Date?extract=year');
+      
+      if (!response.ok) {
+        console.error('Failed to fetch years:', response.status);
+        return;
+      }
+      
+      const result = await response.json();
+      years = result.values || [];
     }
     
-    const result = await response.json();
-    const years = result.values || [];
-    
     // Clear existing options
     yearDropdown.innerHTML = '';
 
@@ -249,7 +295,36 @@ async function initializeHWOwnerFilterOptions_DuckDB() {
 }
 
 /**
- * Initialize Part Number filter using DuckDB (0.5-1ms)
+ * Typeahead lookup of part numbers / ESNs via the server-side prefix index
+ * @param {string} prefix - Leading characters typed by the user
+ * @param {Object} [options]
+ * @param {Array<string>} [options.fields] - Columns to search (Part_Number, Level_2_PN, ESN)
+ * @param {number} [options.limit] - Maximum matches
+ * @returns {Promise<Array<{value: string, field: string, rows: number}>>}
+ */
+async function searchParts_DuckDB(prefix, { fields = ['Part_Number'], limit = 50 } = {}) {
+  const params = new URLSearchParams({ prefix, limit: String(limit) });
+  if (fields && fields.length) {
+    params.set('fields', fields.join(','));
+  }
+  try {
+    const response = await fetch(`/api/search/parts?${params.toString()}`);
+    if (!response.ok) {
+      console.error('Part search failed:', response.status);
+      return [];
+    }
+    const result = await response.json();
+    return result.matches || [];
+  } catch (error) {
+    console.error('Error searching parts:', error);
+    return [];
+  }
+}
+
+/**
+ * Initialize Part Number filter using DuckDB typeahead
+ * Only the top matches for the typed prefix are fetched - the full part number
+ * list is never downloaded. Checked values stay listed while searching.
  */
 async function initializePartNumberFilterOptions_DuckDB() {
   const partNumberDropdown = document.querySelector('#partNoDropdown + .dropdown-menu .dropdown-options');
@@ -257,25 +332,49 @@ async function initializePartNumberFilterOptions_DuckDB() {
     console.warn('Part Number dropdown options container not found');
     return;
   }
+  const searchInput = document.getElementById('partNoSearch');
+  const selected = new Set(window.selectedPartNumbers || []);
 
-  // Get part numbers from DuckDB (0.5-1ms)
-  const partNumbers = await getDuckDBFilterOptions('Part Number');
-  
-  // Clear existing options (OPTIMIZATION #3: Remove arbitrary 100 limit)
-  partNumberDropdown.innerHTML = '';
-
-  // Create checkbox options for each part number (show all, not just first 100)
-  partNumbers.forEach(partNumber => {
-    const optionDiv = document.createElement('div');
-    optionDiv.className = 'form-check';
-    optionDiv.innerHTML = `
-      <input class="form-check-input" type="checkbox" value="${partNumber}" id="partNumber_${partNumber}">
-      <label class="form-check-label" for="partNumber_${partNumber}">${partNumber}</label>
-    `;
-    partNumberDropdown.appendChild(optionDiv);
-  });
+  const renderOptions = (matches) => {
+    // Keep checked part numbers visible (and submitted) whatever the current prefix
+    partNumberDropdown.querySelectorAll('input[type="checkbox"]').forEach(cb => {
+      if (cb.checked) selected.add(cb.value); else selected.delete(cb.value);
+    });
+    const values = [...selected, ...matches.map(m => m.value).filter(v => !selected.has(v))];
+
+    partNumberDropdown.innerHTML = '';
+    values.forEach((partNumber, index) => {
+      const optionDiv = document.createElement('div');
+      optionDiv.className = 'form-check';
+      optionDiv.innerHTML = `
+        <input class="form-check-input" type="checkbox" value="${partNumber}" id="partNumber_${index}" ${selected.has(partNumber) ? 'checked' : ''}>
+        <label class="form-check-label" for="partNumber_${index}">${partNumber}</label>
+      `;
+      partNumberDropdown.appendChild(optionDiv);
+    });
+  };
+
+  const initial = await searchParts_DuckDB('');
+  renderOptions(initial);
+
+  if (searchInput && !searchInput.dataset.typeahead) {
+    let debounce = null;
+    let latest = 0;
+    searchInput.addEventListener('input', (e) => {
+      clearTimeout(debounce);
+      const prefix = e.target.value;
+      debounce = setTimeout(async () => {
+        const requestId = ++latest;
+        const matches = await searchParts_DuckDB(prefix);
+        if (requestId === latest) {
+          renderOptions(matches);
+        }
+      }, 150);
+    });
+    searchInput.dataset.typeahead = '1';
+  }
 
-  console.log(`✓ Part Number filter options initialized: ${partNumbers.length} options (no limit)`);
+  console.log(`✓ Part Number typeahead initialized (${initial.length} initial options)`);
 }
 
 // ============================================================================
@@ -338,7 +437,7 @@ async function applyFiltersWithDuckDB() {
     const duration = performance.now() - start;
 
     console.log(`✓ DuckDB Filter Results:`);
-    console.log(`  - Matched ${result.row_count} rows`);
+    console.log(`  - Matched ${result.total} rows (returned ${result.row_count}${result.hasMore ? ', more available' : ''})`);
     console.log(`  - Query time: ${result.execution_time_ms}ms (total with network: ${duration.toFixed(2)}ms)`);
 
     return result.data || [];
@@ -364,7 +463,21 @@ async function initializeDynamicFilters_DuckDB() {
   const startTime = performance.now();
 
   try {
-    // Load all filter options in parallel (much faster!)
+    // One round trip for every dropdown's options; per-column requests remain the fallback
+    try {
+      await prefetchFilterOptions_DuckDB([
+        { column: 'ENGINE PROGRAM' },
+        { column: 'Target Ship Date', extract: 'year' },
+        { column: 'Configuration' },
+        { column: 'Parent Part Supplier' },
+        { column: 'Level 2 Raw Material Supplier' },
+        { column: 'HW OWNER' }
+      ]);
+    } catch (error) {
+      console.warn('Batch prefetch failed, loading filter options individually:', error);
+    }
+
+    // Populate all dropdowns (served from the prefetched options)
     await Promise.all([
       initializeProductLineFilterOptions_DuckDB(),
       initializeYearFilterOptions_DuckDB(),
@@ -0,0 +1,506 @@
+"""
+Gap analysis engine: time-phased demand vs supplier capacity, in DuckDB
+
+Demand comes from the main table, per part, supplier and ship month:
+- Level 1 parts: QPE per engine (Parent_Part_Supplier)
+- Level 2 parts: Level 1 QPE x Level 2 QPE per engine (Level_2_Raw_Material_Supplier)
+
+Capacity (or supplier commits) is uploaded as CSV into the supplier_capacity table:
+    
+    part,supplier,period,capacity
+    P0000-L0,RMS0,2025-05,40
+
+period is a month (YYYY-MM) or any date inside it. supplier may be blank: it is
+then filled in from the demand when the part has a single supplier.
+
+For every (part, supplier) the engine computes, with window functions:
+per-period gap (capacity - demand), cumulative demand / capacity / gap, the
+cumulative shortfall and the first period in shortage. Results are
+materialized in gap_results; a capacity upload only recomputes the
+(part, supplier) keys it touched. Demand is rebuilt when the main table changes.
+Both tables carry the main-table data fingerprint and a capacity fingerprint as
+their comment, so a restart reuses them only if neither has changed.
+
+Only building and updating the tables is serialized; queries run on their own
+cursor without the lock. Updates run in one transaction, so a concurrent query
+sees the results either before or after an upload, never half of it.
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+import pyarrow as pa
+
+CAPACITY_TABLE = "supplier_capacity"
+DEMAND_TABLE = "gap_demand"
+RESULTS_TABLE = "gap_results"
+
+# Accepted CSV header names (case-insensitive) -> capacity column
+CAPACITY_COLUMN_ALIASES = {
+    "pn": ("part", "part_number", "part number", "pn", "level_2_pn"),
+    "supplier": ("supplier", "parent_part_supplier", "level_2_raw_material_supplier", "rm_supplier"),
+    "period": ("period", "month", "date", "ship_month"),
+    "capacity": ("capacity", "commit", "qty", "quantity"),
+}
+
+CAPACITY_MODES = ("merge", "replace")
+
+# Sortable summary columns
+SUMMARY_SORT_COLUMNS = ("pn", "supplier", "level", "total_demand", "total_capacity", "max_shortfall",
+                        "first_shortage", "final_gap")
+
+
+def map_csv_columns(header: List[str], aliases: Dict[str, Sequence[str]], required: Sequence[str],
+                    example: str) -> Dict[str, str]:
+    """Target name -> CSV header name (aliases matched case-insensitively); raises ValueError"""
+    lowered = {name.strip().lower(): name for name in header}
+    mapping = {}
+    for target, names in aliases.items():
+        for alias in names:
+            if alias in lowered:
+                mapping[target] = lowered[alias]
+                break
+    missing = [aliases[name][0] for name in required if name not in mapping]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)} - expected a header like: {example}")
+    return mapping
+
+
+@contextmanager
+def csv_upload_file(csv_bytes: bytes, prefix: str, suffix: str = ".csv"):
+    """Uploaded CSV (or other file) written to a temporary file for read_csv(), removed afterwards"""
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(csv_bytes)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class GapAnalysis:
+    """Gap analysis over a DuckDBService's main table and the uploaded capacity"""
+    
+    def __init__(self, service):
+        self.service = service
+        self._lock = threading.Lock()
+        self._built_version: Optional[int] = None
+        self._demand_table: Optional[str] = None
+        self._results_table: Optional[str] = None
+    
+    # ------------------------------------------------------------------
+    # Tables
+    # ------------------------------------------------------------------
+    
+    def _capacity_exists(self, cur) -> bool:
+        return cur.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = current_database() "
+            "AND schema_name = 'main' AND table_name = ?",
+            [CAPACITY_TABLE]
+        ).fetchone()[0] > 0
+    
+    def _capacity_source(self, cur) -> str:
+        """Capacity rows as a relation (an empty one if nothing was uploaded yet)"""
+        if self._capacity_exists(cur):
+            return CAPACITY_TABLE
+        return "(SELECT NULL::VARCHAR AS pn, NULL::VARCHAR AS supplier, NULL::DATE AS period, NULL::DOUBLE AS capacity WHERE false)"
+    
+    def _stamp(self, cur) -> str:
+        """Fingerprints of the main table and the capacity rows the results are built from"""
+        capacity = "none"
+        if self._capacity_exists(cur):
+            rows, digest = cur.execute(f"""
+                SELECT COUNT(*), COALESCE(bit_xor(hash(pn, supplier, period, capacity)), 0) FROM {CAPACITY_TABLE}
+            """).fetchone()
+            capacity = f"{rows}:{digest:x}"
+        return f"{self.service.data_fingerprint()}|{capacity}"
+    
+    def _stamp_tables(self, cur):
+        stamp = self._stamp(cur)
+        for table in (self._demand_table, self._results_table):
+            self.service._stamp_derived(cur, table, stamp)
+    
+    def _demand_sql(self) -> str:
+        """Time-phased demand per (part, level, supplier, month)"""
+        s = self.service
+        main_table = s._get_main_table()
+        col = s._select_col
+        qpe = 'COALESCE(TRY_CAST("QPE" AS DOUBLE), 1)' if "QPE" in s.column_names else "1.0"
+        l2_qpe = 'COALESCE(TRY_CAST("Level_2_QPE" AS DOUBLE), 1)' if "Level_2_QPE" in s.column_names else "1.0"
+        return f"""
+            WITH rows AS (
+                SELECT
+                    {col(s.esn_col, "esn")},
+                    {col(s.part_col, "pn")},
+                    {qpe} AS qpe,
+                    {col(s.supplier_col, "supplier")},
+                    {col(s.level2_pn_col, "l2_pn")},
+                    {l2_qpe} AS l2_qpe,
+                    {col(s.rm_supplier_col, "l2_supplier")},
+                    date_trunc('month', TRY_CAST("{s.target_date_col}" AS DATE)) AS period
+                FROM {main_table}
+            ),
+            level1 AS (
+                SELECT esn, pn, COALESCE(supplier, '') AS supplier, period, MAX(qpe) AS qty
+                FROM rows
+                WHERE pn IS NOT NULL AND pn != '' AND period IS NOT NULL
+                GROUP BY esn, pn, supplier, period
+            ),
+            level2 AS (
+                SELECT esn, l2_pn AS pn, COALESCE(l2_supplier, '') AS supplier, period,
+                       MAX(qpe) * MAX(l2_qpe) AS qty
+                FROM rows
+                WHERE l2_pn IS NOT NULL AND l2_pn != '' AND period IS NOT NULL
+                GROUP BY esn, pn, l2_pn, l2_supplier, period
+            )
+            SELECT pn, 1 AS level, supplier, CAST(period AS DATE) AS period, SUM(qty) AS demand
+            FROM level1 GROUP BY pn, supplier, period
+            UNION ALL
+            SELECT pn, 2 AS level, supplier, CAST(period AS DATE) AS period, SUM(qty) AS demand
+            FROM level2 GROUP BY pn, supplier, period
+        """
+    
+    def _results_sql(self, capacity_source: str, keys_filter: str = "") -> str:
+        """
+        Per-period gap rows with running totals for every (part, supplier)
+        
+        keys_filter restricts the computation to the keys in the temp view gap_keys.
+        """
+        key_match = ("WHERE EXISTS (SELECT 1 FROM gap_keys k WHERE k.pn = x.pn AND k.supplier = x.supplier)"
+                     if keys_filter else "")
+        return f"""
+            WITH combined AS (
+                SELECT pn, supplier, period, MIN(level) AS level, SUM(demand) AS demand, SUM(capacity) AS capacity
+                FROM (
+                    SELECT pn, level, supplier, period, demand, 0.0 AS capacity FROM {self._demand_table}
+                    UNION ALL
+                    SELECT pn, NULL AS level, COALESCE(supplier, ''), period, 0.0, capacity FROM {capacity_source}
+                ) x
+                {key_match}
+                GROUP BY pn, supplier, period
+            ),
+            running AS (
+                SELECT *,
+                    capacity - demand AS gap,
+                    SUM(demand) OVER w AS cum_demand,
+                    SUM(capacity) OVER w AS cum_capacity,
+                    SUM(capacity - demand) OVER w AS cum_gap,
+                    MAX(level) OVER (PARTITION BY pn, supplier) AS key_level,
+                    SUM(capacity) OVER (PARTITION BY pn, supplier) > 0 AS has_capacity
+                FROM combined
+                WINDOW w AS (PARTITION BY pn, supplier ORDER BY period ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+            )
+            SELECT
+                pn, supplier, COALESCE(level, key_level) AS level, period, demand, capacity, gap,
+                cum_demand, cum_capacity, cum_gap,
+                GREATEST(0, -cum_gap) AS shortfall,
+                MIN(CASE WHEN cum_gap < 0 THEN period END) OVER (PARTITION BY pn, supplier) AS first_shortage,
+                has_capacity
+            FROM running
+        """
+    
+    @staticmethod
+    @contextmanager
+    def _transaction(cur):
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            yield
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        cur.execute("COMMIT")
+    
+    def _ensure_current(self):
+        """
+        Build the tables if they are missing or stale - the lock is taken only then,
+        so queries against current tables never wait for each other
+        """
+        if self._built_version == self.service.data_version and self._results_table:
+            return
+        with self._lock, self.service.cursor() as cur:
+            self._ensure(cur)
+    
+    def _ensure(self, cur):
+        """
+        Build demand and results on first use, and again after the main table changed
+        
+        Tables in the database file stamped with the current fingerprints are reused.
+        """
+        s = self.service
+        if self._built_version == s.data_version and self._results_table:
+            return
+        self._demand_table = s._derived_table(DEMAND_TABLE)
+        self._results_table = s._derived_table(RESULTS_TABLE)
+        if not s.read_only:
+            stamp = self._stamp(cur)
+            if s._derived_stamp(cur, DEMAND_TABLE) == stamp and s._derived_stamp(cur, RESULTS_TABLE) == stamp:
+                self._built_version = s.data_version
+                print(f"     Gap analysis tables already current - reusing {self._results_table}")
+                return
+        cur.execute(f"CREATE OR REPLACE TABLE {self._demand_table} AS {self._demand_sql()}")
+        cur.execute(f"""
+            CREATE OR REPLACE TABLE {self._results_table} AS
+            {self._results_sql(self._capacity_source(cur))}
+            ORDER BY pn, supplier, period
+        """)
+        self._stamp_tables(cur)
+        self._built_version = s.data_version
+        print(f"     ✓ Gap analysis built ({self._results_table})")
+    
+    def _recompute_keys(self, cur, keys) -> int:
+        """Replace the result rows of the given (pn, supplier) keys only"""
+        cur.register("gap_keys", keys)
+        try:
+            cur.execute(f"""
+                DELETE FROM {self._results_table} r
+                WHERE EXISTS (SELECT 1 FROM gap_keys k WHERE k.pn = r.pn AND k.supplier = r.supplier)
+            """)
+            cur.execute(f"""
+                INSERT INTO {self._results_table}
+                {self._results_sql(self._capacity_source(cur), keys_filter="gap_keys")}
+            """)
+        finally:
+            cur.unregister("gap_keys")
+        return keys.num_rows
+    
+    def refresh_parts(self, parts):
+        """
+        Recompute demand and gaps of the given parts only, after a delta ingest
+        changed their rows (nothing to do if the results were never built)
+        """
+        s = self.service
+        with self._lock, s.cursor() as cur:
+            if self._built_version is None or not self._results_table:
+                return
+            cur.register("gap_parts", pa.table({"pn": pa.array(sorted(str(pn) for pn in parts), pa.string())}))
+            try:
+                with self._transaction(cur):
+                    cur.execute(f"DELETE FROM {self._demand_table} WHERE pn IN (SELECT pn FROM gap_parts)")
+                    cur.execute(f"""
+                        INSERT INTO {self._demand_table}
+                        SELECT * FROM ({self._demand_sql()}) WHERE pn IN (SELECT pn FROM gap_parts)
+                    """)
+                    # Old keys too - a part may have moved to another supplier
+                    keys = cur.execute(f"""
+                        SELECT pn, supplier FROM {self._results_table} WHERE pn IN (SELECT pn FROM gap_parts)
+                        UNION
+                        SELECT pn, supplier FROM {self._demand_table} WHERE pn IN (SELECT pn FROM gap_parts)
+                    """).fetch_arrow_table()
+                    self._recompute_keys(cur, keys)
+            finally:
+                cur.unregister("gap_parts")
+            self._stamp_tables(cur)
+            self._built_version = s.data_version
+    
+    # ------------------------------------------------------------------
+    # Capacity upload
+    # ------------------------------------------------------------------
+    
+    def load_capacity_csv(self, csv_bytes: bytes, mode: str = "merge") -> Dict[str, Any]:
+        """
+        Load capacity rows from CSV and update the gap results
+        
+        mode=merge replaces only the uploaded (part, supplier, period) rows and
+        recomputes only the uploaded (part, supplier) keys; mode=replace swaps the
+        whole capacity table and recomputes everything.
+        """
+        s = self.service
+        if s.read_only:
+            raise PermissionError("Capacity uploads need a read-write database - this worker is read-only")
+        if mode not in CAPACITY_MODES:
+            raise ValueError(f"Unknown mode '{mode}' - expected one of: {', '.join(CAPACITY_MODES)}")
+        
+        with csv_upload_file(csv_bytes, "aeo-capacity-") as path, self._lock, s.cursor() as cur:
+            self._ensure(cur)
+            raw = cur.execute("SELECT * FROM read_csv(?, header = true, all_varchar = true)", [path])
+            mapping = map_csv_columns([d[0] for d in raw.description], CAPACITY_COLUMN_ALIASES,
+                                      ("pn", "period", "capacity"), "part,supplier,period,capacity")
+            supplier_sql = f'NULLIF(TRIM("{mapping["supplier"]}"), \'\')' if "supplier" in mapping else "CAST(NULL AS VARCHAR)"
+            staged = cur.execute(f"""
+                SELECT
+                    TRIM("{mapping["pn"]}") AS pn,
+                    {supplier_sql} AS supplier,
+                    CAST(date_trunc('month', COALESCE(
+                        TRY_CAST("{mapping["period"]}" AS DATE),
+                        TRY_STRPTIME("{mapping["period"]}", '%Y-%m')
+                    )) AS DATE) AS period,
+                    TRY_CAST("{mapping["capacity"]}" AS DOUBLE) AS capacity
+                FROM read_csv(?, header = true, all_varchar = true)
+            """, [path]).fetch_arrow_table()
+            
+            cur.register("capacity_upload", staged)
+            try:
+                invalid = cur.execute("""
+                    SELECT COUNT(*) FROM capacity_upload
+                    WHERE pn IS NULL OR pn = '' OR period IS NULL OR capacity IS NULL
+                """).fetchone()[0]
+                if invalid:
+                    raise ValueError(
+                        f"{invalid} capacity row(s) have an empty part, an unreadable period "
+                        f"(use YYYY-MM or a date) or a non-numeric capacity"
+                    )
+                
+                # Blank supplier: take it from the demand when the part has exactly one supplier
+                upload = cur.execute(f"""
+                    SELECT u.pn, COALESCE(u.supplier, d.supplier, '') AS supplier, u.period,
+                           SUM(u.capacity) AS capacity
+                    FROM capacity_upload u
+                    LEFT JOIN (
+                        SELECT pn, ANY_VALUE(supplier) AS supplier
+                        FROM {self._demand_table}
+                        GROUP BY pn
+                        HAVING COUNT(DISTINCT supplier) = 1
+                    ) d ON u.supplier IS NULL AND d.pn = u.pn
+                    GROUP BY ALL
+                """).fetch_arrow_table()
+            finally:
+                cur.unregister("capacity_upload")
+            
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {CAPACITY_TABLE} (
+                    pn VARCHAR, supplier VARCHAR, period DATE, capacity DOUBLE, uploaded_at TIMESTAMP
+                )
+            """)
+            cur.register("capacity_upload", upload)
+            try:
+                cur.execute("BEGIN TRANSACTION")
+                try:
+                    if mode == "replace":
+                        cur.execute(f"DELETE FROM {CAPACITY_TABLE}")
+                    else:
+                        cur.execute(f"""
+                            DELETE FROM {CAPACITY_TABLE} c
+                            WHERE EXISTS (
+                                SELECT 1 FROM capacity_upload u
+                                WHERE u.pn = c.pn AND u.supplier = c.supplier AND u.period = c.period
+                            )
+                        """)
+                    cur.execute(f"""
+                        INSERT INTO {CAPACITY_TABLE}
+                        SELECT pn, supplier, period, capacity, now() FROM capacity_upload
+                    """)
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+                keys = cur.execute("SELECT DISTINCT pn, supplier FROM capacity_upload").fetch_arrow_table()
+            finally:
+                cur.unregister("capacity_upload")
+            
+            if mode == "replace":
+                self._built_version = None
+                self._ensure(cur)
+                recomputed = None
+            else:
+                with self._transaction(cur):
+                    recomputed = self._recompute_keys(cur, keys)
+                self._stamp_tables(cur)
+        
+        return {
+            "mode": mode,
+            "rows_loaded": upload.num_rows,
+            "keys": keys.num_rows,
+            "recomputed_keys": recomputed,
+            "incremental": recomputed is not None,
+        }
+    
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    
+    def _where(self, filters: Dict[str, Any]) -> tuple:
+        clauses, params = [], []
+        for name in ("pn", "supplier"):
+            values = filters.get(name)
+            if values:
+                clauses.append(f"{name} IN ({', '.join(['?'] * len(values))})")
+                params.extend(values)
+        prefix = (filters.get("prefix") or "").strip()
+        if prefix:
+            clauses.append("starts_with(lower(pn), ?)")
+            params.append(prefix.lower())
+        if filters.get("level"):
+            clauses.append("level = ?")
+            params.append(int(filters["level"]))
+        if filters.get("shortage_only"):
+            clauses.append("first_shortage IS NOT NULL")
+        if filters.get("with_capacity"):
+            clauses.append("has_capacity")
+        return (" AND ".join(clauses) if clauses else "1=1"), params
+    
+    def summary(self, filters: Dict[str, Any], skip: int = 0, limit: int = 100,
+                sort: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One row per (part, supplier): totals, worst cumulative shortfall, first
+        shortage period and the closing cumulative gap - paginated and filterable
+        
+        Default order: earliest first shortage, then largest shortfall.
+        """
+        order = self._parse_sort(sort) or "first_shortage ASC NULLS LAST, max_shortfall DESC, pn, supplier"
+        where_sql, params = self._where(filters)
+        s = self.service
+        self._ensure_current()
+        with s.cursor() as cur:
+            table = cur.execute(f"""
+                SELECT *, COUNT(*) OVER () AS __total FROM (
+                    SELECT
+                        pn, supplier, MIN(level) AS level,
+                        SUM(demand) AS total_demand,
+                        SUM(capacity) AS total_capacity,
+                        MAX(shortfall) AS max_shortfall,
+                        MIN(first_shortage) AS first_shortage,
+                        arg_max(cum_gap, period) AS final_gap,
+                        BOOL_OR(has_capacity) AS has_capacity,
+                        COUNT(*) AS periods
+                    FROM {self._results_table}
+                    GROUP BY pn, supplier
+                )
+                WHERE {where_sql}
+                ORDER BY {order}
+                LIMIT ? OFFSET ?
+            """, params + [int(limit), int(skip)]).fetch_arrow_table()
+        total = table.column("__total")[0].as_py() if table.num_rows else 0
+        return {"total": total, "data": table.drop(["__total"]).to_pylist()}
+    
+    def periods(self, filters: Dict[str, Any], skip: int = 0, limit: int = 1000) -> Dict[str, Any]:
+        """Per-period gap rows (with running totals), ordered by part, supplier, period"""
+        where_sql, params = self._where(filters)
+        s = self.service
+        self._ensure_current()
+        with s.cursor() as cur:
+            table = cur.execute(f"""
+                SELECT *, COUNT(*) OVER () AS __total
+                FROM {self._results_table}
+                WHERE {where_sql}
+                ORDER BY pn, supplier, period
+                LIMIT ? OFFSET ?
+            """, params + [int(limit), int(skip)]).fetch_arrow_table()
+        total = table.column("__total")[0].as_py() if table.num_rows else 0
+        return {"total": total, "data": table.drop(["__total"]).to_pylist()}
+    
+    @staticmethod
+    def _parse_sort(sort: Optional[str]) -> str:
+        """
+        "col,-col" over SUMMARY_SORT_COLUMNS -> ORDER BY list ending in the unique
+        (pn, supplier) key, so LIMIT/OFFSET pages never repeat or skip a row;
+        "" for no sort. Raises ValueError.
+        """
+        order = []
+        for item in (sort or "").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            direction = "DESC" if item.startswith("-") else "ASC"
+            name = item.lstrip("-")
+            if name not in SUMMARY_SORT_COLUMNS:
+                raise ValueError(f"Cannot sort by '{name}' - expected one of: {', '.join(SUMMARY_SORT_COLUMNS)}")
+            order.append(f"{name} {direction} NULLS LAST")
+        if not order:
+            return ""
+        return ", ".join(order + [key for key in ("pn", "supplier") if not any(o.startswith(f"{key} ") for o in order)])
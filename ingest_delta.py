@@ -0,0 +1,54 @@
+"""
+Apply an upstream delta file to the DuckDB database
+
+Daily deltas (new ESNs, date changes, ...) are upserted into the main table,
+keyed on (ESN, Part_Number, Level_2_PN), instead of rebuilding the database
+from the workbook. Only the touched ESNs' derived rows are refreshed; indexes
+and views stay in place, so workers start without rebuilding anything:
+    
+    python ingest_delta.py data/delta-2025-06-01.csv
+    python ingest_delta.py --db data/data-aeo.duckdb delta.parquet
+
+Run it while no read-only workers hold the file (DuckDB allows one read-write
+process). A single read-write server can take deltas at POST /api/ingest/delta.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from duckdb_service import DuckDBService
+
+DEFAULT_DUCKDB_PATH = "data/data-aeo.duckdb"
+
+
+def run_ingest(delta_path: str, duckdb_path: str = DEFAULT_DUCKDB_PATH) -> bool:
+    if not Path(duckdb_path).exists():
+        print(f"[ERROR] {duckdb_path} not found - run the full load first")
+        return False
+    if not Path(delta_path).exists():
+        print(f"[ERROR] Delta file {delta_path} not found")
+        return False
+    
+    print(f"[INGEST] Applying {delta_path} to {duckdb_path}...")
+    service = DuckDBService(duckdb_path=duckdb_path, read_only=False)
+    try:
+        relation, params = service.delta_source(delta_path)
+        result = service.apply_delta(relation, params)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return False
+    finally:
+        service.close()
+    
+    print(f"[INGEST] ✓ {result['updated']:,} rows updated, {result['inserted']:,} inserted - "
+          f"programs: {', '.join(result['programs']) or '-'}; configs: {len(result['configs'])}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upsert a delta file into the DuckDB database")
+    parser.add_argument("delta", help="Delta file (CSV or Parquet) with main-table column names")
+    parser.add_argument("--db", default=DEFAULT_DUCKDB_PATH, help="Path to the DuckDB database file")
+    args = parser.parse_args()
+    sys.exit(0 if run_ingest(args.delta, args.db) else 1)
@@ -1,15 +1,34 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from typing import Optional
-import uvicorn
-import json
-from pathlib import Path
-
-from data_service import DataService
-from demand_data_service import DemandDataService
-from duckdb_service import DuckDBService
-from duckdb_routes import router as duckdb_router
+"""
+AEO Data Dashboard - FastAPI entry point
+
+Startup runs as named, timed phases (see startup_timer.py). The timing report is
+served at /api/startup-report and, when AEO_STARTUP_REPORT is set, written to that
+path as JSON once the app is ready.
+
+Multi-worker mode: AEO_WORKERS=N runs prestart.py once, then starts N uvicorn
+workers that attach the database read-only (AEO_READ_ONLY=1).
+"""
+
+import os
+
+from startup_timer import StartupTimer
+
+startup_timer = StartupTimer()
+
+with startup_timer.phase("import_framework"):
+    from fastapi import FastAPI, HTTPException
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import FileResponse, JSONResponse
+    from typing import Optional
+    from pathlib import Path
+
+with startup_timer.phase("import_services"):
+    from data_service import DataService
+    from demand_data_service import DemandDataService
+    from duckdb_service import DuckDBService
+    from duckdb_routes import router as duckdb_router
+    from analysis_routes import router as analysis_router
+    from serialization import FastJSONResponse, PAGINATION_HEADERS
 
 app = FastAPI(title="AEO Data Dashboard", version="1.0.0")
 
@@ -20,31 +39,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=list(PAGINATION_HEADERS),
 )
 
 # Initialize DuckDB service FIRST for ultra-fast filtering and queries
 # Using data-aeo.duckdb as the primary data source with Output table
-print("Initializing DuckDB service with data-aeo.duckdb...")
-duckdb_service = DuckDBService(duckdb_path="data/data-aeo.duckdb")
+DUCKDB_PATH = "data/data-aeo.duckdb"
 
-# Initialize data service - pass duckdb_service to share the DataFrame
-print("Initializing data service...")
-data_service = DataService(duckdb_service=duckdb_service)
-print(f"Data loaded: {data_service.df.shape[0]:,} rows, {data_service.df.shape[1]} columns")
+print("Initializing DuckDB service with data-aeo.duckdb...")
+with startup_timer.phase("duckdb_service"):
+    duckdb_service = DuckDBService(duckdb_path=DUCKDB_PATH, timer=startup_timer)
 
-# Create demand service but don't initialize data here - it will be initialized lazily
-demand_service = DemandDataService()
-demand_service.df = data_service.df  # Share the same DataFrame
+# Initialize data service - shares the DuckDB service DataFrame, materialized on first use
+with startup_timer.phase("data_services"):
+    data_service = DataService(duckdb_service=duckdb_service)
+    
+    # Demand service reads through data_service lazily - nothing is loaded here
+    demand_service = DemandDataService(data_service=data_service)
 
 # Share duckdb_service with routes
-import duckdb_routes
-duckdb_routes.duckdb_service = duckdb_service
-
-# Register DuckDB routes
-app.include_router(duckdb_router)
+with startup_timer.phase("register_routes"):
+    import duckdb_routes
+    import analysis_routes
+    duckdb_routes.duckdb_service = duckdb_service
+    analysis_routes.duckdb_service = duckdb_service
+    
+    # Register DuckDB routes
+    app.include_router(duckdb_router)
+    app.include_router(analysis_router)
 
 print("[OK] DuckDB integration complete\n")
 
+
+@app.on_event("startup")
+async def report_startup_timing():
+    """Close the startup report once the server is ready to accept requests"""
+    startup_timer.finish()
+    startup_timer.print_summary()
+    report_path = os.environ.get("AEO_STARTUP_REPORT")
+    if report_path:
+        startup_timer.write(report_path)
+
+
+@app.get("/api/startup-report")
+async def get_startup_report():
+    """Machine-readable startup phase timing report for this process"""
+    return JSONResponse(content={
+        "status": "success",
+        **startup_timer.report()
+    })
+
+
 # Cache the transformed demand data to avoid recalculating on every request
 _cached_demand_data = None
 _cached_cdata = None
@@ -69,6 +114,16 @@ def get_cached_cdata():
         print(f"✓ Cdata cached in {elapsed:.2f}s: {len(_cached_cdata)} entries")
     return _cached_cdata
 
+def reset_cached_transforms():
+    """Drop the cached transforms (and the shared DataFrame) after the data changed, e.g. a delta ingest"""
+    global _cached_demand_data, _cached_cdata
+    _cached_demand_data = None
+    _cached_cdata = None
+    _cached_chart_data.clear()
+    data_service.df = None
+
+duckdb_service.on_invalidate(reset_cached_transforms)
+
 
 @app.get("/")
 async def read_root():
@@ -141,7 +196,7 @@ async def get_demand_data_legacy(skip: int = 0, limit: int = 50):
     """
     try:
         print(f"[LEGACY] /data/demand-data.json called - redirecting to /api/demand/programs")
-        data = get_cached_demand_data()
+        data = await duckdb_service.run_shared("cached_demand_data", get_cached_demand_data)
         total = len(data)
         
         # Return paginated data
@@ -170,7 +225,7 @@ async def get_cdata_legacy():
     """
     try:
         print(f"[LEGACY] /data/cdata.json called - redirecting to /api/demand/chart-data")
-        data = get_cached_cdata()
+        data = await duckdb_service.run_shared("cached_cdata", get_cached_cdata)
         return JSONResponse(content=data)
     except Exception as e:
         print(f"[ERROR] Error serving legacy cdata: {e}")
@@ -184,17 +239,19 @@ async def get_datatable_all(skip: int = 0, limit: int = 1000):
     try:
         print(f"[DATATABLE] /api/datatable/all endpoint called - skip={skip}, limit={limit}")
         
-        # Get all data from DuckDB - returns list of dicts
-        all_records = duckdb_service.get_all_output_data()
+        # Only the requested page is fetched; the total is a cached COUNT(*)
+        def fetch_page():
+            return (
+                duckdb_service.get_all_output_data(skip, limit),
+                duckdb_service.get_main_table_count(),
+            )
         
-        # Apply pagination
-        total = len(all_records)
-        paginated_records = all_records[skip:skip + limit]
+        paginated_records, total = await duckdb_service.run(fetch_page)
         has_more = (skip + limit) < total
         
         print(f"[DATATABLE] Returning {len(paginated_records)} records from {skip} (total: {total}, hasMore: {has_more})")
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "data": paginated_records,
             "total": total,
             "skip": skip,
@@ -228,8 +285,13 @@ async def get_demand_programs(skip: int = 0, limit: int = 1000):
         start_time = time.time()
         
         # Use true server-side pagination from DuckDB
-        paginated_data = duckdb_service.get_demand_data_paginated(skip, limit)
-        total = duckdb_service.get_demand_data_count()
+        def fetch_page():
+            return (
+                duckdb_service.get_demand_data_paginated(skip, limit),
+                duckdb_service.get_demand_data_count(),
+            )
+        
+        paginated_data, total = await duckdb_service.run_shared(("demand_programs", skip, limit), fetch_page)
         has_more = (skip + limit) < total
         
         elapsed = time.time() - start_time
@@ -338,7 +400,7 @@ async def get_demand_chart_data(chart_type: str = "all"):
         start_time = time.time()
         
         # For now, return the structured cdata which is similar
-        cdata = get_cached_cdata()
+        cdata = await duckdb_service.run_shared("cached_cdata", get_cached_cdata)
         
         elapsed = time.time() - start_time
         print(f"[DEMAND] Returned chart data in {elapsed*1000:.1f}ms")
@@ -357,4 +419,17 @@ async def get_demand_chart_data(chart_type: str = "all"):
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
+    import uvicorn
+    
+    workers = int(os.environ.get("AEO_WORKERS", "1"))
+    if workers > 1:
+        # Release this process's connection, build derived objects once, then let
+        # every worker attach the prepared file read-only
+        from prestart import run_prestart
+        duckdb_service.close()
+        run_prestart(DUCKDB_PATH)
+        os.environ["AEO_READ_ONLY"] = "1"
+        print(f"[OK] Starting {workers} workers in read-only mode")
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False, workers=workers)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
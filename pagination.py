@@ -0,0 +1,74 @@
+"""
+Keyset (cursor) pagination helpers
+
+A page cursor is the sort key of the last row already returned, encoded as an
+opaque URL-safe token. The next page is read with `WHERE (key) > (cursor)` on the
+same ORDER BY, so page 100 costs the same as page 1 - no OFFSET rows to skip.
+
+Cursors are bound to the filter set they were issued for; reusing one with other
+filters is rejected. Totals are counted once per filter set and cached.
+"""
+
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import orjson
+
+
+def filter_fingerprint(filters: Dict[str, Any]) -> str:
+    """Stable short hash of a filter set (None/empty filters are ignored)"""
+    active = {k: v for k, v in filters.items() if v not in (None, "", [])}
+    payload = orjson.dumps(active, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def encode_cursor(key: List[Any], fingerprint: str) -> str:
+    """Sort key of the last returned row -> opaque cursor token"""
+    payload = orjson.dumps({"k": key, "f": fingerprint}, default=str)
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, fingerprint: str, key_length: int) -> List[Any]:
+    """Cursor token -> sort key; raises ValueError if malformed or issued for other filters"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = orjson.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key = payload["k"]
+        issued_for = payload["f"]
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if issued_for != fingerprint:
+        raise ValueError("Pagination cursor does not match the current filters - restart from the first page")
+    if not isinstance(key, list) or len(key) != key_length:
+        raise ValueError("Invalid pagination cursor")
+    return key
+
+
+class TotalCache:
+    """Small thread-safe LRU of row counts per filter set"""
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._totals: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            total = self._totals.get(key)
+            if total is not None:
+                self._totals.move_to_end(key)
+            return total
+    
+    def put(self, key: Hashable, total: int):
+        with self._lock:
+            self._totals[key] = total
+            self._totals.move_to_end(key)
+            while len(self._totals) > self.max_entries:
+                self._totals.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
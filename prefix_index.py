@@ -0,0 +1,87 @@
+"""
+In-memory prefix index for typeahead search (part numbers, ESNs)
+
+Distinct values are kept in one sorted list of case-folded keys. A prefix lookup
+is a binary search for the first key >= prefix followed by a forward scan while
+keys still start with the prefix, so the cost is O(log n + k) for k matches -
+microseconds even for hundreds of thousands of values, and the browser never
+needs the full list.
+
+The index is immutable once built; a rebuild produces a new instance that is
+swapped in with a single reference assignment.
+"""
+
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over (field, value, row count) entries"""
+    
+    def __init__(self, entries: Iterable[Tuple[str, str, int]]):
+        """
+        Args:
+            entries: (field, value, rows) tuples - one per distinct value of a field
+        """
+        merged: Dict[Tuple[str, str], int] = {}
+        for field, value, rows in entries:
+            if value is None:
+                continue
+            value = str(value).strip()
+            if not value:
+                continue
+            merged[(field, value)] = merged.get((field, value), 0) + int(rows or 0)
+        
+        ordered = sorted(merged.items(), key=lambda item: (item[0][1].casefold(), item[0][1], item[0][0]))
+        self._keys: List[str] = [value.casefold() for (_, value), _ in ordered]
+        self._entries: List[Tuple[str, str, int]] = [(field, value, rows) for (field, value), rows in ordered]
+        
+        # One sorted array per field as well, so a field-restricted lookup never
+        # scans past other fields' values
+        self._by_field: Dict[str, Tuple[List[str], List[Tuple[str, str, int]]]] = {}
+        for key, entry in zip(self._keys, self._entries):
+            keys, entries = self._by_field.setdefault(entry[0], ([], []))
+            keys.append(key)
+            entries.append(entry)
+        self.fields: Tuple[str, ...] = tuple(sorted(self._by_field))
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    @staticmethod
+    def _scan(keys: List[str], entries: List[Tuple[str, str, int]], key: str, limit: int) -> List[Tuple[str, str, int]]:
+        """First `limit` entries whose key starts with `key` (binary search + forward scan)"""
+        position = bisect_left(keys, key)
+        end = min(len(keys), position + limit)
+        found = []
+        while position < end and keys[position].startswith(key):
+            found.append(entries[position])
+            position += 1
+        return found
+    
+    def search(self, prefix: str, limit: int = 10, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` entries whose value starts with `prefix` (case-insensitive),
+        in value order
+        
+        Args:
+            prefix: Leading characters typed by the user (empty prefix -> first values)
+            limit: Maximum number of matches
+            fields: Restrict matches to these fields (None = all)
+        """
+        key = prefix.strip().casefold()
+        if fields is None:
+            found = self._scan(self._keys, self._entries, key, limit)
+        else:
+            found = []
+            for field in set(fields):
+                if field in self._by_field:
+                    found.extend(self._scan(*self._by_field[field], key, limit))
+            found.sort(key=lambda entry: (entry[1].casefold(), entry[1], entry[0]))
+            found = found[:limit]
+        return [{"value": value, "field": field, "rows": rows} for field, value, rows in found]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts per field"""
+        return {"entries": len(self._entries),
+                "fields": {field: len(keys) for field, (keys, _) in self._by_field.items()}}
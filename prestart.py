@@ -0,0 +1,48 @@
+"""
+Pre-start step for multi-worker deployments
+
+DuckDB allows a single read-write process per database file, so uvicorn workers
+attach data-aeo.duckdb read-only (AEO_READ_ONLY=1). Everything that writes to the
+file - performance indexes, views, derived tables - is built here, once, before
+the workers start:
+    
+    python prestart.py
+    AEO_READ_ONLY=1 uvicorn main:app --workers 4
+
+`AEO_WORKERS=4 python main.py` runs both steps for you.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from duckdb_service import DuckDBService
+
+DEFAULT_DUCKDB_PATH = "data/data-aeo.duckdb"
+
+
+def run_prestart(duckdb_path: str = DEFAULT_DUCKDB_PATH) -> bool:
+    """Build all derived database objects with a read-write connection, then release it"""
+    if not Path(duckdb_path).exists():
+        print(f"[WARN] {duckdb_path} not found - nothing to prepare (workers will load from Excel)")
+        return False
+    
+    start_time = time.time()
+    print(f"[PRESTART] Preparing {duckdb_path} for read-only workers...")
+    service = DuckDBService(duckdb_path=duckdb_path, read_only=False)
+    try:
+        service.prepare_database()
+    finally:
+        service.close()
+    
+    elapsed = time.time() - start_time
+    print(f"[PRESTART] ✓ Database prepared in {elapsed:.2f}s")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build derived DuckDB objects before starting workers")
+    parser.add_argument("--db", default=DEFAULT_DUCKDB_PATH, help="Path to the DuckDB database file")
+    args = parser.parse_args()
+    sys.exit(0 if run_prestart(args.db) else 1)
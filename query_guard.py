@@ -0,0 +1,97 @@
+"""
+Guard rails for the ad-hoc SQL endpoints (/api/query, /api/output-query)
+
+- Exactly one statement, and it must parse as a SELECT (DuckDB's own parser decides)
+- No table functions or replacement scans that read files, the environment or run
+  nested SQL
+- Per-query timeout and a hard row cap, configurable per deployment
+"""
+
+import os
+import re
+
+import duckdb
+
+
+def _env_number(name: str, default, cast):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"[WARN] Ignoring invalid {name}={value!r}")
+        return default
+
+
+# Seconds before an ad-hoc query is interrupted
+QUERY_TIMEOUT_S: float = _env_number("AEO_QUERY_TIMEOUT_S", 30.0, float)
+
+# Hard cap on rows returned by an ad-hoc query (the request may ask for fewer)
+QUERY_MAX_ROWS: int = _env_number("AEO_QUERY_MAX_ROWS", 100_000, int)
+
+# Rows per batch when streaming results as NDJSON
+STREAM_BATCH_ROWS: int = 5_000
+
+# Table functions with side effects or access outside the loaded tables
+_BLOCKED_FUNCTIONS = re.compile(
+    r"\b(read_\w+|glob|sniff_csv|parquet_\w+|iceberg_\w+|delta_scan|getenv|query|query_table|"
+    r"duckdb_secrets|load_aws_credentials|http_\w+|sqlite_scan|postgres_scan|mysql_scan)\s*\(",
+    re.IGNORECASE,
+)
+
+# Quoted names that look like files/URLs (DuckDB replacement scans: FROM 'x.csv')
+_FILE_REFERENCE = re.compile(
+    r"""(['"])[^'"]*(?:/|\\|\.(?:csv|tsv|txt|parquet|json|jsonl|ndjson|xlsx|db|duckdb|sqlite|gz|zst|arrow)\b)[^'"]*\1""",
+    re.IGNORECASE,
+)
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+# Errors in the submitted SQL itself (syntax, unknown tables/columns) - reported as 400
+SQL_USER_ERRORS = (duckdb.ParserException, duckdb.BinderException, duckdb.CatalogException)
+
+
+def validate_select(sql: str) -> str:
+    """
+    Validate an ad-hoc query before it reaches DuckDB
+    
+    Returns the single statement's SQL without a trailing semicolon; it may still
+    end in a comment, so callers wrapping it must close the wrapper on a new line.
+    Raises ValueError with a user-facing reason.
+    """
+    if not sql or not sql.strip():
+        raise ValueError("Empty query")
+    
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        raise ValueError(f"Invalid SQL: {e}")
+    
+    if len(statements) != 1:
+        raise ValueError("Exactly one statement is allowed per request")
+    
+    statement = statements[0]
+    if statement.type != duckdb.StatementType.SELECT:
+        raise ValueError("Only SELECT queries allowed")
+    
+    stripped = _COMMENTS.sub(" ", sql)
+    blocked = _BLOCKED_FUNCTIONS.search(stripped)
+    if blocked:
+        raise ValueError(f"Function not allowed in ad-hoc queries: {blocked.group(1)}")
+    if _FILE_REFERENCE.search(stripped):
+        raise ValueError("File and URL references are not allowed in ad-hoc queries")
+    
+    # extract_statements keeps a trailing ';' (and any comment after it)
+    query = statement.query
+    tokens = duckdb.tokenize(query)
+    if tokens and tokens[-1][1] == duckdb.token_type.operator and query[tokens[-1][0]] == ";":
+        query = query[:tokens[-1][0]]
+    return query.strip()
+
+
+def effective_max_rows(requested) -> int:
+    """Rows to return: the requested limit, never above QUERY_MAX_ROWS"""
+    if requested is None or requested <= 0:
+        return QUERY_MAX_ROWS
+    return min(int(requested), QUERY_MAX_ROWS)
@@ -0,0 +1,437 @@
+"""
+What-if scenarios: overlays on top of the base Output table
+
+A scenario is a named list of overlays:
+    
+    {"type": "shift", "program": "LM2500", "months": 3}          slip ship dates
+    {"type": "shift", "esn": "ESN00012", "days": -14}
+    {"type": "qpe", "part": "P0001-L0", "qpe": 4}                 Level 1 QPE override
+    {"type": "qpe", "part": "P0001-L0", "level2Part": "P0001-L2",
+     "config": "LM2500-C0", "qpe": 2}                             Level 2 QPE override
+
+program / config / esn scope an overlay (omitted = all). When several overlays
+of a type match a row, the most specific wins (esn > config > program), then
+the one listed last.
+
+Scenarios are kept in a JSON file next to the database (AEO_SCENARIOS_FILE to
+override), so read-only workers can create and evaluate them too. Saves and
+deletes hold an exclusive flock on a sidecar lock file (scenarios.json.lock)
+across re-read, change and write, so concurrent workers never lose each
+other's updates; the file is replaced atomically, so readers need no lock.
+
+Aggregates (supplier demand, RM supplier demand, cdata ESN counts) are
+additive per ESN, so a scenario is evaluated as
+    
+    baseline - aggregate(affected ESNs, base rows) + aggregate(affected ESNs, overlaid rows)
+
+The baseline is computed once per data version; only the ESNs an overlay
+touches are re-aggregated.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, only the in-process lock applies
+    fcntl = None
+
+SCENARIOS_FILE_ENV = "AEO_SCENARIOS_FILE"
+
+OVERLAY_TYPES = ("shift", "qpe")
+SCOPE_FIELDS = ("program", "config", "esn")
+SCENARIO_AGGREGATES = ("supplier", "rm_supplier", "cdata")
+
+# Aggregate -> group key fields in the response
+AGGREGATE_KEYS = {
+    "supplier": ("supplier", "period"),
+    "rm_supplier": ("rmSupplier", "period"),
+    "cdata": ("PL", "Year", "Month"),
+}
+
+PERIOD_LABELS = {
+    "month": "strftime(ship_date, '%Y-%m')",
+    "quarter": "CAST(year(ship_date) AS VARCHAR) || 'Q' || CAST(quarter(ship_date) AS VARCHAR)",
+    "year": "CAST(year(ship_date) AS VARCHAR)",
+}
+
+# Overlay table registered on the cursor while a scenario is evaluated
+OVERLAY_SCHEMA = pa.schema([
+    ("seq", pa.int64()),
+    ("kind", pa.string()),
+    ("program", pa.string()),
+    ("config", pa.string()),
+    ("esn", pa.string()),
+    ("part", pa.string()),
+    ("level2_part", pa.string()),
+    ("months", pa.int64()),
+    ("days", pa.int64()),
+    ("qpe", pa.float64()),
+])
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_overlay(overlay: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize one overlay; raises ValueError"""
+    if not isinstance(overlay, dict):
+        raise ValueError("Each overlay must be an object")
+    kind = overlay.get("type")
+    if kind not in OVERLAY_TYPES:
+        raise ValueError(f"Unknown overlay type '{kind}' - expected one of: {', '.join(OVERLAY_TYPES)}")
+    
+    clean = {"type": kind}
+    for field in SCOPE_FIELDS:
+        clean[field] = _text(overlay.get(field))
+    
+    if kind == "shift":
+        try:
+            clean["months"] = int(overlay.get("months") or 0)
+            clean["days"] = int(overlay.get("days") or 0)
+        except (TypeError, ValueError):
+            raise ValueError("shift overlays need whole numbers for months / days")
+        if not clean["months"] and not clean["days"]:
+            raise ValueError("shift overlays need a non-zero months or days")
+    else:
+        clean["part"] = _text(overlay.get("part"))
+        clean["level2Part"] = _text(overlay.get("level2Part"))
+        if not clean["part"] and not clean["level2Part"]:
+            raise ValueError("qpe overlays need a part (and level2Part for a Level 2 QPE)")
+        try:
+            clean["qpe"] = float(overlay.get("qpe"))
+        except (TypeError, ValueError):
+            raise ValueError("qpe overlays need a numeric qpe")
+        if clean["qpe"] < 0:
+            raise ValueError("qpe must not be negative")
+    return clean
+
+
+class ScenarioManager:
+    """Scenario store plus side-by-side evaluation against a DuckDBService"""
+    
+    def __init__(self, service, path: Optional[str] = None):
+        self.service = service
+        if path is None:
+            path = os.environ.get(SCENARIOS_FILE_ENV)
+        if path is None:
+            base = Path(service.duckdb_path).parent if service.duckdb_path else Path("data")
+            path = str(base / "scenarios.json")
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = threading.Lock()
+        self._scenarios: Dict[str, Dict[str, Any]] = {}
+        self._signature: Optional[tuple] = None
+    
+    # ------------------------------------------------------------------
+    # Store
+    # ------------------------------------------------------------------
+    
+    @contextmanager
+    def _write_lock(self):
+        """In-process lock plus an exclusive flock shared with every other worker"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _load(self, force: bool = False):
+        """
+        Re-read the file if another worker (or process) changed it
+        
+        Writers pass force=True: under the write lock the file is always re-read,
+        since two writes within one mtime tick would look unchanged.
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._scenarios, self._signature = {}, None
+            return
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature and not force:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            self._scenarios = {s["id"]: s for s in json.load(f).get("scenarios", [])}
+        self._signature = signature
+    
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"scenarios": list(self._scenarios.values())}, f, indent=2)
+        os.replace(tmp, self.path)
+        stat = self.path.stat()
+        self._signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._load()
+            return [
+                {key: s[key] for key in ("id", "name", "description", "revision", "updated_at")}
+                | {"overlays": len(s["overlays"])}
+                for s in self._scenarios.values()
+            ]
+    
+    def get(self, scenario_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._load()
+            return self._scenarios.get(scenario_id)
+    
+    def save(self, name: str, overlays: List[Dict[str, Any]], description: str = "",
+             scenario_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Create (scenario_id=None) or replace a scenario; raises ValueError on bad
+        overlays, returns None for an unknown scenario_id
+        """
+        name = _text(name)
+        if not name:
+            raise ValueError("Scenario name is required")
+        clean = [validate_overlay(overlay) for overlay in overlays]
+        with self._write_lock():
+            self._load(force=True)
+            if scenario_id is None:
+                scenario_id = uuid.uuid4().hex[:12]
+                revision = 1
+            elif scenario_id in self._scenarios:
+                revision = self._scenarios[scenario_id]["revision"] + 1
+            else:
+                return None
+            scenario = {
+                "id": scenario_id,
+                "name": name,
+                "description": description or "",
+                "overlays": clean,
+                "revision": revision,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            self._scenarios[scenario_id] = scenario
+            self._save()
+            return scenario
+    
+    def delete(self, scenario_id: str) -> bool:
+        with self._write_lock():
+            self._load(force=True)
+            if self._scenarios.pop(scenario_id, None) is None:
+                return False
+            self._save()
+            return True
+    
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    
+    def _rows_sql(self) -> str:
+        """Base rows reduced to the columns the aggregates need"""
+        s = self.service
+        col = s._select_col
+        qpe = 'COALESCE(TRY_CAST("QPE" AS DOUBLE), 1)' if "QPE" in s.column_names else "1.0"
+        l2_qpe = 'COALESCE(TRY_CAST("Level_2_QPE" AS DOUBLE), 1)' if "Level_2_QPE" in s.column_names else "1.0"
+        return f"""
+            SELECT
+                {col(s.program_col, "program")},
+                {col(s.config_col, "config")},
+                {col(s.esn_col, "esn")},
+                {col(s.part_col, "pn")},
+                {col(s.level2_pn_col, "l2_pn")},
+                {col(s.supplier_col, "supplier")},
+                {col(s.rm_supplier_col, "rm_supplier")},
+                {col(s.target_date_col, "ship_date", "DATE")},
+                {qpe} AS qpe,
+                {l2_qpe} AS l2_qpe
+            FROM {s._get_main_table()}
+        """
+    
+    @staticmethod
+    def _scope_match(alias: str) -> str:
+        return " AND ".join(f"({alias}.{f} IS NULL OR {alias}.{f} = r.{f})" for f in SCOPE_FIELDS)
+    
+    def _overlaid_sql(self) -> str:
+        """Affected ESNs' rows with the scenario's overlays applied (reads scenario_overlays)"""
+        specificity = "(CASE WHEN o.esn IS NOT NULL THEN 3 WHEN o.config IS NOT NULL THEN 2 WHEN o.program IS NOT NULL THEN 1 ELSE 0 END) * 1000000 + o.seq"
+        scope = self._scope_match("o")
+        return f"""
+            SELECT
+                r.program, r.config, r.esn, r.pn, r.l2_pn, r.supplier, r.rm_supplier,
+                COALESCE(
+                    (SELECT arg_max(r.ship_date + to_months(CAST(o.months AS INTEGER)) + to_days(CAST(o.days AS INTEGER)), {specificity})
+                     FROM scenario_overlays o WHERE o.kind = 'shift' AND {scope}),
+                    r.ship_date
+                ) AS ship_date,
+                COALESCE(
+                    (SELECT arg_max(o.qpe, {specificity})
+                     FROM scenario_overlays o
+                     WHERE o.kind = 'qpe' AND o.level2_part IS NULL AND o.part = r.pn AND {scope}),
+                    r.qpe
+                ) AS qpe,
+                COALESCE(
+                    (SELECT arg_max(o.qpe, {specificity})
+                     FROM scenario_overlays o
+                     WHERE o.kind = 'qpe' AND o.level2_part = r.l2_pn
+                     AND (o.part IS NULL OR o.part = r.pn) AND {scope}),
+                    r.l2_qpe
+                ) AS l2_qpe
+            FROM scenario_rows r
+        """
+    
+    def _affected_esns_sql(self) -> str:
+        """ESNs with at least one row matched by an overlay"""
+        scope = self._scope_match("o")
+        return f"""
+            SELECT DISTINCT r.esn
+            FROM base_rows r
+            JOIN scenario_overlays o ON {scope}
+            WHERE o.kind = 'shift'
+               OR (o.kind = 'qpe' AND o.level2_part IS NULL AND o.part = r.pn)
+               OR (o.kind = 'qpe' AND o.level2_part = r.l2_pn AND (o.part IS NULL OR o.part = r.pn))
+        """
+    
+    @staticmethod
+    def _aggregate_sql(aggregate: str, source: str, period: str) -> str:
+        """Aggregate over a rows relation -> (key..., value)"""
+        label = PERIOD_LABELS[period]
+        if aggregate == "supplier":
+            # Level 1 demand: QPE once per engine and part
+            return f"""
+                SELECT supplier, period, SUM(qty) AS value FROM (
+                    SELECT esn, pn, supplier, {label} AS period, MAX(qpe) AS qty
+                    FROM {source}
+                    WHERE pn IS NOT NULL AND pn != '' AND ship_date IS NOT NULL
+                    GROUP BY esn, pn, supplier, period
+                ) GROUP BY supplier, period
+            """
+        if aggregate == "rm_supplier":
+            # Level 2 demand: Level 1 QPE x Level 2 QPE per engine
+            return f"""
+                SELECT rm_supplier, period, SUM(qty) AS value FROM (
+                    SELECT esn, pn, l2_pn, rm_supplier, {label} AS period, MAX(qpe) * MAX(l2_qpe) AS qty
+                    FROM {source}
+                    WHERE l2_pn IS NOT NULL AND l2_pn != '' AND ship_date IS NOT NULL
+                    GROUP BY esn, pn, l2_pn, rm_supplier, period
+                ) GROUP BY rm_supplier, period
+            """
+        # cdata: distinct ESNs per program and ship month (the Engine Program Overview chart)
+        return f"""
+            SELECT program, year(ship_date), month(ship_date), COUNT(DISTINCT esn) AS value
+            FROM {source}
+            WHERE program IS NOT NULL AND program != '' AND ship_date IS NOT NULL AND esn IS NOT NULL
+            GROUP BY ALL
+        """
+    
+    def _aggregate(self, cur, aggregate: str, source: str, period: str) -> Dict[tuple, float]:
+        return {row[:-1]: row[-1] for row in cur.execute(self._aggregate_sql(aggregate, source, period)).fetchall()}
+    
+    def baseline(self, aggregate: str, period: str) -> Dict[tuple, float]:
+        """Baseline aggregate over the whole table, computed once per data version"""
+        s = self.service
+        
+        def compute():
+            with s.cursor() as cur:
+                return self._aggregate(cur, aggregate, f"({self._rows_sql()})", period)
+        
+        return s._cached_derived(("scenario_baseline", aggregate, period), compute)
+    
+    def _overlay_table(self, overlays: List[Dict[str, Any]]) -> pa.Table:
+        rows = [{
+            "seq": seq,
+            "kind": o["type"],
+            "program": o.get("program"),
+            "config": o.get("config"),
+            "esn": o.get("esn"),
+            "part": o.get("part"),
+            "level2_part": o.get("level2Part"),
+            "months": o.get("months", 0),
+            "days": o.get("days", 0),
+            "qpe": o.get("qpe"),
+        } for seq, o in enumerate(overlays)]
+        return pa.Table.from_pylist(rows, schema=OVERLAY_SCHEMA)
+    
+    def _evaluate(self, scenario: Dict[str, Any], period: str) -> Dict[str, Any]:
+        """Changes to every aggregate: {aggregate: {key: (minus, plus)}} plus affected ESN count"""
+        s = self.service
+        with s.cursor() as cur:
+            cur.register("scenario_overlays", self._overlay_table(scenario["overlays"]))
+            try:
+                cur.execute(f"CREATE OR REPLACE TEMP VIEW base_rows AS {self._rows_sql()}")
+                cur.execute(f"""
+                    CREATE OR REPLACE TEMP TABLE scenario_rows AS
+                    SELECT * FROM base_rows WHERE esn IN ({self._affected_esns_sql()})
+                """)
+                affected = cur.execute("SELECT COUNT(DISTINCT esn) FROM scenario_rows").fetchone()[0]
+                cur.execute(f"CREATE OR REPLACE TEMP TABLE scenario_overlaid AS {self._overlaid_sql()}")
+                changes = {
+                    aggregate: (self._aggregate(cur, aggregate, "scenario_rows", period),
+                                self._aggregate(cur, aggregate, "scenario_overlaid", period))
+                    for aggregate in SCENARIO_AGGREGATES
+                }
+            finally:
+                cur.execute("DROP TABLE IF EXISTS scenario_overlaid")
+                cur.execute("DROP TABLE IF EXISTS scenario_rows")
+                cur.execute("DROP VIEW IF EXISTS base_rows")
+                cur.unregister("scenario_overlays")
+        return {"affected_esns": affected, "changes": changes}
+    
+    def compare(self, scenario_id: str, period: str = "quarter", aggregates: Optional[List[str]] = None,
+                changed_only: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Baseline and scenario values side by side for each aggregate
+        
+        Returns None for an unknown scenario; raises ValueError for a bad
+        period or aggregate name.
+        """
+        if period not in PERIOD_LABELS:
+            raise ValueError(f"Unknown period '{period}' - expected one of: {', '.join(PERIOD_LABELS)}")
+        aggregates = aggregates or list(SCENARIO_AGGREGATES)
+        unknown = [name for name in aggregates if name not in SCENARIO_AGGREGATES]
+        if unknown:
+            raise ValueError(f"Unknown aggregate '{unknown[0]}' - expected one of: {', '.join(SCENARIO_AGGREGATES)}")
+        
+        scenario = self.get(scenario_id)
+        if scenario is None:
+            return None
+        
+        s = self.service
+        evaluation = s._cached_derived(
+            ("scenario", json.dumps(scenario["overlays"], sort_keys=True), period),
+            lambda: self._evaluate(scenario, period)
+        )
+        
+        result = {
+            "scenario": {key: scenario[key] for key in ("id", "name", "description", "revision", "overlays")},
+            "period": period,
+            "affected_esns": evaluation["affected_esns"],
+        }
+        for aggregate in aggregates:
+            base = self.baseline(aggregate, period)
+            minus, plus = evaluation["changes"][aggregate]
+            keys = set(minus) | set(plus) if changed_only else set(base) | set(plus)
+            rows = []
+            for key in sorted(keys, key=lambda k: tuple((v is None, "" if v is None else v) for v in k)):
+                baseline = base.get(key, 0)
+                value = baseline - minus.get(key, 0) + plus.get(key, 0)
+                delta = value - baseline
+                if changed_only and not delta:
+                    continue
+                row = dict(zip(AGGREGATE_KEYS[aggregate], key))
+                row.update({"baseline": baseline, "scenario": value, "delta": delta})
+                rows.append(row)
+            result[aggregate] = rows
+        return result
@@ -0,0 +1,51 @@
+"""
+Request coalescing (single-flight) for expensive computations
+
+When many identical requests arrive together (deploys, cache expiry, dashboard
+reloads) only the first one starts the computation; the rest await the same
+in-flight result instead of multiplying load on DuckDB.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight computation"""
+    
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._started = 0
+        self._coalesced = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once per key while it is in flight
+        
+        The computation runs as its own task, so a caller that disconnects does not
+        cancel it for the callers still waiting on the same key.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self._started += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._forget(k, _t))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every waiter has gone away
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict[str, int]:
+        """Counters: computations started, calls that shared one, and keys in flight"""
+        return {
+            "started": self._started,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._inflight),
+        }
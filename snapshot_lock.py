@@ -0,0 +1,63 @@
+"""
+Read/write lock for consistent multi-query reads
+
+Batch requests hold the read side while their sub-queries run concurrently;
+ingests that modify the main table hold the write side. A batch therefore
+never mixes results from before and after an ingest, while any number of
+batches (and ordinary requests) still run in parallel.
+
+Writers are preferred: once a writer is waiting, new readers queue behind it so
+a steady stream of batches cannot starve an ingest.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class SnapshotLock:
+    """asyncio read/write lock (many readers or one writer, writer-preferring)"""
+    
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    @asynccontextmanager
+    async def read(self):
+        """Hold a shared snapshot while the block runs"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+    
+    @asynccontextmanager
+    async def write(self):
+        """Exclusive access for changes to the underlying data"""
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and self._readers == 0)
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+    
+    def stats(self) -> Dict[str, int]:
+        """Current readers, and whether a writer holds or waits for the lock"""
+        return {
+            "readers": self._readers,
+            "writer_active": int(self._writer),
+            "writers_waiting": self._writers_waiting,
+        }
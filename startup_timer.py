@@ -0,0 +1,90 @@
+"""
+Startup phase timing for the AEO dashboard
+Records how long each boot phase takes so cold start can be tracked and reduced
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+
+class StartupTimer:
+    """Collects named, ordered startup phases with wall-clock durations"""
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.phases: List[Dict[str, Any]] = []
+        self.finished_ms: Optional[float] = None
+    
+    @contextmanager
+    def phase(self, name: str, **details):
+        """Time a block of startup work under the given phase name"""
+        start = time.perf_counter()
+        entry = {
+            "name": name,
+            "start_offset_ms": round((start - self._t0) * 1000, 2),
+            "duration_ms": None,
+            "status": "ok",
+        }
+        if details:
+            entry["details"] = details
+        self.phases.append(entry)
+        try:
+            yield entry
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    
+    def record(self, name: str, duration_ms: float, **details):
+        """Record a phase that was timed elsewhere (e.g. inside a service)"""
+        entry = {
+            "name": name,
+            "start_offset_ms": None,
+            "duration_ms": round(duration_ms, 2),
+            "status": "ok",
+        }
+        if details:
+            entry["details"] = details
+        self.phases.append(entry)
+    
+    def finish(self):
+        """Mark startup as complete"""
+        self.finished_ms = round((time.perf_counter() - self._t0) * 1000, 2)
+    
+    def report(self) -> Dict[str, Any]:
+        """Machine-readable startup timing report"""
+        total_ms = self.finished_ms
+        if total_ms is None:
+            total_ms = round((time.perf_counter() - self._t0) * 1000, 2)
+        return {
+            "pid": os.getpid(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="milliseconds"),
+            "total_ms": total_ms,
+            "complete": self.finished_ms is not None,
+            "phases": self.phases,
+        }
+    
+    def print_summary(self):
+        """Print a one-line-per-phase summary to stdout"""
+        report = self.report()
+        print(f"[STARTUP] Ready in {report['total_ms']:.1f}ms")
+        for entry in self.phases:
+            duration = entry["duration_ms"] if entry["duration_ms"] is not None else 0.0
+            print(f"[STARTUP]   {entry['name']:<28} {duration:>9.1f}ms  {entry['status']}")
+    
+    def write(self, path: str):
+        """Write the report as JSON (used when AEO_STARTUP_REPORT is set)"""
+        try:
+            with open(path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+            print(f"[STARTUP] Timing report written to {path}")
+        except Exception as e:
+            print(f"[WARN] Could not write startup report to {path}: {e}")
+
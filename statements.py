@@ -0,0 +1,65 @@
+"""
+Statement registry for the hot hierarchy queries
+
+Each query shape is defined once (after column detection) with `?` placeholders
+and executed with bound parameters, so values are never spliced into SQL: a
+program or part number containing a quote is just a value, and the SQL text of a
+shape never changes between calls.
+
+Every execution is timed (execute + fetch) and counted per statement; stats()
+feeds /api/diagnostics/duckdb.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class StatementRegistry:
+    """Named parameterized statements plus per-statement execution counters"""
+    
+    def __init__(self):
+        self._sql: Dict[str, str] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def define(self, name: str, sql: str):
+        """Register (or redefine, e.g. after the main table changed) a statement"""
+        with self._lock:
+            self._sql[name] = sql
+            self._stats.setdefault(name, {"calls": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0})
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._sql
+    
+    def sql(self, name: str) -> str:
+        return self._sql[name]
+    
+    def fetch_dicts(self, cur, name: str, params: Optional[Sequence[Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a statement on cur with bound params; rows as dicts"""
+        start = time.perf_counter()
+        result = cur.execute(self._sql[name], list(params or []))
+        columns = [desc[0] for desc in result.description]
+        rows = [dict(zip(columns, row)) for row in result.fetchall()]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats["rows"] += len(rows)
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        return rows
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Calls, rows and timings per statement"""
+        with self._lock:
+            return {
+                name: {
+                    "calls": int(s["calls"]),
+                    "rows": int(s["rows"]),
+                    "total_ms": round(s["total_ms"], 2),
+                    "avg_ms": round(s["total_ms"] / s["calls"], 3) if s["calls"] else 0.0,
+                    "max_ms": round(s["max_ms"], 2),
+                }
+                for name, s in self._stats.items()
+            }
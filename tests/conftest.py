@@ -0,0 +1,99 @@
+"""
+Shared fixtures: a small synthetic Output table in a DuckDB file, a service
+attached to it and a TestClient over the API routers
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+
+import duckdb
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+OUTPUT_COLUMNS = (
+    "ENGINE_PROGRAM", "Configuration", "ESN", "Target_Ship_Date", "Part_Number", "Part_Description", "QPE",
+    "Parent_Part_Supplier", "HW_OWNER", "Level_1_Raw_Type", "Level_1_Raw_Material_Supplier", "Level_2_PN",
+    "Level_2_Desc", "Level_2_QPE", "Level_2_Raw_Type", "Level_2_Raw_Material_Supplier", "Engine_Demand_Family",
+)
+
+PROGRAMS = ("LM2500", "LM6000")
+RAW_TYPES = ("Ti", "Ni")
+
+
+def output_rows():
+    """
+    2 programs x 2 configs x 3 ESNs x 3 Level 1 parts x 2 Level 2 parts = 72 rows
+    
+    ESN E{p}{c}{k} ships on the 15th of month 1 + 4*c + k of 2025; part
+    P{p}{c}{n} (QPE n+1, supplier Sup{n}) has Level 2 parts P{p}{c}{n}-L{m}
+    (QPE m+1, RM supplier RMS{m}).
+    """
+    rows = []
+    for p, program in enumerate(PROGRAMS):
+        for c in range(2):
+            config = f"{program}-C{c}"
+            for k in range(3):
+                esn = f"E{p}{c}{k}"
+                ship = date(2025, 1 + 4 * c + k, 15).isoformat()
+                for n in range(3):
+                    pn = f"P{p}{c}{n}"
+                    for m in range(2):
+                        rows.append((
+                            program, config, esn, ship, pn, f"desc {pn}", str(n + 1),
+                            f"Sup{n}", "HWO1", "Forging", "RM1", f"{pn}-L{m}",
+                            f"l2 {m}", str(m + 1), RAW_TYPES[m], f"RMS{m}", program,
+                        ))
+    return rows
+
+
+def write_output_db(path, rows=None):
+    """Create a DuckDB file with an all-VARCHAR Output table like the production file"""
+    conn = duckdb.connect(str(path))
+    conn.execute('CREATE TABLE "Output" (' + ", ".join(f'"{c}" VARCHAR' for c in OUTPUT_COLUMNS) + ")")
+    conn.executemany(f'INSERT INTO "Output" VALUES ({", ".join("?" * len(OUTPUT_COLUMNS))})',
+                     output_rows() if rows is None else rows)
+    conn.close()
+    return path
+
+
+@pytest.fixture(autouse=True)
+def _isolated_env(monkeypatch, tmp_path):
+    """Keep deployment settings from the environment out of the tests"""
+    from duckdb_config import CONFIG_FILE_ENV, RESOURCE_SETTINGS
+    
+    for name in ("AEO_READ_ONLY", CONFIG_FILE_ENV, *(env for env, _ in RESOURCE_SETTINGS.values())):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AEO_SCENARIOS_FILE", str(tmp_path / "scenarios.json"))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return write_output_db(tmp_path / "data-aeo.duckdb")
+
+
+@pytest.fixture
+def service(db_path):
+    from duckdb_service import DuckDBService
+    
+    svc = DuckDBService(duckdb_path=str(db_path), read_only=False)
+    yield svc
+    svc.close()
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    
+    import analysis_routes
+    import duckdb_routes
+    
+    monkeypatch.setattr(duckdb_routes, "duckdb_service", service)
+    monkeypatch.setattr(analysis_routes, "duckdb_service", service)
+    app = FastAPI()
+    app.include_router(duckdb_routes.router)
+    app.include_router(analysis_routes.router)
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,73 @@
+"""Batch endpoint for dashboard bootstrap fan-out (user-039)"""
+
+import asyncio
+
+from snapshot_lock import SnapshotLock
+
+
+def test_batch_results_match_individual_endpoints(client):
+    response = client.post("/api/batch", json={"requests": [
+        {"id": "programs", "op": "filter_options", "params": {"column": "ENGINE_PROGRAM"}},
+        {"id": "years", "op": "filter_options", "params": {"column": "Target_Ship_Date", "extract": "year"}},
+        {"id": "page", "op": "datatable_filter", "params": {"configs": ["LM6000-C0"], "limit": 5}},
+        {"id": "facets", "op": "datatable_facets", "params": {"productLines": ["LM2500"]}},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "success"
+    assert body["failed"] == 0
+    results = body["results"]
+    
+    assert results["programs"]["data"] == client.get("/api/filter-options/ENGINE_PROGRAM").json()["values"]
+    assert results["years"]["data"] == ["2025"]
+    
+    single = client.post("/api/datatable/filter", params={"configs": "LM6000-C0", "limit": 5}).json()
+    assert results["page"]["data"]["data"] == single["data"]
+    assert results["page"]["data"]["total"] == single["total"] == 18
+    assert results["facets"]["data"]["total"] == 36
+
+
+def test_failing_sub_requests_do_not_fail_the_batch(client):
+    body = client.post("/api/batch", json={"requests": [
+        {"id": "ok", "op": "stats"},
+        {"id": "bad-op", "op": "nope"},
+        {"id": "bad-column", "op": "filter_options", "params": {"column": "x"}},
+    ]}).json()
+    assert body["status"] == "partial"
+    assert body["failed"] == 2
+    assert body["results"]["ok"]["status"] == "success"
+    assert body["results"]["bad-op"]["status_code"] == 400
+    assert body["results"]["bad-column"]["status_code"] == 400
+
+
+def test_batch_limits(client):
+    duplicate = [{"id": "a", "op": "stats"}, {"id": "a", "op": "stats"}]
+    assert client.post("/api/batch", json={"requests": duplicate}).status_code == 400
+    too_many = [{"id": str(i), "op": "stats"} for i in range(33)]
+    assert client.post("/api/batch", json={"requests": too_many}).status_code == 400
+
+
+def test_writer_waits_for_readers_and_blocks_new_ones():
+    lock = SnapshotLock()
+    events = []
+    
+    async def reader(name, hold):
+        async with lock.read():
+            events.append(f"{name} start")
+            await asyncio.sleep(hold)
+            events.append(f"{name} end")
+    
+    async def writer():
+        async with lock.write():
+            events.append("write")
+    
+    async def main():
+        first = asyncio.ensure_future(reader("r1", 0.05))
+        await asyncio.sleep(0.01)
+        write = asyncio.ensure_future(writer())
+        await asyncio.sleep(0.01)
+        late = asyncio.ensure_future(reader("r2", 0))
+        await asyncio.gather(first, write, late)
+    
+    asyncio.run(main())
+    assert events == ["r1 start", "r1 end", "write", "r2 start", "r2 end"]
@@ -0,0 +1,47 @@
+"""Arrow IPC / Parquet content negotiation for row-heavy endpoints (user-033)"""
+
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from serialization import ARROW_STREAM_MEDIA_TYPE, PARQUET_MEDIA_TYPE, negotiate_format
+
+
+@pytest.mark.parametrize("accept, requested, expected", [
+    (None, None, "json"),
+    ("application/json", None, "json"),
+    (ARROW_STREAM_MEDIA_TYPE, None, "arrow"),
+    (f"{PARQUET_MEDIA_TYPE};q=0.9, application/json;q=0.5", None, "parquet"),
+    (ARROW_STREAM_MEDIA_TYPE, "json", "json"),
+    ("*/*", "parquet", "parquet"),
+])
+def test_negotiate_format(accept, requested, expected):
+    assert negotiate_format(accept, requested) == expected
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        negotiate_format(None, "xml")
+
+
+def test_datatable_page_as_arrow_matches_json(client):
+    params = {"productLines": "LM2500", "limit": 10}
+    rows = client.post("/api/datatable/filter", params=params).json()["data"]
+    
+    response = client.post("/api/datatable/filter", params=params, headers={"Accept": ARROW_STREAM_MEDIA_TYPE})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(ARROW_STREAM_MEDIA_TYPE)
+    assert response.headers["X-Total-Count"] == "36"
+    assert response.headers["X-Has-More"] == "true"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.to_pylist() == rows
+
+
+def test_filter_as_parquet(client):
+    response = client.get("/api/filter", params={"product_lines": "LM6000", "format": "parquet"})
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 36
+    assert set(table.column("ENGINE_PROGRAM").to_pylist()) == {"LM6000"}
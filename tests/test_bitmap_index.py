@@ -0,0 +1,89 @@
+"""Bitmap index for datatable filter intersection (user-042)"""
+
+import numpy as np
+import pyarrow as pa
+
+from bitmap_index import BitmapIndex
+
+
+FILTER_SETS = [
+    {},
+    {"productLines": ["LM2500"]},
+    {"productLines": ["LM6000"], "configs": ["LM6000-C1"], "suppliers": ["Sup0", "Sup2"]},
+    {"year": "2025", "rmSuppliers": ["RMS1"]},
+    {"partNumbers": ["P000", "P101"], "configs": ["LM2500-C0", "LM6000-C0"]},
+    {"suppliers": ["missing"]},
+]
+
+
+def test_or_within_and_across_columns():
+    table = pa.table({
+        "rid": [0, 1, 2, 3, 4],
+        "color": ["red", "blue", "red", None, "green"],
+        "size": ["S", "S", "L", "L", "S"],
+    })
+    index = BitmapIndex.from_arrow(table, "rid", ["color", "size"], order=np.array([4, 3, 2, 1, 0]))
+    
+    rows = index.resolve({"color": ["red", "green"], "size": ["S"]})
+    assert rows == 0b10001
+    assert BitmapIndex.count(rows) == 2
+    assert index.page_row_ids(rows, 0, 10) == [4, 0]
+    assert index.page_row_ids(rows, 1, 10) == [0]
+    assert index.resolve({"color": ["purple"]}) == 0
+    assert index.resolve({"color": []}) == index.all_rows
+    assert "None" not in index.bitmaps["color"]
+    assert index.facet_counts(index.resolve({"size": ["L"]}), "color") == {"red": 1}
+
+
+def test_bitmap_path_matches_sql(service):
+    assert service.filter_bitmaps is not None
+    fast = [
+        (service.count_datatable(f), service.filter_datatable(f, skip=3, limit=7), service.get_datatable_facets(f))
+        for f in FILTER_SETS
+    ]
+    
+    service.filter_bitmaps = None
+    service._datatable_totals.clear()
+    slow = [
+        (service.count_datatable(f), service.filter_datatable(f, skip=3, limit=7), service.get_datatable_facets(f))
+        for f in FILTER_SETS
+    ]
+    
+    assert fast == slow
+    assert [total for total, _, _ in fast] == [72, 36, 12, 36, 12, 0]
+
+
+def test_facets_endpoint(client):
+    body = client.get("/api/datatable/facets", params={"productLines": "LM6000"}).json()
+    assert body["total"] == 36
+    # A filter's own counts ignore its selection
+    assert body["facets"]["productLines"] == {"LM2500": 36, "LM6000": 36}
+    assert body["facets"]["configs"] == {"LM6000-C0": 18, "LM6000-C1": 18}
+
+
+def test_byte_budget_skips_the_costliest_columns():
+    table = pa.table({
+        "rid": list(range(16)),
+        "few": ["a", "b"] * 8,
+        "many": [str(i) for i in range(16)],
+    })
+    # 16 rows -> 2 bytes per bitmap: few costs 4 bytes, many 32
+    index = BitmapIndex.from_arrow(table, "rid", ["few", "many"], max_bytes=10)
+    assert list(index.bitmaps) == ["few"]
+    assert index.stats()["skipped"] == {"many": 32}
+    
+    assert list(BitmapIndex.from_arrow(table, "rid", ["few", "many"], max_bytes=36).bitmaps) == ["few", "many"]
+
+
+def test_skipped_columns_fall_back_to_sql(service, monkeypatch):
+    import bitmap_index
+    
+    expected = [(service.count_datatable(f), service.get_datatable_facets(f)) for f in FILTER_SETS]
+    
+    # 72 rows -> 9 bytes per bitmap: room for a few low-cardinality columns only
+    monkeypatch.setattr(bitmap_index, "DEFAULT_MAX_BYTES", 4 * 9)
+    service.refresh_filter_bitmaps()
+    assert service.filter_bitmaps.skipped
+    assert service.filter_bitmaps.bitmaps
+    service._datatable_totals.clear()
+    assert [(service.count_datatable(f), service.get_datatable_facets(f)) for f in FILTER_SETS] == expected
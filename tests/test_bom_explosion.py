@@ -0,0 +1,69 @@
+"""Multi-level BOM explosion with QPE roll-up (user-044)"""
+
+import pytest
+
+from conftest import write_output_db
+
+
+def _row(esn, pn, qpe, l2_pn, l2_qpe, l2_raw):
+    return ("PRG", "PRG-C0", esn, "2025-03-01", pn, f"desc {pn}", qpe, "Sup", "HWO1", "Forging", "RM1",
+            l2_pn, f"desc {l2_pn}", l2_qpe, l2_raw, "RMS", "PRG")
+
+
+@pytest.fixture
+def nested_service(tmp_path):
+    from duckdb_service import DuckDBService
+    
+    # A -> B (3 per A), and B is itself a Level 1 part elsewhere: B -> C (4 per B)
+    rows = [
+        _row(esn, pn, qpe, l2, l2_qpe, raw)
+        for esn in ("E1", "E2")
+        for pn, qpe, l2, l2_qpe, raw in (("A", "2", "B", "3", "Ti"), ("B", "1", "C", "4", "Ni"))
+    ]
+    svc = DuckDBService(duckdb_path=str(write_output_db(tmp_path / "nested.duckdb", rows)), read_only=False)
+    yield svc
+    svc.close()
+
+
+def test_qpe_multiplies_down_every_level(nested_service):
+    bom = nested_service.explode_bom(config="PRG-C0")
+    assert bom["engines"] == 2
+    assert [(line["path"], line["level"], line["qty"], line["isLeaf"]) for line in bom["indented"]] == [
+        ("A", 1, 2.0, False),
+        ("A > B", 2, 6.0, False),
+        ("A > B > C", 3, 24.0, True),
+        ("B", 1, 1.0, False),
+        ("B > C", 2, 4.0, True),
+    ]
+    
+    # C is reached through two paths: 2*3*4 + 1*4 per engine
+    assert bom["leaves"] == [{
+        "part": "C", "description": "desc C", "rawType": "Ni", "rmSupplier": "RMS",
+        "qtyPerEngine": 28.0, "paths": 2, "totalQty": 56.0,
+    }]
+    assert bom["rawMaterials"] == [{"rawType": "Ni", "rmSupplier": "RMS", "qtyPerEngine": 28.0, "totalQty": 56.0, "parts": 1}]
+
+
+def test_single_part_explodes_from_quantity_one(nested_service):
+    bom = nested_service.explode_bom(part="B")
+    assert [(line["path"], line["qty"]) for line in bom["indented"]] == [("B", 1.0), ("B > C", 4.0)]
+    assert bom["engines"] == 2
+
+
+def test_explode_endpoint(client):
+    body = client.get("/api/bom/explode", params={"config": "LM2500-C0", "view": "leaves"}).json()
+    assert body["engines"] == 3
+    leaves = {leaf["part"]: leaf for leaf in body["leaves"]}
+    assert len(leaves) == 6
+    # P001 (QPE 2) -> P001-L1 (QPE 2)
+    assert leaves["P001-L1"]["qtyPerEngine"] == 4.0
+    assert leaves["P001-L1"]["totalQty"] == 12.0
+    
+    indented = client.get("/api/bom/explode", params={"config": "LM2500-C0"}).json()
+    assert indented["line_count"] == 9
+    assert indented["data"][0] == {**indented["data"][0], "level": 1, "part": "P000", "qty": 1.0}
+
+
+def test_explode_endpoint_validation(client):
+    assert client.get("/api/bom/explode").status_code == 400
+    assert client.get("/api/bom/explode", params={"config": "LM2500-C0", "view": "tree"}).status_code == 400
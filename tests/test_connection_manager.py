@@ -0,0 +1,68 @@
+"""Per-request cursors and thread-pool execution (user-027)"""
+
+import asyncio
+import time
+
+import duckdb
+import pytest
+
+from connection_manager import ConnectionManager, QueryCancelled, QueryTimeout
+
+
+@pytest.fixture
+def manager():
+    conn = duckdb.connect(":memory:")
+    conn.execute("CREATE TABLE t AS SELECT range AS i FROM range(1000)")
+    manager = ConnectionManager(conn, max_workers=4)
+    yield manager
+    manager.shutdown()
+    conn.close()
+
+
+def test_nested_calls_share_the_job_cursor(manager):
+    def job():
+        with manager.cursor() as outer:
+            with manager.cursor() as inner:
+                return outer is inner, outer is manager.conn
+    
+    same, is_root = manager.call(job)
+    assert same
+    assert not is_root
+
+
+def test_concurrent_jobs_do_not_see_each_other_results(manager):
+    def query(n):
+        with manager.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM t WHERE i < ?", [n])
+            time.sleep(0.01)
+            return cur.fetchone()[0]
+    
+    async def main():
+        return await asyncio.gather(*(manager.run(query, n) for n in range(1, 41)))
+    
+    assert asyncio.run(main()) == list(range(1, 41))
+    assert manager.stats()["completed"] == 40
+    assert manager.stats()["active"] == 0
+
+
+def test_run_guarded_interrupts_on_timeout(manager):
+    def slow():
+        with manager.cursor() as cur:
+            return cur.execute("SELECT SUM(hash(range)) FROM range(100000000000)").fetchone()
+    
+    start = time.perf_counter()
+    with pytest.raises(QueryTimeout):
+        asyncio.run(manager.run_guarded(slow, timeout=0.2))
+    assert time.perf_counter() - start < 10
+
+
+def test_run_guarded_interrupts_when_client_disconnects(manager):
+    def slow():
+        with manager.cursor() as cur:
+            return cur.execute("SELECT SUM(hash(range)) FROM range(100000000000)").fetchone()
+    
+    async def disconnected():
+        return True
+    
+    with pytest.raises(QueryCancelled):
+        asyncio.run(manager.run_guarded(slow, is_disconnected=disconnected))
@@ -0,0 +1,33 @@
+"""/api/datatable/all pagination pushed into DuckDB (user-035)"""
+
+import pytest
+
+from duckdb_service import DuckDBService
+from conftest import OUTPUT_COLUMNS, output_rows
+
+
+def _key(row):
+    return row["ESN"], row["Part_Number"], row["Level_2_PN"]
+
+
+def test_pages_cover_every_row_once_in_table_order(service):
+    pages = [service.get_all_output_data(skip, 10) for skip in range(0, 80, 10)]
+    assert [len(page) for page in pages] == [10] * 7 + [2]
+    rows = [row for page in pages for row in page]
+    expected = [dict(zip(OUTPUT_COLUMNS, values)) for values in output_rows()]
+    assert [_key(row) for row in rows] == [_key(row) for row in expected]
+    assert service.get_all_output_data(70) == rows[70:]
+
+
+@pytest.mark.parametrize("threads", ["1", "4"])
+def test_pages_are_stable_without_insertion_order(db_path, monkeypatch, threads):
+    monkeypatch.setenv("AEO_DUCKDB_PRESERVE_INSERTION_ORDER", "false")
+    monkeypatch.setenv("AEO_DUCKDB_THREADS", threads)
+    service = DuckDBService(duckdb_path=str(db_path), read_only=False)
+    try:
+        first = [_key(row) for skip in range(0, 72, 7) for row in service.get_all_output_data(skip, 7)]
+        again = [_key(row) for skip in range(0, 72, 7) for row in service.get_all_output_data(skip, 7)]
+        assert first == again
+        assert len(set(first)) == 72
+    finally:
+        service.close()
@@ -0,0 +1,94 @@
+"""Server-side sort and free-text search over the precomputed search index (user-038)"""
+
+import duckdb
+import pytest
+
+from duckdb_service import DuckDBService
+
+
+@pytest.fixture
+def open_service(db_path):
+    services = []
+    
+    def open_service():
+        services.append(DuckDBService(duckdb_path=str(db_path), read_only=False))
+        return services[-1]
+    
+    yield open_service
+    for service in services:
+        service.close()
+
+
+def _search(service, q):
+    return service.filter_datatable({"q": q}, limit=100)["data"]
+
+
+def test_search_and_sort(client):
+    body = client.post("/api/datatable/filter", params={"q": "DESC P011", "sort": "-Level_2_PN"}).json()
+    assert body["total"] == 6
+    assert {row["Part_Number"] for row in body["data"]} == {"P011"}
+    assert [row["Level_2_PN"] for row in body["data"]] == ["P011-L1"] * 3 + ["P011-L0"] * 3
+    
+    assert client.post("/api/datatable/filter", params={"q": "rms1"}).json()["total"] == 36
+    assert client.post("/api/datatable/filter", params={"sort": "nope"}).status_code == 400
+
+
+def test_search_index_is_reused_while_data_is_unchanged(open_service, capsys):
+    open_service().close()
+    capsys.readouterr()
+    service = open_service()
+    assert "Search index datatable_search already exists" in capsys.readouterr().out
+    assert service.search_table == service.SEARCH_TABLE
+
+
+def test_search_index_is_rebuilt_after_edits_with_the_same_row_count(db_path, open_service):
+    open_service().close()
+    with duckdb.connect(str(db_path)) as conn:
+        conn.execute("""UPDATE "Output" SET "Part_Description" = 'renamed part' WHERE "Part_Number" = 'P000'""")
+    
+    service = open_service()
+    assert len(_search(service, "renamed")) == 6
+    assert _search(service, "desc p000") == []
+
+
+def test_search_index_is_rebuilt_when_rowids_move(db_path, open_service):
+    open_service().close()
+    with duckdb.connect(str(db_path)) as conn:
+        # Same rows, same count, different rowids (as after a checkpoint that compacted deletes)
+        conn.execute('CREATE OR REPLACE TABLE "Output" AS SELECT * FROM "Output" ORDER BY "ESN" DESC')
+    
+    service = open_service()
+    rows = _search(service, "p101-l1")
+    assert len(rows) == 3
+    assert {row["Level_2_PN"] for row in rows} == {"P101-L1"}
+
+
+def test_where_used_is_rebuilt_after_edits_with_the_same_row_count(db_path, open_service):
+    open_service().close()
+    with duckdb.connect(str(db_path)) as conn:
+        conn.execute("""UPDATE "Output" SET "Level_2_PN" = 'NEW-L2' WHERE "Level_2_PN" = 'P000-L0'""")
+    
+    service = open_service()
+    assert service.get_where_used("P000-L0") is None
+    assert service.get_where_used("NEW-L2")["total_esns"] == 3
+
+
+def test_gap_tables_are_reused_only_while_current(db_path, open_service, capsys):
+    service = open_service()
+    before = service.gap.summary({"pn": ["P000"]})["data"]
+    service.close()
+    capsys.readouterr()
+    
+    service = open_service()
+    assert service.gap.summary({"pn": ["P000"]})["data"] == before
+    assert "Gap analysis tables already current" in capsys.readouterr().out
+    service.close()
+    
+    with duckdb.connect(str(db_path)) as conn:
+        conn.execute("""UPDATE "Output" SET "QPE" = '5' WHERE "Part_Number" = 'P000'""")
+    service = open_service()
+    after = service.gap.summary({"pn": ["P000"]})["data"]
+    assert "Gap analysis built" in capsys.readouterr().out
+    assert after[0]["total_demand"] == 15
+    assert before[0]["total_demand"] == 3
+
@@ -0,0 +1,76 @@
+"""Server-Sent Events stream of the demand dashboard (user-040)"""
+
+import orjson
+
+
+def _events(body: bytes):
+    events = []
+    for message in body.split(b"\n\n"):
+        if not message.strip():
+            continue
+        lines = dict(line.split(b": ", 1) for line in message.split(b"\n"))
+        events.append((lines[b"event"].decode(), orjson.loads(lines[b"data"])))
+    return events
+
+
+def test_stream_matches_paged_endpoints(client):
+    response = client.get("/api/demand/stream", params={"chunk_size": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.content)
+    names = [name for name, _ in events]
+    
+    assert names == ["progress", "chunk", "progress", "chunk", "progress", "aggregates", "progress", "done"]
+    
+    chunks = [data for name, data in events if name == "chunk"]
+    assert [c["skip"] for c in chunks] == [0, 1]
+    streamed = [program for c in chunks for program in c["data"]]
+    paged = client.get("/api/demand/programs", params={"skip": 0, "limit": 50}).json()["data"]
+    assert streamed == paged
+    
+    progress = [data for name, data in events if name == "progress"]
+    assert [p["programs_loaded"] for p in progress] == [0, 1, 2, 2]
+    assert progress[-1]["percent"] == 100.0
+    assert progress[-1]["rows_loaded"] == progress[-1]["rows_total"] == 72
+    
+    aggregates = dict(events)["aggregates"]
+    assert aggregates["cdata"] == client.get("/api/demand/chart-data").json()["data"]
+    
+    done = dict(events)["done"]
+    assert done["programs"] == 2
+    assert done["rows"] == 72
+
+
+def test_stream_rejects_bad_chunk_size(client):
+    assert client.get("/api/demand/stream", params={"chunk_size": 0}).status_code == 422
+
+
+def test_stream_stops_when_a_delta_lands_mid_stream(service, monkeypatch, tmp_path):
+    import asyncio
+    
+    import duckdb_routes
+    
+    monkeypatch.setattr(duckdb_routes, "duckdb_service", service)
+    delta = tmp_path / "delta.csv"
+    delta.write_text("ESN,Part_Number,Level_2_PN,Target_Ship_Date\nE100,P100,P100-L0,2025-12-15\n")
+    
+    class Client:
+        async def is_disconnected(self):
+            return False
+    
+    async def consume():
+        response = await duckdb_routes.stream_demand_data(Client(), chunk_size=1)
+        events = []
+        async for message in response.body_iterator:
+            events.extend(_events(message))
+            if events[-1][0] == "chunk":
+                async with service.snapshot.write():
+                    service.apply_delta(*service.delta_source(str(delta)))
+        return events
+    
+    start_version = service.data_version
+    events = asyncio.run(consume())
+    names = [name for name, _ in events]
+    
+    assert names == ["progress", "chunk", "progress", "error"]
+    assert events[-1][1]["data_version"] == start_version + 1
@@ -0,0 +1,24 @@
+"""Single-engine drill-down /api/esn/{esn} (user-043)"""
+
+
+def test_esn_trace(client):
+    body = client.get("/api/esn/E101").json()
+    assert body["esn"] == "E101"
+    assert body["program"] == "LM6000"
+    assert body["config"] == "LM6000-C0"
+    assert str(body["targetShipDate"]).startswith("2025-02-15")
+    assert body["row_count"] == 6
+    
+    parts = body["level1Parts"]
+    assert [p["pn"] for p in parts] == ["P100", "P101", "P102"]
+    assert [p["qpe"] for p in parts] == [1, 2, 3]
+    assert [p["supplier"] for p in parts] == ["Sup0", "Sup1", "Sup2"]
+    assert parts[0]["hwo"] == ["HWO1"]
+    assert parts[1]["level2Parts"] == [
+        {"pn": "P101-L0", "description": "l2 0", "qpe": 1, "rawType": "Ti", "rmSupplier": "RMS0"},
+        {"pn": "P101-L1", "description": "l2 1", "qpe": 2, "rawType": "Ni", "rmSupplier": "RMS1"},
+    ]
+
+
+def test_unknown_esn_is_404(client):
+    assert client.get("/api/esn/NOPE").status_code == 404
@@ -0,0 +1,50 @@
+"""Streaming export of filtered datatable results (user-034)"""
+
+import csv
+import io
+
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+
+def test_csv_export_streams_filtered_rows(service, client):
+    response = client.get("/api/datatable/export", params={"format": "csv", "configs": "LM2500-C1",
+                                                          "sort": "-ESN"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 18
+    assert {row["Configuration"] for row in rows} == {"LM2500-C1"}
+    esns = [row["ESN"] for row in rows]
+    assert esns == sorted(esns, reverse=True)
+
+
+def test_export_in_small_batches(service):
+    schema, batches = service.open_datatable_export({"productLines": ["LM6000"]}, batch_rows=10)
+    sizes = [batch.num_rows for batch in batches]
+    assert sum(sizes) == 36
+    assert max(sizes) <= 10
+    assert "Part_Number" in schema.names
+
+
+def test_parquet_and_xlsx_exports(client):
+    response = client.get("/api/datatable/export", params={"format": "parquet", "partNumbers": "P000"})
+    assert pq.read_table(io.BytesIO(response.content)).num_rows == 6
+    
+    response = client.get("/api/datatable/export", params={"format": "xlsx", "partNumbers": "P000"})
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.content), read_only=True).active
+    assert len(list(sheet.iter_rows())) == 7
+
+
+def test_unknown_export_format(client):
+    assert client.get("/api/datatable/export", params={"format": "pdf"}).status_code == 400
+
+
+def test_invalid_year_is_rejected(client):
+    for export_format in ("csv", "parquet", "xlsx"):
+        response = client.get("/api/datatable/export", params={"format": export_format, "year": "abc"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid year: abc"
@@ -0,0 +1,63 @@
+"""Paginated, projected /api/filter (user-036)"""
+
+from duckdb_service import DuckDBService
+
+
+def _pages(client, params, page_size):
+    rows, skip = [], 0
+    while True:
+        body = client.get("/api/filter", params={**params, "skip": skip, "limit": page_size}).json()
+        rows += body["data"]
+        if not body["hasMore"]:
+            return body["total"], rows
+        skip += page_size
+
+
+def test_projection_filters_and_bound_values(client):
+    body = client.get("/api/filter", params={
+        "product_lines": ["LM2500", "LM6000"], "suppliers": "Sup1", "years": "2025",
+        "fields": "ESN,Part_Number", "limit": 5,
+    }).json()
+    assert body["total"] == 24
+    assert body["fields"] == ["ESN", "Part_Number"]
+    assert body["row_count"] == 5
+    assert body["hasMore"] is True
+    
+    # Values are bound, never spliced into SQL
+    body = client.get("/api/filter", params={"product_lines": "x') OR 1=1 --"}).json()
+    assert body["total"] == 0
+
+
+def test_unknown_field_or_sort_is_rejected(client):
+    assert client.get("/api/filter", params={"fields": "nope"}).status_code == 400
+    assert client.get("/api/filter", params={"sort": "-nope"}).status_code == 400
+
+
+def test_unsorted_pages_follow_the_default_order(client):
+    total, rows = _pages(client, {"configs": ["LM2500-C0", "LM6000-C1"]}, 7)
+    assert total == len(rows) == 36
+    keys = [(r["ENGINE_PROGRAM"], r["Configuration"], r["ESN"], r["Part_Number"], r["Level_2_PN"]) for r in rows]
+    assert keys == sorted(keys)
+
+
+def test_sorted_pages_break_ties_in_default_order(client):
+    total, rows = _pages(client, {"sort": "-QPE", "fields": "QPE,ESN,Part_Number,Level_2_PN"}, 10)
+    assert total == len(rows) == 72
+    assert [r["QPE"] for r in rows] == sorted((r["QPE"] for r in rows), reverse=True)
+    assert len({(r["ESN"], r["Part_Number"], r["Level_2_PN"]) for r in rows}) == 72
+
+
+def test_pages_are_stable_without_insertion_order(db_path, monkeypatch):
+    monkeypatch.setenv("AEO_DUCKDB_PRESERVE_INSERTION_ORDER", "false")
+    monkeypatch.setenv("AEO_DUCKDB_THREADS", "4")
+    service = DuckDBService(duckdb_path=str(db_path), read_only=False)
+    try:
+        def keys():
+            pages = [service.filter_rows({}, ["ESN", "Level_2_PN"], None, skip, 5)[1] for skip in range(0, 72, 5)]
+            return [(r["ESN"], r["Level_2_PN"]) for page in pages for r in page.to_pylist()]
+        
+        first = keys()
+        assert first == keys()
+        assert len(set(first)) == 72
+    finally:
+        service.close()
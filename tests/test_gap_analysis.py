@@ -0,0 +1,90 @@
+"""Gap analysis: time-phased demand vs uploaded capacity (user-046)"""
+
+import threading
+from datetime import date
+
+import pytest
+
+
+def _summary(service, pn):
+    return {(row["pn"], row["supplier"]): row for row in service.gap.summary({"pn": [pn]})["data"]}
+
+
+def _cum_gaps(service, pn):
+    return [row["cum_gap"] for row in service.gap.periods({"pn": [pn]})["data"]]
+
+
+def test_shortfall_and_first_shortage(service):
+    # P001-L1: QPE 2 x Level 2 QPE 2 on one LM2500-C0 engine per month, Jan-Mar
+    result = service.gap.load_capacity_csv(b"part,supplier,period,capacity\nP001-L1,RMS1,2025-01,3\nP001-L1,RMS1,2025-02-10,6\n")
+    assert result["rows_loaded"] == 2
+    
+    row = _summary(service, "P001-L1")[("P001-L1", "RMS1")]
+    assert (row["level"], row["total_demand"], row["total_capacity"]) == (2, 12.0, 9.0)
+    assert row["max_shortfall"] == 3.0
+    assert row["first_shortage"] == date(2025, 1, 1)
+    assert row["final_gap"] == -3.0
+    assert _cum_gaps(service, "P001-L1") == [-1.0, 1.0, -3.0]
+
+
+def test_merge_recomputes_only_uploaded_keys(service):
+    service.gap.load_capacity_csv(b"part,supplier,period,capacity\nP001-L1,RMS1,2025-01,3\nP000,Sup0,2025-01,5\n")
+    merged = service.gap.load_capacity_csv(b"part,supplier,period,capacity\nP001-L1,RMS1,2025-01,4\nP001-L1,RMS1,2025-03,10\n")
+    assert merged["incremental"] is True
+    assert merged["recomputed_keys"] == 1
+    
+    assert _cum_gaps(service, "P001-L1") == [0.0, -4.0, 2.0]
+    assert _summary(service, "P001-L1")[("P001-L1", "RMS1")]["first_shortage"] == date(2025, 2, 1)
+    # Untouched key keeps its capacity
+    assert _summary(service, "P000")[("P000", "Sup0")]["total_capacity"] == 5.0
+
+
+def test_replace_drops_previous_capacity(service):
+    service.gap.load_capacity_csv(b"part,supplier,period,capacity\nP001-L1,RMS1,2025-01,30\n")
+    replaced = service.gap.load_capacity_csv(b"part,supplier,period,capacity\nP000,,2025-01,5\n", mode="replace")
+    assert replaced["incremental"] is False
+    
+    l2 = _summary(service, "P001-L1")[("P001-L1", "RMS1")]
+    assert l2["has_capacity"] is False
+    assert l2["first_shortage"] == date(2025, 1, 1)
+    # Blank supplier is taken from the demand
+    p000 = _summary(service, "P000")[("P000", "Sup0")]
+    assert p000["total_capacity"] == 5.0
+    assert p000["first_shortage"] is None
+    assert _cum_gaps(service, "P000") == [4.0, 3.0, 2.0]
+
+
+def test_readers_do_not_wait_for_the_build_lock(service):
+    service.gap.summary({})
+    # Once the tables are current, queries never take the lock
+    with service.gap._lock:
+        finished = threading.Event()
+        thread = threading.Thread(target=lambda: (service.gap.summary({"shortage_only": True}), finished.set()))
+        thread.start()
+        assert finished.wait(5)
+        thread.join()
+
+
+def test_capacity_upload_endpoint(client):
+    csv = b"part,supplier,period,capacity\nP001-L1,RMS1,2025-01,3\n"
+    assert client.post("/api/gap/capacity", files={"file": ("cap.csv", csv, "text/csv")}).status_code == 200
+    body = client.get("/api/gap/summary", params={"with_capacity": True}).json()
+    assert [(row["pn"], row["first_shortage"]) for row in body["data"]] == [("P001-L1", "2025-01-01")]
+    
+    bad = b"part,period,capacity\nP001-L1,someday,3\n"
+    assert client.post("/api/gap/capacity", files={"file": ("cap.csv", bad, "text/csv")}).status_code == 400
+    assert client.get("/api/gap/summary", params={"sort": "nope"}).status_code == 400
+
+
+@pytest.mark.parametrize("sort", ["level", "-total_capacity", "supplier,-level"])
+def test_sorted_pages_neither_repeat_nor_skip(service, sort):
+    everything = service.gap.summary({}, limit=1000, sort=sort)
+    keys = [(row["pn"], row["supplier"]) for row in everything["data"]]
+    paged = [(row["pn"], row["supplier"])
+             for skip in range(0, everything["total"], 7)
+             for row in service.gap.summary({}, skip=skip, limit=7, sort=sort)["data"]]
+    assert paged == keys
+    assert len(set(keys)) == everything["total"]
+    if sort == "level":
+        # Ties within a level are broken by (pn, supplier)
+        assert everything["data"] == sorted(everything["data"], key=lambda r: (r["level"], r["pn"], r["supplier"]))
@@ -0,0 +1,136 @@
+"""Delta ingest: upsert counts, cache invalidation and the data fingerprint (user-049)"""
+
+import csv
+import importlib
+import io
+import sys
+
+import orjson
+import pytest
+
+from conftest import OUTPUT_COLUMNS, output_rows, write_output_db
+
+
+def _delta_csv(rows, columns=OUTPUT_COLUMNS) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    writer.writerows(rows)
+    return out.getvalue().encode()
+
+
+def _new_esn_rows():
+    """A fourth LM2500-C0 engine, E003, shipping in December"""
+    return [("E003" if value == "E000" else "2025-12-15" if value == "2025-01-15" else value for value in row)
+            for row in output_rows() if row[2] == "E000"]
+
+
+def _apply(service, tmp_path, content: bytes):
+    path = tmp_path / "delta.csv"
+    path.write_bytes(content)
+    relation, params = service.delta_source(str(path))
+    return service.apply_delta(relation, params)
+
+
+def test_upsert_counts(service, tmp_path):
+    moved = [("E001", "P001", "P001-L0", "2025-09-15"), ("E001", "P001", "P001-L1", "2025-09-15")]
+    result = _apply(service, tmp_path, _delta_csv(moved, ("ESN", "Part_Number", "Level_2_PN", "Target_Ship_Date")))
+    assert (result["updated"], result["inserted"]) == (2, 0)
+    assert result["configs"] == ["LM2500-C0"]
+    
+    result = _apply(service, tmp_path, _delta_csv(_new_esn_rows()))
+    assert (result["updated"], result["inserted"]) == (0, 6)
+    assert result["esns"] == 1
+    assert service.get_main_table_count() == 78
+    
+    # A key listed twice counts once, the last row wins
+    twice = [("E003", "P000", "P000-L0", "2"), ("E003", "P000", "P000-L0", "7")]
+    result = _apply(service, tmp_path, _delta_csv(twice, ("ESN", "Part_Number", "Level_2_PN", "QPE")))
+    assert (result["updated"], result["inserted"]) == (1, 0)
+    assert service.get_esn_trace("E003")["level1Parts"][0]["qpe"] == 7
+
+
+def test_delta_invalidates_caches(service, tmp_path):
+    untouched = service.explode_bom(config="LM6000-C0")
+    before = service.get_cdata_cached()
+    version = service.data_version
+    calls = []
+    service.on_invalidate(lambda: calls.append(service.data_version))
+    
+    _apply(service, tmp_path, _delta_csv(_new_esn_rows()))
+    
+    assert service.data_version == version + 1
+    assert calls == [version + 1]
+    assert service.get_cdata_cached() != before
+    assert service.filter_datatable({"q": "e003"}, limit=1)["total"] == 6
+    # Results scoped to untouched configs are kept
+    assert service.explode_bom(config="LM6000-C0") is untouched
+    assert service.filter_datatable({"configs": ["LM2500-C0"]}, limit=1)["total"] == 24
+
+
+def test_read_only_worker_rejects_ingest(db_path, tmp_path):
+    from duckdb_service import DuckDBService
+    
+    reader = DuckDBService(duckdb_path=str(db_path), read_only=True)
+    try:
+        with pytest.raises(PermissionError):
+            _apply(reader, tmp_path, _delta_csv(_new_esn_rows()))
+    finally:
+        reader.close()
+
+
+@pytest.fixture
+def legacy_app(tmp_path, monkeypatch):
+    """main.py imported fresh against data/data-aeo.duckdb in a temporary working directory"""
+    from fastapi.testclient import TestClient
+    
+    (tmp_path / "data").mkdir()
+    write_output_db(tmp_path / "data" / "data-aeo.duckdb")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "main", raising=False)
+    main = importlib.import_module("main")
+    try:
+        yield main, TestClient(main.app)
+    finally:
+        main.duckdb_service.close()
+        sys.modules.pop("main", None)
+
+
+def test_legacy_endpoints_serve_ingested_data(legacy_app):
+    main, client = legacy_app
+    
+    demand = client.get("/data/demand-data.json").json()
+    cdata = client.get("/data/cdata.json").json()
+    assert b"E003" not in orjson.dumps(demand)
+    assert main._cached_demand_data is not None
+    
+    response = client.post("/api/ingest/delta", files={"file": ("delta.csv", _delta_csv(_new_esn_rows()), "text/csv")})
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 6
+    
+    assert main._cached_demand_data is None
+    assert main._cached_cdata is None
+    assert b"E003" in orjson.dumps(client.get("/data/demand-data.json").json())
+    assert client.get("/data/cdata.json").json() != cdata
+
+
+def test_delta_updates_the_fingerprint_in_place(service, tmp_path, monkeypatch):
+    service.data_fingerprint()
+    scans = []
+    cached = service._cached_derived
+    
+    def counting(key, compute):
+        return cached(key, lambda: scans.append(key) or compute())
+    
+    monkeypatch.setattr(service, "_cached_derived", counting)
+    
+    moved = [("E001", "P001", "P001-L0", "2025-09-15"), ("E002", "P002", "P002-L1", "5")]
+    _apply(service, tmp_path, _delta_csv(moved[:1], ("ESN", "Part_Number", "Level_2_PN", "Target_Ship_Date")))
+    assert _apply(service, tmp_path, _delta_csv(moved[1:], ("ESN", "Part_Number", "Level_2_PN", "QPE")))["updated"] == 1
+    _apply(service, tmp_path, _delta_csv(_new_esn_rows()))
+    assert "data_fingerprint" not in scans
+    
+    incremental = service.data_fingerprint()
+    service.invalidate_caches()
+    assert service.data_fingerprint() == incremental
+    assert incremental.startswith(f"{service.get_main_table_count()}:")
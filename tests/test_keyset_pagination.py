@@ -0,0 +1,75 @@
+"""Keyset cursor pagination for the datatable (user-037)"""
+
+import base64
+
+import orjson
+import pytest
+
+from pagination import decode_cursor, encode_cursor, filter_fingerprint
+
+
+def _cursor_pages(client, params, page_size):
+    rows, cursor = [], ""
+    while cursor is not None:
+        body = client.post("/api/datatable/filter", params={**params, "limit": page_size, "cursor": cursor}).json()
+        rows += body["data"]
+        cursor = body["next"]
+    return rows
+
+
+def _offset_pages(client, params, page_size):
+    rows = []
+    for skip in range(0, 72, page_size):
+        rows += client.post("/api/datatable/filter", params={**params, "limit": page_size, "skip": skip}).json()["data"]
+    return rows
+
+
+def test_cursor_round_trip():
+    fingerprint = filter_fingerprint({"configs": ["LM2500-C0"], "q": None})
+    key = ["LM2500", "E000", 17]
+    assert decode_cursor(encode_cursor(key, fingerprint), fingerprint, 3) == key
+
+
+def test_fingerprint_ignores_empty_filters():
+    assert filter_fingerprint({"configs": ["A"], "q": "", "year": None}) == filter_fingerprint({"configs": ["A"]})
+    assert filter_fingerprint({"configs": ["A"]}) != filter_fingerprint({"configs": ["B"]})
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda token, fp: token[:-4],
+    lambda token, fp: "not-a-cursor",
+    lambda token, fp: base64.urlsafe_b64encode(orjson.dumps({"k": ["x"], "f": fp})).decode().rstrip("="),
+    lambda token, fp: base64.urlsafe_b64encode(orjson.dumps({"k": "abc", "f": fp})).decode().rstrip("="),
+    lambda token, fp: base64.urlsafe_b64encode(orjson.dumps(["LM2500", "E000", 17])).decode().rstrip("="),
+])
+def test_tampered_cursors_are_rejected(tamper):
+    fingerprint = filter_fingerprint({"configs": ["LM2500-C0"]})
+    token = encode_cursor(["LM2500", "E000", 17], fingerprint)
+    with pytest.raises(ValueError, match="Invalid pagination cursor"):
+        decode_cursor(tamper(token, fingerprint), fingerprint, 3)
+
+
+def test_cursor_from_other_filters_is_rejected(client):
+    first = client.post("/api/datatable/filter", params={"configs": "LM2500-C0", "limit": 5, "cursor": ""}).json()
+    for params in ({"configs": "LM2500-C1"}, {"configs": "LM2500-C0", "sort": "-ESN"}):
+        response = client.post("/api/datatable/filter", params={**params, "limit": 5, "cursor": first["next"]})
+        assert response.status_code == 400
+        assert "does not match" in response.json()["detail"]
+    
+    response = client.post("/api/datatable/filter", params={"configs": "LM2500-C0", "cursor": "garbage"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"productLines": "LM6000"},
+    {"sort": "-ESN,Level_2_PN"},
+    {"sort": "QPE", "suppliers": ["Sup0", "Sup2"]},
+    {"q": "p01"},
+])
+def test_cursor_pages_match_offset_pages(client, params):
+    cursor_rows = _cursor_pages(client, params, 7)
+    offset_rows = _offset_pages(client, params, 7)
+    assert cursor_rows == offset_rows
+    assert len(cursor_rows) == client.post("/api/datatable/filter", params={**params, "limit": 1}).json()["total"]
+    assert len({(r["ESN"], r["Level_2_PN"]) for r in cursor_rows}) == len(cursor_rows)
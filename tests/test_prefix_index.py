@@ -0,0 +1,43 @@
+"""Prefix index and /api/search/parts typeahead (user-041)"""
+
+from prefix_index import PrefixIndex
+
+
+def test_prefix_lookup_is_case_insensitive_and_ordered():
+    index = PrefixIndex([
+        ("Part_Number", "ab-2", 1),
+        ("Part_Number", "AB-1", 2),
+        ("ESN", "AB-1", 4),
+        ("Part_Number", "AC-1", 8),
+        ("Part_Number", " ", 1),
+        ("Part_Number", None, 1),
+    ])
+    assert len(index) == 4
+    assert [(m["value"], m["field"]) for m in index.search("ab")] == [
+        ("AB-1", "ESN"), ("AB-1", "Part_Number"), ("ab-2", "Part_Number"),
+    ]
+    assert index.search("ab", limit=1) == [{"value": "AB-1", "field": "ESN", "rows": 4}]
+    assert [m["value"] for m in index.search("ab", fields=["Part_Number"])] == ["AB-1", "ab-2"]
+    assert index.search("zz") == []
+    assert index.stats()["fields"] == {"ESN": 1, "Part_Number": 3}
+
+
+def test_duplicate_values_sum_their_rows():
+    index = PrefixIndex([("ESN", "E1", 2), ("ESN", "E1 ", 3)])
+    assert index.search("e") == [{"value": "E1", "field": "ESN", "rows": 5}]
+
+
+def test_search_parts_endpoint(client):
+    body = client.get("/api/search/parts", params={"prefix": "p00", "fields": "Part_Number"}).json()
+    assert [m["value"] for m in body["matches"]] == ["P000", "P001", "P002"]
+    assert all(m["rows"] == 6 for m in body["matches"])
+    
+    l2 = client.get("/api/search/parts", params={"prefix": "P000-", "fields": "Level_2_PN"}).json()
+    assert [(m["value"], m["rows"]) for m in l2["matches"]] == [("P000-L0", 3), ("P000-L1", 3)]
+    
+    esn = client.get("/api/search/parts", params={"prefix": "e1", "limit": 2}).json()
+    assert [(m["value"], m["field"]) for m in esn["matches"]] == [("E100", "ESN"), ("E101", "ESN")]
+
+
+def test_search_parts_rejects_unknown_field(client):
+    assert client.get("/api/search/parts", params={"prefix": "P", "fields": "Module"}).status_code == 400
@@ -0,0 +1,86 @@
+"""Ad-hoc SQL guard rails: validation, row caps, timeouts (user-030)"""
+
+import json
+
+import pytest
+
+import duckdb_routes
+import query_guard
+from query_guard import effective_max_rows, validate_select
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("", "Empty query"),
+    ("DELETE FROM Output", "Only SELECT"),
+    ("SELECT 1; SELECT 2", "Exactly one statement"),
+    ("SELECT * FROM read_csv('x.csv')", "Function not allowed"),
+    ("SELECT getenv('HOME')", "Function not allowed"),
+    ("SELECT * FROM '/etc/passwd'", "File and URL references"),
+    ("SELECT * FROM 'data.parquet'", "File and URL references"),
+    ("SELEC 1", "Invalid SQL"),
+])
+def test_rejected_queries(sql, reason):
+    with pytest.raises(ValueError, match=reason):
+        validate_select(sql)
+
+
+def test_blocked_names_inside_comments_are_ignored():
+    assert validate_select("SELECT 1 -- read_csv('x.csv')") == "SELECT 1 -- read_csv('x.csv')"
+
+
+def test_trailing_semicolon_is_dropped():
+    assert validate_select("SELECT 1;") == "SELECT 1"
+    assert validate_select("SELECT 1; -- done") == "SELECT 1"
+    assert validate_select("SELECT ';' AS s") == "SELECT ';' AS s"
+
+
+def test_effective_max_rows(monkeypatch):
+    monkeypatch.setattr(query_guard, "QUERY_MAX_ROWS", 100)
+    assert effective_max_rows(None) == 100
+    assert effective_max_rows(0) == 100
+    assert effective_max_rows(10) == 10
+    assert effective_max_rows(1000) == 100
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1 AS x -- note",
+    "SELECT 1 AS x /* note */",
+    "SELECT 1 AS x; -- note",
+    "-- leading\nSELECT 1 AS x",
+])
+def test_query_with_comments(client, sql):
+    response = client.get("/api/query", params={"sql": sql})
+    assert response.status_code == 200, response.text
+    assert response.json()["data"] == [{"x": 1}]
+
+
+def test_streamed_query_with_trailing_comment(client):
+    response = client.get("/api/query", params={"sql": "SELECT range AS x FROM range(3) -- note", "stream": "true"})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"columns": ["x"]}
+    assert [line["x"] for line in lines[1:-1]] == [0, 1, 2]
+    assert lines[-1] == {"status": "success", "row_count": 3, "truncated": False}
+
+
+@pytest.mark.parametrize("stream", ["false", "true"])
+@pytest.mark.parametrize("sql", ["SELECT 1 +", "SELECT * FROM no_such_table", "SELECT no_such_column FROM Output"])
+def test_sql_errors_are_client_errors(client, sql, stream):
+    response = client.get("/api/query", params={"sql": sql, "stream": stream})
+    assert response.status_code == 400
+
+
+def test_row_cap_truncates(client):
+    response = client.get("/api/query", params={"sql": 'SELECT * FROM "Output"', "max_rows": 5})
+    body = response.json()
+    assert body["row_count"] == 5
+    assert body["truncated"] is True
+    
+    response = client.get("/api/query", params={"sql": 'SELECT * FROM "Output"', "max_rows": 72})
+    assert response.json()["truncated"] is False
+
+
+def test_timeout_interrupts_query(client, monkeypatch):
+    monkeypatch.setattr(duckdb_routes, "QUERY_TIMEOUT_S", 0.2)
+    response = client.get("/api/query", params={"sql": "SELECT SUM(hash(range)) FROM range(100000000000)"})
+    assert response.status_code == 504
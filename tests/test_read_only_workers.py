@@ -0,0 +1,42 @@
+"""Multi-worker mode: prestart once, then read-only workers share the file (user-028)"""
+
+import duckdb
+import pytest
+
+from duckdb_service import DuckDBService
+from prestart import run_prestart
+
+
+def test_prestart_builds_derived_objects_for_read_only_workers(db_path, monkeypatch):
+    assert run_prestart(str(db_path))
+    monkeypatch.setenv("AEO_READ_ONLY", "1")
+    
+    workers = [DuckDBService(duckdb_path=str(db_path)) for _ in range(2)]
+    try:
+        for worker in workers:
+            assert worker.read_only
+            # Derived tables come from the file, not a private scratch copy
+            assert worker.search_table == worker.SEARCH_TABLE
+            assert worker.where_used_table == worker.WHERE_USED_TABLE
+            assert worker.get_main_table_count() == 72
+    finally:
+        for worker in workers:
+            worker.close()
+
+
+def test_read_only_worker_cannot_write(db_path, monkeypatch):
+    monkeypatch.setenv("AEO_READ_ONLY", "1")
+    worker = DuckDBService(duckdb_path=str(db_path))
+    try:
+        with worker.cursor() as cur:
+            with pytest.raises(duckdb.Error):
+                cur.execute('DELETE FROM "Output"')
+        
+        # Without prestart the worker keeps working from a scratch copy
+        assert worker.search_table == f"scratch.{worker.SEARCH_TABLE}"
+    finally:
+        worker.close()
+
+
+def test_prestart_without_database_file(tmp_path):
+    assert not run_prestart(str(tmp_path / "missing.duckdb"))
@@ -0,0 +1,49 @@
+"""DuckDB resource profile from a config file and environment (user-031)"""
+
+import json
+
+from duckdb_config import CONFIG_FILE_ENV, load_resource_profile
+
+
+def test_environment_overrides_config_file(tmp_path, monkeypatch):
+    config_file = tmp_path / "duckdb.json"
+    config_file.write_text(json.dumps({"threads": 4, "memory_limit": "1GB", "unknown": 1}))
+    spill = tmp_path / "spill"
+    monkeypatch.setenv(CONFIG_FILE_ENV, str(config_file))
+    monkeypatch.setenv("AEO_DUCKDB_THREADS", "2")
+    monkeypatch.setenv("AEO_DUCKDB_TEMP_DIRECTORY", str(spill))
+    monkeypatch.setenv("AEO_DUCKDB_PRESERVE_INSERTION_ORDER", "false")
+    
+    config, sources = load_resource_profile()
+    assert config == {"threads": 2, "memory_limit": "1GB", "temp_directory": str(spill),
+                      "preserve_insertion_order": False}
+    assert sources == {"threads": "env", "memory_limit": "file", "temp_directory": "env",
+                       "preserve_insertion_order": "env"}
+    assert spill.is_dir()
+
+
+def test_invalid_values_are_ignored(monkeypatch):
+    monkeypatch.setenv("AEO_DUCKDB_THREADS", "many")
+    assert load_resource_profile() == ({}, {})
+
+
+def test_diagnostics_report_effective_settings(client):
+    response = client.get("/api/diagnostics/duckdb")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["read_only"] is False
+    assert set(body["effective"]) >= {"threads", "memory_limit", "preserve_insertion_order"}
+
+
+def test_profile_applies_to_service_connections(db_path, monkeypatch):
+    from duckdb_service import DuckDBService
+    
+    monkeypatch.setenv("AEO_DUCKDB_THREADS", "2")
+    monkeypatch.setenv("AEO_DUCKDB_PRESERVE_INSERTION_ORDER", "false")
+    service = DuckDBService(duckdb_path=str(db_path), read_only=False)
+    try:
+        effective = service.get_resource_diagnostics()["effective"]
+        assert str(effective["threads"]) == "2"
+        assert str(effective["preserve_insertion_order"]).lower() == "false"
+    finally:
+        service.close()
@@ -0,0 +1,107 @@
+"""What-if scenarios: store and side-by-side compare (user-047)"""
+
+import threading
+
+import pytest
+
+from scenarios import ScenarioManager
+
+
+def _by_key(rows, *fields):
+    return {tuple(row[f] for f in fields): (row["baseline"], row["scenario"], row["delta"]) for row in rows}
+
+
+def test_shift_moves_demand_between_quarters(service):
+    scenario = service.scenarios.save("LM2500 slips", [{"type": "shift", "program": "LM2500", "months": 3}])
+    result = service.scenarios.compare(scenario["id"], period="quarter", aggregates=["supplier"])
+    assert result["affected_esns"] == 6
+    
+    # Sup0 is one unit per engine. LM2500 ships Jan-Mar and May-Jul, LM6000 the same;
+    # three months later LM2500 ships Apr-Jun and Aug-Oct
+    sup0 = {period: change for (supplier, period), change in _by_key(result["supplier"], "supplier", "period").items()
+            if supplier == "Sup0"}
+    assert sup0 == {
+        "2025Q1": (6, 3, -3),
+        "2025Q2": (4, 5, 1),
+        "2025Q3": (2, 3, 1),
+        "2025Q4": (0, 1, 1),
+    }
+    # Totals are preserved
+    assert sum(delta for _, _, delta in _by_key(result["supplier"], "supplier", "period").values()) == 0
+
+
+def test_qpe_overrides_level1_and_level2(service):
+    level1 = service.scenarios.save("P001 x5", [{"type": "qpe", "part": "P001", "qpe": 5}])
+    result = service.scenarios.compare(level1["id"])
+    assert result["affected_esns"] == 3
+    # P001 (QPE 2 -> 5) on three LM2500-C0 engines shipping in Q1
+    assert _by_key(result["supplier"], "supplier", "period") == {("Sup1", "2025Q1"): (12, 21, 9)}
+    # Its Level 2 parts: P001-L0 (QPE 1) for RMS0, P001-L1 (QPE 2) for RMS1
+    rm = _by_key(result["rm_supplier"], "rmSupplier", "period")
+    assert rm[("RMS0", "2025Q1")][2] == 3 * (5 - 2) * 1
+    assert rm[("RMS1", "2025Q1")][2] == 3 * (5 - 2) * 2
+    assert result["cdata"] == []
+    
+    level2 = service.scenarios.save("P001-L1 x4", [
+        {"type": "qpe", "part": "P001", "level2Part": "P001-L1", "config": "LM2500-C0", "qpe": 4},
+    ])
+    result = service.scenarios.compare(level2["id"])
+    assert result["supplier"] == []
+    assert _by_key(result["rm_supplier"], "rmSupplier", "period") == {
+        ("RMS1", "2025Q1"): (rm[("RMS1", "2025Q1")][0], rm[("RMS1", "2025Q1")][0] + 3 * 2 * (4 - 2), 12),
+    }
+
+
+def test_most_specific_overlay_wins(service):
+    scenario = service.scenarios.save("mixed", [
+        {"type": "shift", "esn": "E000", "months": 1},
+        {"type": "shift", "program": "LM2500", "months": 6},
+    ])
+    result = service.scenarios.compare(scenario["id"], period="month", aggregates=["cdata"])
+    deltas = {(row["PL"], row["Year"], row["Month"]): row["delta"] for row in result["cdata"]}
+    # E000 moves Jan -> Feb, taking the place of E001 which moves to Aug like the
+    # other LM2500 engines (six months)
+    assert deltas[("LM2500", 2025, 1)] == -1
+    assert ("LM2500", 2025, 2) not in deltas
+    assert deltas[("LM2500", 2025, 8)] == 1
+    assert deltas[("LM2500", 2026, 1)] == 1
+
+
+def test_concurrent_managers_do_not_lose_updates(tmp_path):
+    path = tmp_path / "shared" / "scenarios.json"
+    managers = [ScenarioManager(None, str(path)) for _ in range(2)]
+    
+    def save_many(manager, prefix):
+        for i in range(25):
+            manager.save(f"{prefix}{i}", [{"type": "shift", "months": 1}])
+    
+    threads = [threading.Thread(target=save_many, args=(m, f"w{n}-")) for n, m in enumerate(managers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(ScenarioManager(None, str(path)).list()) == 50
+    assert len(managers[0].list()) == 50
+
+
+def test_validation(service):
+    with pytest.raises(ValueError):
+        service.scenarios.save("bad", [{"type": "shift", "months": 0}])
+    with pytest.raises(ValueError):
+        service.scenarios.save("", [])
+    assert service.scenarios.save("x", [], scenario_id="missing") is None
+
+
+def test_scenario_endpoints(client):
+    created = client.post("/api/scenarios", json={"name": "slip", "overlays": [{"type": "shift", "esn": "E100", "days": 60}]})
+    assert created.status_code == 200
+    scenario_id = created.json()["id"]
+    
+    body = client.get(f"/api/scenarios/{scenario_id}/compare", params={"aggregate": "cdata", "period": "month"}).json()
+    assert body["affected_esns"] == 1
+    assert [(row["PL"], row["Month"], row["delta"]) for row in body["cdata"]] == [("LM6000", 1, -1), ("LM6000", 3, 1)]
+    
+    assert client.get(f"/api/scenarios/{scenario_id}/compare", params={"period": "week"}).status_code == 400
+    assert client.delete(f"/api/scenarios/{scenario_id}").status_code == 200
+    assert client.get(f"/api/scenarios/{scenario_id}").status_code == 404
@@ -0,0 +1,36 @@
+"""Arrow -> orjson serialization path (user-032)"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import orjson
+import pyarrow as pa
+import pytest
+
+from serialization import dumps, shape_arrow, validate_layout
+
+
+def test_dumps_handles_database_types():
+    payload = {"d": date(2025, 1, 15), "ts": datetime(2025, 1, 15, 8, 30), "n": Decimal("1.5"),
+               "gap": timedelta(minutes=1), "raw": b"ab", 1: "int key"}
+    assert orjson.loads(dumps(payload)) == {
+        "d": "2025-01-15", "ts": "2025-01-15T08:30:00", "n": 1.5, "gap": 60.0, "raw": "ab", "1": "int key"
+    }
+
+
+def test_layouts():
+    table = pa.table({"a": [1, 2], "b": ["x", None]})
+    assert shape_arrow(table) == [{"a": 1, "b": "x"}, {"a": 2, "b": None}]
+    assert shape_arrow(table, "columnar") == {"columns": ["a", "b"], "data": {"a": [1, 2], "b": ["x", None]}}
+    with pytest.raises(ValueError):
+        validate_layout("table")
+
+
+def test_columnar_layout_matches_rows_layout(client):
+    sql = 'SELECT "ESN", "Part_Number" FROM "Output" ORDER BY ALL LIMIT 4'
+    rows = client.get("/api/query", params={"sql": sql}).json()["data"]
+    columnar = client.get("/api/query", params={"sql": sql, "layout": "columnar"}).json()["data"]
+    assert columnar["columns"] == ["ESN", "Part_Number"]
+    assert [dict(zip(columnar["columns"], values)) for values in zip(*columnar["data"].values())] == rows
+    
+    assert client.get("/api/query", params={"sql": sql, "layout": "table"}).status_code == 400
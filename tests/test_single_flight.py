@@ -0,0 +1,71 @@
+"""Request coalescing for identical expensive queries (user-029)"""
+
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+    
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": 42}
+    
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(10)))
+    
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"started": 1, "coalesced": 9, "in_flight": 0}
+
+
+def test_keys_are_independent_and_finished_keys_recompute():
+    flight = SingleFlight()
+    
+    async def main():
+        first = await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0.01, "a")),
+                                     flight.do("b", lambda: asyncio.sleep(0.01, "b")))
+        again = await flight.do("a", lambda: asyncio.sleep(0, "a2"))
+        return first, again
+    
+    assert asyncio.run(main()) == (["a", "b"], "a2")
+    assert flight.stats()["started"] == 3
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad")
+    
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+    
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_the_computation():
+    flight = SingleFlight()
+    
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+    
+    async def main():
+        impatient = asyncio.ensure_future(flight.do("k", compute))
+        patient = asyncio.ensure_future(flight.do("k", compute))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+    
+    assert asyncio.run(main()) == "done"
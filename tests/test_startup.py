@@ -0,0 +1,42 @@
+"""Startup phase timing and deferred loading (user-026)"""
+
+import pytest
+
+from startup_timer import StartupTimer
+
+
+def test_phases_are_recorded_in_order_with_status():
+    timer = StartupTimer()
+    with timer.phase("first", source="test"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timer.phase("second"):
+            raise RuntimeError("boom")
+    timer.record("external", 12.345)
+    timer.finish()
+    
+    report = timer.report()
+    assert [p["name"] for p in report["phases"]] == ["first", "second", "external"]
+    assert report["phases"][0]["details"] == {"source": "test"}
+    assert report["phases"][1]["status"] == "error"
+    assert report["phases"][1]["error"] == "boom"
+    assert report["phases"][2]["duration_ms"] == 12.35
+    assert report["complete"] is True
+    assert all(p["duration_ms"] is not None for p in report["phases"])
+
+
+def test_service_records_phases_and_defers_dataframe(db_path):
+    from duckdb_service import DuckDBService
+    
+    timer = StartupTimer()
+    service = DuckDBService(duckdb_path=str(db_path), timer=timer, read_only=False)
+    try:
+        names = [p["name"] for p in timer.phases]
+        assert "duckdb_connect" in names
+        assert "indexes_and_views" in names
+        
+        # Nothing materialized at boot; the DataFrame appears on first access
+        assert service._df is None
+        assert service.df.shape[0] == 72
+    finally:
+        service.close()
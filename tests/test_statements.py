@@ -0,0 +1,60 @@
+"""Statement registry for the demand hierarchy queries (user-050)"""
+
+import pytest
+
+from conftest import output_rows, write_output_db
+from statements import StatementRegistry
+
+
+@pytest.fixture
+def quoted_service(tmp_path):
+    from duckdb_service import DuckDBService
+    
+    # Program and part names with single quotes are plain bound values
+    rows = [tuple(value.replace("LM2500", "O'Brien").replace("P000", "P'000") for value in row)
+            for row in output_rows()]
+    svc = DuckDBService(duckdb_path=str(write_output_db(tmp_path / "quoted.duckdb", rows)), read_only=False)
+    yield svc
+    svc.close()
+
+
+def test_quoted_values_are_bound(quoted_service):
+    programs = {p["engineProgram"]: p for p in quoted_service.get_demand_data()}
+    assert sorted(programs) == ["LM6000", "O'Brien"]
+    
+    config = programs["O'Brien"]["configs"][0]
+    assert config["config"] == "O'Brien-C0"
+    assert [e["esn"] for e in config["esns"]] == ["E000", "E001", "E002"]
+    part = next(p for p in config["level1Parts"] if p["pn"] == "P'000")
+    assert [l2["pn"] for l2 in part["level2Parts"]] == ["P'000-L0", "P'000-L1"]
+
+
+def test_statement_counters(quoted_service):
+    quoted_service.get_demand_data()
+    stats = quoted_service.statements.stats()
+    # 2 programs -> 4 configs -> 12 Level 1 parts, each with 2 Level 2 parts
+    assert stats["demand_programs"]["calls"] == 1
+    assert stats["demand_programs"]["rows"] == 2
+    assert (stats["demand_configs"]["calls"], stats["demand_configs"]["rows"]) == (2, 4)
+    assert (stats["demand_esns"]["calls"], stats["demand_esns"]["rows"]) == (4, 12)
+    assert (stats["level2_parts"]["calls"], stats["level2_parts"]["rows"]) == (12, 24)
+    assert stats["demand_programs_page"]["calls"] == 0
+
+
+def test_registry_binds_parameters(service):
+    registry = StatementRegistry()
+    registry.define("by_program", 'SELECT COUNT(*) AS n FROM "Output" WHERE "ENGINE_PROGRAM" = ?')
+    assert "by_program" in registry
+    with service.cursor() as cur:
+        assert registry.fetch_dicts(cur, "by_program", ["LM2500"]) == [{"n": 36}]
+        # An injection attempt is just a value that matches nothing
+        assert registry.fetch_dicts(cur, "by_program", ["x' OR '1'='1"]) == [{"n": 0}]
+    stats = registry.stats()["by_program"]
+    assert (stats["calls"], stats["rows"]) == (2, 2)
+    assert stats["max_ms"] >= stats["avg_ms"] >= 0
+
+
+def test_diagnostics_report_statement_stats(client):
+    client.get("/api/demand/programs")
+    body = client.get("/api/diagnostics/duckdb").json()
+    assert body["statements"]["demand_programs_page"]["calls"] >= 1
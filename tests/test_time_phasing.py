@@ -0,0 +1,69 @@
+"""Lead-time offset demand into order-by periods (user-048)"""
+
+from datetime import date, timedelta
+
+import pytest
+
+LEAD_TIMES = b"part,lead_time_days\nP000,45\nP000-L0,100\nP001,10\nP001,20\n"
+
+
+def _order_dates(service, esn):
+    phasing = service.phasing
+    with service.cursor() as cur:
+        rows = cur.execute(f"""
+            SELECT level, pn, order_date FROM ({phasing._phased_sql(phasing._lead_time_source(cur))})
+            WHERE esn = ?
+        """, [esn]).fetchall()
+    return {(level, pn): order_date for level, pn, order_date in rows}
+
+
+def test_last_row_wins_for_duplicate_parts(service):
+    result = service.phasing.load_lead_times_csv(LEAD_TIMES)
+    assert result["parts"] == 3
+    assert service.phasing.lead_times() == {"P000": 45, "P000-L0": 100, "P001": 20}
+    assert service.phasing.lead_time("P002") == 50
+
+
+def test_order_dates(service):
+    service.phasing.load_lead_times_csv(LEAD_TIMES)
+    ship = date(2025, 1, 15)
+    days = timedelta
+    
+    dates = _order_dates(service, "E000")
+    # Level 1: ship date - lead time of the part (default 50 days)
+    assert dates[(1, "P000")] == ship - days(45)
+    assert dates[(1, "P001")] == ship - days(20)
+    assert dates[(1, "P002")] == ship - days(50)
+    # Level 2: parent's order date - lead time of the Level 2 part
+    assert dates[(2, "P000-L0")] == ship - days(45) - days(100)
+    assert dates[(2, "P000-L1")] == ship - days(45) - days(50)
+    assert dates[(2, "P001-L0")] == ship - days(20) - days(50)
+
+
+def test_merge_and_replace(service):
+    service.phasing.load_lead_times_csv(LEAD_TIMES)
+    service.phasing.load_lead_times_csv(b"part,days\nP001,7\n")
+    assert service.phasing.lead_times() == {"P000": 45, "P000-L0": 100, "P001": 7}
+    
+    service.phasing.load_lead_times_csv(b"part,days\nP002,1\n", mode="replace")
+    assert service.phasing.lead_times() == {"P002": 1}
+    assert _order_dates(service, "E000")[(1, "P000")] == date(2025, 1, 15) - timedelta(50)
+    
+    with pytest.raises(ValueError):
+        service.phasing.load_lead_times_csv(b"part,days\nP002,soon\n")
+
+
+def test_time_phasing_endpoint(client):
+    upload = client.post("/api/lead-times", files={"file": ("lt.csv", LEAD_TIMES, "text/csv")})
+    assert upload.status_code == 200
+    
+    body = client.get("/api/time-phasing", params={"by": "supplier", "group": "Sup1", "level": 1}).json()
+    rows = body["data"]
+    assert {row["group"] for row in rows} == {"Sup1"}
+    # P001 (order by Dec 26 for E000) and P101 (Nov 26 for E100, default lead time)
+    assert [row["period"] for row in rows][:2] == ["2024-11", "2024-12"]
+    assert rows[1]["first_order_date"] == "2024-12-26"
+    # 4 Sup1 parts x 3 engines x QPE 2
+    assert rows[-1]["cumulative_qty"] == 24.0
+    
+    assert client.get("/api/time-phasing", params={"by": "plant"}).status_code == 400
@@ -0,0 +1,47 @@
+"""Reverse BOM lookup /api/where-used/{pn} (user-045)"""
+
+import pytest
+
+from conftest import output_rows, write_output_db
+
+
+@pytest.fixture
+def shared_service(tmp_path):
+    from duckdb_service import DuckDBService
+    
+    # One raw-material part shared by LM2500-C0/P000 and LM6000-C1/P110
+    rows = [row[:11] + ("SHARED",) + row[12:] if row[11] in ("P000-L0", "P110-L0") else row for row in output_rows()]
+    svc = DuckDBService(duckdb_path=str(write_output_db(tmp_path / "shared.duckdb", rows)), read_only=False)
+    yield svc
+    svc.close()
+
+
+def test_shared_part_impact(shared_service):
+    result = shared_service.get_where_used("SHARED", "quarter")
+    assert result["total_esns"] == 6
+    assert result["levels"] == [2]
+    assert result["programs"] == [{"program": "LM2500", "esns": 3}, {"program": "LM6000", "esns": 3}]
+    assert result["configs"] == [
+        {"program": "LM2500", "config": "LM2500-C0", "esns": 3},
+        {"program": "LM6000", "config": "LM6000-C1", "esns": 3},
+    ]
+    assert result["level1Parts"] == [{"pn": "P000", "esns": 3}, {"pn": "P110", "esns": 3}]
+    # LM2500-C0 ships Jan-Mar, LM6000-C1 May-Jul
+    assert result["esnsByPeriod"] == [
+        {"period": "2025-Q1", "esns": 3}, {"period": "2025-Q2", "esns": 2}, {"period": "2025-Q3", "esns": 1},
+    ]
+
+
+def test_level1_part(shared_service):
+    result = shared_service.get_where_used("P001", "year")
+    assert result["levels"] == [1]
+    assert result["level1Parts"] == [{"pn": "P001", "esns": 3}]
+    assert result["esnsByPeriod"] == [{"period": "2025", "esns": 3}]
+
+
+def test_where_used_endpoint(client):
+    body = client.get("/api/where-used/P101-L1").json()
+    assert body["total_esns"] == 3
+    assert body["configs"] == [{"program": "LM6000", "config": "LM6000-C0", "esns": 3}]
+    assert client.get("/api/where-used/NOPE").status_code == 404
+    assert client.get("/api/where-used/P000", params={"period": "week"}).status_code == 400
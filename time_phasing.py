@@ -0,0 +1,247 @@
+"""
+Time phasing: ship-date demand offset by manufacturing lead time into order-by periods
+
+Lead times (days) per part live in the part_lead_times table, uploaded as CSV:
+    
+    part,lead_time_days
+    P0000,45
+    P0000-L0,120
+
+Parts without a row use the default (AEO_DEFAULT_LEAD_TIME_DAYS, 50).
+
+Requirements are shifted backwards from Target_Ship_Date:
+- Level 1 part: order by ship date - lead time(part)
+- Level 2 part: order by its parent's order date - lead time(level 2 part),
+  i.e. the material has to be there before the parent is made
+
+and aggregated per order-by period by supplier (Level 1 parts), RM supplier
+(Level 2 parts) or raw type (both levels), with a running total per group.
+All of it is one DuckDB query; results are cached per data version and lead-time
+upload.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from gap_analysis import csv_upload_file, map_csv_columns
+
+LEAD_TIME_TABLE = "part_lead_times"
+DEFAULT_LEAD_TIME_DAYS = int(os.environ.get("AEO_DEFAULT_LEAD_TIME_DAYS", "50"))
+
+LEAD_TIME_COLUMN_ALIASES = {
+    "pn": ("part", "part_number", "part number", "pn", "level_2_pn"),
+    "days": ("lead_time_days", "lead_time", "leadtime", "mfglt", "mfg_lt", "days"),
+}
+LEAD_TIME_MODES = ("merge", "replace")
+
+# Grouping -> (group expression, levels it covers)
+PHASING_GROUPS = {
+    "supplier": ("supplier", (1,)),
+    "rm_supplier": ("supplier", (2,)),
+    "raw_type": ("raw_type", (1, 2)),
+}
+
+PHASING_PERIODS = {
+    "month": "strftime(order_date, '%Y-%m')",
+    "quarter": "CAST(year(order_date) AS VARCHAR) || 'Q' || CAST(quarter(order_date) AS VARCHAR)",
+    "year": "CAST(year(order_date) AS VARCHAR)",
+}
+
+
+class TimePhasing:
+    """Lead-time offset demand over a DuckDBService's main table"""
+    
+    def __init__(self, service, default_days: int = DEFAULT_LEAD_TIME_DAYS):
+        self.service = service
+        self.default_days = default_days
+        self._lock = threading.Lock()
+        self._revision = 0
+    
+    def _table_exists(self, cur) -> bool:
+        return cur.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = current_database() "
+            "AND schema_name = 'main' AND table_name = ?",
+            [LEAD_TIME_TABLE]
+        ).fetchone()[0] > 0
+    
+    def _lead_time_source(self, cur) -> str:
+        if self._table_exists(cur):
+            return f"(SELECT pn, lead_time_days AS days FROM {LEAD_TIME_TABLE})"
+        return "(SELECT NULL::VARCHAR AS pn, NULL::INTEGER AS days WHERE false)"
+    
+    # ------------------------------------------------------------------
+    # Lead times
+    # ------------------------------------------------------------------
+    
+    def lead_times(self) -> Dict[str, int]:
+        """Uploaded lead times, part -> days (parts not listed use default_days)"""
+        s = self.service
+        
+        def compute():
+            with s.cursor() as cur:
+                return dict(cur.execute(f"SELECT pn, days FROM {self._lead_time_source(cur)}").fetchall())
+        
+        return s._cached_derived(("lead_times", self._revision), compute)
+    
+    def lead_time(self, pn: Optional[str]) -> int:
+        return self.lead_times().get(pn, self.default_days)
+    
+    def load_lead_times_csv(self, csv_bytes: bytes, mode: str = "merge") -> Dict[str, Any]:
+        """Load part lead times from CSV (merge = upsert per part, replace = whole table)"""
+        s = self.service
+        if s.read_only:
+            raise PermissionError("Lead-time uploads need a read-write database - this worker is read-only")
+        if mode not in LEAD_TIME_MODES:
+            raise ValueError(f"Unknown mode '{mode}' - expected one of: {', '.join(LEAD_TIME_MODES)}")
+        
+        with csv_upload_file(csv_bytes, "aeo-lead-times-") as path, self._lock, s.cursor() as cur:
+            raw = cur.execute("SELECT * FROM read_csv(?, header = true, all_varchar = true)", [path])
+            mapping = map_csv_columns([d[0] for d in raw.description], LEAD_TIME_COLUMN_ALIASES,
+                                      ("pn", "days"), "part,lead_time_days")
+            # row_no keeps the file order, so a part listed twice resolves to its last row
+            upload = cur.execute(f"""
+                SELECT
+                    TRIM("{mapping["pn"]}") AS pn,
+                    TRY_CAST(TRIM("{mapping["days"]}") AS INTEGER) AS days,
+                    row_number() OVER () AS row_no
+                FROM read_csv(?, header = true, all_varchar = true)
+            """, [path]).fetch_arrow_table()
+            
+            cur.register("lead_time_upload", upload)
+            try:
+                invalid = cur.execute("""
+                    SELECT COUNT(*) FROM lead_time_upload
+                    WHERE pn IS NULL OR pn = '' OR days IS NULL OR days < 0
+                """).fetchone()[0]
+                if invalid:
+                    raise ValueError(f"{invalid} lead-time row(s) have an empty part or a lead time that is not a whole number of days >= 0")
+                
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {LEAD_TIME_TABLE} (
+                        pn VARCHAR, lead_time_days INTEGER, uploaded_at TIMESTAMP
+                    )
+                """)
+                cur.execute("BEGIN TRANSACTION")
+                try:
+                    if mode == "replace":
+                        cur.execute(f"DELETE FROM {LEAD_TIME_TABLE}")
+                    else:
+                        cur.execute(f"""
+                            DELETE FROM {LEAD_TIME_TABLE} t
+                            WHERE EXISTS (SELECT 1 FROM lead_time_upload u WHERE u.pn = t.pn)
+                        """)
+                    # Last row wins when a part is listed twice
+                    cur.execute(f"""
+                        INSERT INTO {LEAD_TIME_TABLE}
+                        SELECT pn, arg_max(days, row_no), now() FROM lead_time_upload GROUP BY pn
+                    """)
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+                parts = cur.execute("SELECT COUNT(DISTINCT pn) FROM lead_time_upload").fetchone()[0]
+            finally:
+                cur.unregister("lead_time_upload")
+            
+            self._revision += 1
+        
+        return {"mode": mode, "parts": parts, "default_days": self.default_days}
+    
+    # ------------------------------------------------------------------
+    # Phasing
+    # ------------------------------------------------------------------
+    
+    def _phased_sql(self, lead_times: str) -> str:
+        """Level 1 and Level 2 requirements per engine with their order-by dates"""
+        s = self.service
+        col = s._select_col
+        qpe = 'COALESCE(TRY_CAST("QPE" AS DOUBLE), 1)' if "QPE" in s.column_names else "1.0"
+        l2_qpe = 'COALESCE(TRY_CAST("Level_2_QPE" AS DOUBLE), 1)' if "Level_2_QPE" in s.column_names else "1.0"
+        return f"""
+            WITH rows AS (
+                SELECT
+                    {col(s.esn_col, "esn")},
+                    {col(s.part_col, "pn")},
+                    {col(s.level2_pn_col, "l2_pn")},
+                    {col(s.supplier_col, "supplier")},
+                    {col(s.rm_supplier_col, "rm_supplier")},
+                    {col("Level_1_Raw_Type", "l1_raw_type")},
+                    {col(s.level2_raw_type_col, "l2_raw_type")},
+                    {col(s.target_date_col, "ship_date", "DATE")},
+                    {qpe} AS qpe,
+                    {l2_qpe} AS l2_qpe
+                FROM {s._get_main_table()}
+            ),
+            level1 AS (
+                SELECT r.esn, r.pn, r.supplier, r.l1_raw_type AS raw_type, r.ship_date,
+                       MAX(r.qpe) AS qty,
+                       CAST(r.ship_date - to_days(COALESCE(ANY_VALUE(lt.days), {int(self.default_days)})) AS DATE) AS order_date
+                FROM rows r LEFT JOIN {lead_times} lt ON lt.pn = r.pn
+                WHERE r.pn IS NOT NULL AND r.pn != '' AND r.ship_date IS NOT NULL
+                GROUP BY r.esn, r.pn, r.supplier, r.l1_raw_type, r.ship_date
+            ),
+            level2 AS (
+                SELECT r.esn, r.l2_pn AS pn, r.rm_supplier AS supplier, r.l2_raw_type AS raw_type, r.ship_date,
+                       MAX(r.qpe) * MAX(r.l2_qpe) AS qty,
+                       CAST(r.ship_date
+                            - to_days(COALESCE(ANY_VALUE(parent_lt.days), {int(self.default_days)}))
+                            - to_days(COALESCE(ANY_VALUE(lt.days), {int(self.default_days)})) AS DATE) AS order_date
+                FROM rows r
+                LEFT JOIN {lead_times} parent_lt ON parent_lt.pn = r.pn
+                LEFT JOIN {lead_times} lt ON lt.pn = r.l2_pn
+                WHERE r.l2_pn IS NOT NULL AND r.l2_pn != '' AND r.ship_date IS NOT NULL
+                GROUP BY r.esn, r.pn, r.l2_pn, r.rm_supplier, r.l2_raw_type, r.ship_date
+            )
+            SELECT 1 AS level, * FROM level1
+            UNION ALL
+            SELECT 2 AS level, * FROM level2
+        """
+    
+    def _phase(self, by: str, period: str) -> List[Dict[str, Any]]:
+        group, levels = PHASING_GROUPS[by]
+        s = self.service
+        with s.cursor() as cur:
+            table = cur.execute(f"""
+                WITH phased AS ({self._phased_sql(self._lead_time_source(cur))}),
+                grouped AS (
+                    SELECT
+                        COALESCE({group}, '') AS "group",
+                        level,
+                        {PHASING_PERIODS[period]} AS period,
+                        MIN(order_date) AS first_order_date,
+                        SUM(qty) AS order_qty,
+                        COUNT(DISTINCT pn) AS parts,
+                        COUNT(DISTINCT esn) AS esns
+                    FROM phased
+                    WHERE level IN ({", ".join(str(level) for level in levels)})
+                    GROUP BY ALL
+                )
+                SELECT *,
+                    SUM(order_qty) OVER (PARTITION BY "group", level ORDER BY period
+                                         ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS cumulative_qty
+                FROM grouped
+                ORDER BY "group", level, period
+            """).fetch_arrow_table()
+        return table.to_pylist()
+    
+    def phase(self, by: str = "supplier", period: str = "month", groups: Optional[List[str]] = None,
+              level: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Order-by quantities per group and period (with running totals per group);
+        raises ValueError for an unknown grouping or period
+        """
+        if by not in PHASING_GROUPS:
+            raise ValueError(f"Unknown grouping '{by}' - expected one of: {', '.join(PHASING_GROUPS)}")
+        if period not in PHASING_PERIODS:
+            raise ValueError(f"Unknown period '{period}' - expected one of: {', '.join(PHASING_PERIODS)}")
+        
+        rows = self.service._cached_derived(
+            ("time_phasing", by, period, self._revision), lambda: self._phase(by, period)
+        )
+        if groups:
+            wanted = set(groups)
+            rows = [row for row in rows if row["group"] in wanted]
+        if level:
+            rows = [row for row in rows if row["level"] == level]
+        return rows